@@ -25,7 +25,13 @@ setup(name='tap-google-ads',
               'pylint',
               'nose',
               'ipdb',
-          ]
+          ],
+          'parquet': [
+              'pyarrow',
+          ],
+          'zstd': [
+              'zstandard',
+          ],
       },
       entry_points='''
           [console_scripts]
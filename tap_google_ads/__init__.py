@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 import logging
+import sys
 import singer
 from singer import utils
+from tap_google_ads.api import RecordBatch
+from tap_google_ads.api import iter_records
 from tap_google_ads.discover import create_resource_schema
 from tap_google_ads.discover import do_discover
+from tap_google_ads.discover import get_compact_catalog
+from tap_google_ads.discover import get_discovery_processes
+from tap_google_ads.discovery_cache import do_incremental_discover
+from tap_google_ads.profiling import create_profiler
+from tap_google_ads.stdout_compression import compressed_stdout
+from tap_google_ads import state_merge
 from tap_google_ads.sync import do_sync
 
 
@@ -22,21 +31,39 @@ REQUIRED_CONFIG_KEYS = [
 
 def main_impl():
     args = utils.parse_args(REQUIRED_CONFIG_KEYS)
-    resource_schema = create_resource_schema(args.config)
+    profiler = create_profiler(args.config)
     state = {}
 
     if args.state:
         state.update(args.state)
     if args.discover:
-        do_discover(resource_schema)
+        with profiler.unit("discovery"):
+            if args.config.get("discovery_cache_dir"):
+                do_incremental_discover(args.config,
+                                        args.config["discovery_cache_dir"],
+                                        compact=get_compact_catalog(args.config))
+            else:
+                resource_schema = create_resource_schema(args.config)
+                do_discover(resource_schema,
+                            compact=get_compact_catalog(args.config),
+                            processes=get_discovery_processes(args.config))
+        profiler.write_reports()
         LOGGER.info("Discovery complete")
-    elif args.catalog:
-        do_sync(args.config, args.catalog.to_dict(), resource_schema, state)
+        return
+
+    resource_schema = create_resource_schema(args.config)
+    if args.catalog:
+        with compressed_stdout(args.config):
+            do_sync(args.config, args.catalog.to_dict(), resource_schema, state, profiler=profiler)
+        profiler.write_reports()
         LOGGER.info("Sync Completed")
     else:
         LOGGER.info("No properties were selected")
 
 def main():
+    if sys.argv[1:2] == ["merge-state"]:
+        state_merge.main(sys.argv[2:])
+        return
 
     google_logger = logging.getLogger("google")
     google_logger.setLevel(level=logging.CRITICAL)
@@ -0,0 +1,157 @@
+"""A Python API for embedding the tap.
+
+`iter_records` runs the same sync as `tap-google-ads --catalog`, but yields
+the Singer messages as Python objects instead of writing JSON to stdout:
+
+    for message in iter_records(config, catalog, state):
+        if isinstance(message, singer.RecordMessage):
+            load(message.stream, message.record)
+        elif isinstance(message, singer.StateMessage):
+            save_state(message.value)
+
+The sync runs on a background thread and hands messages over through a
+bounded queue, so it only gets `QUEUE_SIZE` messages ahead of the consumer.
+Messages come in the order the tap would write them: a STATE message always
+follows the records it covers. Closing the generator early stops the sync
+at its next message.
+"""
+import copy
+import queue
+import threading
+from collections import namedtuple
+
+import singer
+
+from tap_google_ads.discover import create_resource_schema
+from tap_google_ads.messages import message_sink
+from tap_google_ads.sync import do_sync
+
+QUEUE_SIZE = 1000
+BATCH_FORMATS = ("dicts", "columns")
+
+# The records of one stream: a list of dicts, or a dict of property name to list of values
+RecordBatch = namedtuple("RecordBatch", ["stream", "records"])
+
+# The last item of the queue, with the error the sync failed with if any
+SyncDone = namedtuple("SyncDone", ["error"])
+
+
+class SyncClosed(Exception):
+    """The consumer closed the generator, raised in the sync thread to stop it"""
+
+
+class QueueSink:
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.closed = threading.Event()
+
+    def put(self, item):
+        while True:
+            if self.closed.is_set():
+                raise SyncClosed()
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def write_message(self, message):
+        if isinstance(message, singer.StateMessage):
+            # The sync keeps updating the same state dict
+            message = singer.StateMessage(value=copy.deepcopy(message.value))
+        self.put(message)
+
+    def get_messages(self):
+        while True:
+            item = self.queue.get()
+            if isinstance(item, SyncDone):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+
+
+def run_sync(config, catalog, state, resource_schema, sink):
+    error = None
+    try:
+        with message_sink(sink):
+            if resource_schema is None:
+                resource_schema = create_resource_schema(config)
+            do_sync(config, catalog, resource_schema, state)
+    except BaseException as err:  # pylint: disable=broad-except
+        error = err
+    if sink.closed.is_set():
+        # Whatever stopped the sync, nobody is listening any more
+        return
+    try:
+        sink.put(SyncDone(error))
+    except SyncClosed:
+        pass
+
+
+def to_columns(records):
+    """Turn a list of records into a dict of property name to values, None where a record has no value"""
+    names = {}
+    for record in records:
+        names.update(dict.fromkeys(record))
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def batch_records(messages, batch_size, batch_format):
+    """Collect consecutive records of a stream into `RecordBatch`es of up to `batch_size` records
+
+    A batch is yielded before any other message, so STATE still follows the records it covers."""
+    stream, records = None, []
+
+    def make_batch():
+        return RecordBatch(stream, to_columns(records) if batch_format == "columns" else records)
+
+    for message in messages:
+        if isinstance(message, singer.RecordMessage):
+            if records and message.stream != stream:
+                yield make_batch()
+                records = []
+            stream = message.stream
+            records.append(message.record)
+            if len(records) == batch_size:
+                yield make_batch()
+                records = []
+            continue
+
+        if records:
+            yield make_batch()
+            records = []
+        yield message
+
+    if records:
+        yield make_batch()
+
+
+def iter_records(config, catalog, state=None, batch_size=None, batch_format="dicts", resource_schema=None):
+    """Sync `catalog` and yield the `singer.SchemaMessage`, `singer.RecordMessage` and `singer.StateMessage`s
+
+    `config` and `catalog` are the dicts the tap reads from its config and
+    catalog files. `state` is not changed; each STATE message has a copy of
+    the state at that point. With `batch_size`, records come in `RecordBatch`es
+    instead, as lists of dicts, or with `batch_format` "columns" as a dict of
+    property name to values. Pass a `resource_schema` to skip fetching it."""
+    if batch_format not in BATCH_FORMATS:
+        raise ValueError(f"batch_format must be one of {', '.join(BATCH_FORMATS)}")
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    sink = QueueSink()
+    thread = threading.Thread(target=run_sync,
+                              args=(config, catalog, copy.deepcopy(state or {}), resource_schema, sink),
+                              name="tap-google-ads-sync",
+                              daemon=True)
+    thread.start()
+    try:
+        if batch_size:
+            yield from batch_records(sink.get_messages(), batch_size, batch_format)
+        else:
+            yield from sink.get_messages()
+    finally:
+        sink.closed.set()
+        thread.join()
@@ -0,0 +1,496 @@
+"""An asyncio sync engine for report streams.
+
+With `sync_engine` set to `async`, `do_sync` still syncs core streams one
+customer at a time, then hands every selected report stream to this engine.
+Each (stream, customer, day) is a unit of work, and up to `async_concurrency`
+of them are in flight at once, at most `async_customer_concurrency` for any
+one customer. Requests go out over a grpc.aio channel through the async
+GoogleAdsService client, and pages are iterated asynchronously.
+
+Days of a stream and customer finish out of order, so:
+
+- a Singer message is only ever written by the single output writer, which
+  takes records, bookmarks and digests from one queue in the order they were
+  queued. A bookmark is therefore never written before a record queued ahead
+  of it.
+- a stream's `date` bookmark only moves to a day once every earlier day of
+  that stream and customer is done. Only the earliest unfinished day writes
+  page checkpoints. A resumed sync may emit records of later days that were
+  already written, which is no worse than re-querying the conversion window.
+"""
+import asyncio
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from functools import lru_cache
+from importlib import import_module
+
+import backoff
+import singer
+from singer import Transformer
+from singer import metrics
+from singer import utils
+
+from .client import create_sdk_client
+from . import messages
+from .instrumentation import INSTRUMENTATION
+from .operation_budget import NullOperationBudget
+from .operation_budget import record_operation
+from .record_hash import RecordHasher
+from .streams import API_VERSION
+from .streams import create_report_query
+from .streams import get_checkpoint_page_token
+from .streams import get_metric_properties
+from .streams import get_request_timeout
+from .streams import get_selected_fields
+from .streams import is_page_token_error
+from .streams import on_giveup_func
+from .streams import should_give_up
+from .streams import write_checkpoint_for_report_streams
+
+LOGGER = singer.get_logger()
+
+DEFAULT_ASYNC_CONCURRENCY = 50
+DEFAULT_ASYNC_CUSTOMER_CONCURRENCY = 5
+
+# Messages the day tasks can get ahead of the output writer
+WRITE_QUEUE_SIZE = 10000
+
+# The google-ads client sets these on its channels, for large responses
+CHANNEL_OPTIONS = [
+    ("grpc.max_metadata_size", 16 * 1024 * 1024),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+
+def get_concurrency(config, config_key, default):
+    """Get a concurrency limit from config, the default if it is invalid"""
+    concurrency = config.get(config_key, default)
+
+    try:
+        if int(concurrency) > 0:
+            return int(concurrency)
+    except (ValueError, TypeError):
+        pass
+    LOGGER.warning(f"The entered {config_key} is invalid; it will be set to the default of {default}")
+    return default
+
+
+def create_async_client(config):
+    """Return a GoogleAdsService async client on a grpc.aio channel, and the developer token to send with it
+
+    The credentials and endpoint come from the same GoogleAdsClient the sync
+    engine uses. The client's interceptors only work on sync channels, so the
+    developer token and login customer id go with every request instead."""
+    sdk_client = create_sdk_client(config)
+    service_module = import_module(f"google.ads.googleads.{API_VERSION}.services.services.google_ads_service")
+    transport_class = service_module.transports.GoogleAdsServiceGrpcAsyncIOTransport
+
+    channel = transport_class.create_channel(
+        host=sdk_client.endpoint or service_module.GoogleAdsServiceClient.DEFAULT_ENDPOINT,
+        credentials=sdk_client.credentials,
+        options=CHANNEL_OPTIONS,
+    )
+    client = service_module.GoogleAdsServiceAsyncClient(transport=transport_class(channel=channel))
+    return client, sdk_client.developer_token
+
+
+def to_google_ads_exception(err):
+    """Turn an api-core error carrying a GoogleAdsFailure into a GoogleAdsException
+
+    This is what the google-ads exception interceptor does for sync requests,
+    so the retry policy and error handling work the same. Like the interceptor,
+    leave INTERNAL and RESOURCE_EXHAUSTED errors alone, they get retried."""
+    # pylint: disable=import-outside-toplevel
+    from google.ads.googleads.errors import GoogleAdsException
+    from google.api_core.exceptions import ServerError, TooManyRequests
+
+    call = getattr(err, "response", None)
+    if isinstance(err, (ServerError, TooManyRequests)) or not hasattr(call, "trailing_metadata"):
+        return err
+
+    trailing_metadata = list(call.trailing_metadata() or ())
+    failure_key = f"google.ads.googleads.{API_VERSION}.errors.googleadsfailure-bin"
+    for key, value in trailing_metadata:
+        if key == failure_key:
+            errors_module = import_module(f"google.ads.googleads.{API_VERSION}.errors.types.errors")
+            failure = errors_module.GoogleAdsFailure.deserialize(value)
+            request_id = next((value for key, value in trailing_metadata if key == "request-id"), None)
+            return GoogleAdsException(err, call, failure, request_id)
+    return err
+
+
+async def search(client, request, metadata, timeout, stats):
+    from google.api_core.exceptions import GoogleAPICallError  # pylint: disable=import-outside-toplevel
+
+    started = time.monotonic()
+    try:
+        pager = await client.search(request=request, metadata=metadata, timeout=timeout)
+    except GoogleAPICallError as err:
+        raise to_google_ads_exception(err) from err
+    stats.add_request(started)
+    if not request.get("page_token"):
+        record_operation()
+    return pager
+
+
+def on_backoff(details):
+    details["kwargs"]["stats"].add_backoff(details.get("wait"))
+
+
+@lru_cache(maxsize=None)
+def get_retrying_search():
+    """`search` wrapped in the same backoff policy as the sync engine's requests"""
+    # pylint: disable=import-outside-toplevel
+    from google.ads.googleads.errors import GoogleAdsException
+    from google.api_core.exceptions import ServerError, TooManyRequests
+
+    return backoff.on_exception(backoff.expo,
+                                (GoogleAdsException, ServerError, TooManyRequests),
+                                max_tries=5,
+                                jitter=None,
+                                giveup=should_give_up,
+                                on_giveup=on_giveup_func,
+                                on_backoff=on_backoff,
+                                logger=None)(search)
+
+
+def write_report_bookmark(state, stream, customer_id, query_date):
+    singer.write_bookmark(state, stream, customer_id, {"date": utils.strftime(query_date)})
+    messages.write_state(state)
+
+
+class AsyncWriter:
+    """The engine's only writer of Singer messages
+
+    Queued calls run in order. If one fails, the rest are dropped rather than
+    run, so no task waits forever on a full queue, and the error is raised by
+    the next `put` and by `close`. Cleanups queued with `put_cleanup` still run."""
+
+    def __init__(self, maxsize=WRITE_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize)
+        self.counters = {}
+        self.exit_stack = ExitStack()
+        self.error = None
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            function, args, cleanup = await self.queue.get()
+            if function is None:
+                return
+            if self.error is None or cleanup:
+                try:
+                    function(*args)
+                except Exception as err:  # pylint: disable=broad-except
+                    self.error = self.error or err
+
+    def check(self):
+        if self.error is not None:
+            raise RuntimeError("Writing the sync output failed") from self.error
+
+    async def put(self, function, *args):
+        self.check()
+        await self.queue.put((function, args, False))
+
+    async def put_cleanup(self, function, *args):
+        """Queue a call that undoes what failed, which runs even after an earlier call failed"""
+        await self.queue.put((function, args, True))
+
+    async def write_record(self, report_day, stream_name, record):
+        await self.put(self.write_record_now, report_day, stream_name, record)
+
+    def get_counter(self, stream_name):
+        counter = self.counters.get(stream_name)
+        if counter is None:
+            counter = self.counters[stream_name] = self.exit_stack.enter_context(metrics.record_counter(stream_name))
+        return counter
+
+    def write_record_now(self, report_day, stream_name, record):
+        report_day.write(record)
+        self.get_counter(stream_name).increment()
+
+    def write_columns_now(self, report_day, stream_name, columns):
+        report_day.write_columns(columns)
+        self.get_counter(stream_name).increment(len(columns["_sdc_record_hash"]))
+
+    async def close(self):
+        """Wait for everything queued to be written"""
+        await self.queue.put((None, (), False))
+        await self.task
+        self.exit_stack.close()
+        self.check()
+
+
+class ReportUnit:  # pylint: disable=too-many-instance-attributes
+    """The days one report stream syncs for one customer, and how far in order they got"""
+
+    def __init__(self, stream_obj, catalog_entry, customer, query_dates, bookmark, first_query_date=None):
+        self.stream_obj = stream_obj
+        self.catalog_entry = catalog_entry
+        self.customer = customer
+        self.query_dates = query_dates
+        # The first day of the window, which days the operation budget left for a later run are part of
+        self.first_query_date = first_query_date or (query_dates[0] if query_dates else None)
+        # The bookmark the sync started from, for the first day's checkpoint
+        self.bookmark = bookmark
+        self.stream_name = catalog_entry["stream"]
+        self.tap_stream_id = catalog_entry["tap_stream_id"]
+        self.customer_id = customer["customerId"]
+        self.resource_name = stream_obj.google_ads_resource_names[0]
+        self.selected_fields = get_selected_fields(catalog_entry["metadata"])
+        self.metric_properties = get_metric_properties(catalog_entry["metadata"])
+        self.record_hasher = RecordHasher(catalog_entry["metadata"])
+        self.completed = set()
+        self.next_index = 0
+
+    @property
+    def first_query_day(self):
+        return utils.strftime(self.first_query_date, '%Y-%m-%d') if self.first_query_date else None
+
+    @property
+    def done(self):
+        return self.next_index == len(self.query_dates)
+
+    def is_earliest(self, index):
+        return index == self.next_index
+
+    def complete(self, index):
+        """Mark a day done, and return the last day that every earlier day is done by, if that moved"""
+        self.completed.add(index)
+        if index != self.next_index:
+            return None
+        while self.next_index in self.completed:
+            self.completed.remove(self.next_index)
+            self.next_index += 1
+        return self.query_dates[self.next_index - 1]
+
+
+def interleave_days(units):
+    """Yield (unit, day index) pairs, one day of every unit in turn
+
+    Units are in stream then customer order, so consecutive work goes to
+    different customers and rarely waits on a customer's concurrency limit."""
+    longest = max((len(unit.query_dates) for unit in units), default=0)
+    for index in range(longest):
+        for unit in units:
+            if index < len(unit.query_dates):
+                yield unit, index
+
+
+class AsyncReportSync:  # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, client, developer_token, config, state, digest_store, report_output, writer,
+                 operation_budget=None):
+        self.client = client
+        self.developer_token = developer_token
+        self.config = config
+        self.state = state
+        self.digest_store = digest_store
+        self.report_output = report_output
+        self.writer = writer
+        self.operation_budget = operation_budget or NullOperationBudget()
+        self.request_timeout = get_request_timeout(config)
+        self.concurrency = get_concurrency(config, "async_concurrency", DEFAULT_ASYNC_CONCURRENCY)
+        self.customer_concurrency = get_concurrency(config, "async_customer_concurrency",
+                                                    DEFAULT_ASYNC_CUSTOMER_CONCURRENCY)
+        self.customer_semaphores = {}
+
+    def customer_semaphore(self, customer_id):
+        semaphore = self.customer_semaphores.get(customer_id)
+        if semaphore is None:
+            semaphore = self.customer_semaphores[customer_id] = asyncio.Semaphore(self.customer_concurrency)
+        return semaphore
+
+    async def run(self, units):
+        for unit in units:
+            if not unit.query_dates:
+                await self.finish_unit(unit)
+
+        work = interleave_days(units)
+        workers = [asyncio.create_task(self.worker(work)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    async def worker(self, work):
+        # Every worker pulls from the same iterator; nothing else runs between two `next` calls
+        for unit, index in work:
+            async with self.customer_semaphore(unit.customer_id):
+                await self.sync_day(unit, index)
+
+    async def iter_pages(self, unit, query, page_token, stats):
+        """Yield the raw protobuf pages of a query, from `page_token` if Google still accepts it
+
+        Each page comes with the page token it was fetched with, `""` for the first page. A next
+        page that fails with an error the backoff policy retries is searched for again with its
+        page token."""
+        # pylint: disable=import-outside-toplevel
+        from google.ads.googleads.errors import GoogleAdsException
+        from google.api_core.exceptions import GoogleAPICallError, ServerError, TooManyRequests
+
+        request = {"customer_id": unit.customer_id, "query": query}
+        metadata = (("developer-token", self.developer_token),
+                    ("login-customer-id", unit.customer["loginCustomerId"]))
+        retrying_search = get_retrying_search()
+
+        pager = None
+        if page_token:
+            try:
+                pager = await retrying_search(self.client, dict(request, page_token=page_token), metadata,
+                                              self.request_timeout, stats=stats)
+            except GoogleAdsException as err:
+                if not is_page_token_error(err):
+                    raise
+                LOGGER.warning("The checkpoint's page token was rejected, requesting the whole day again.")
+        if pager is None:
+            page_token = ""
+            pager = await retrying_search(self.client, request, metadata, self.request_timeout, stats=stats)
+
+        pages = pager.pages.__aiter__()
+        first_page = True
+        while True:
+            started = time.monotonic()
+            try:
+                page = await pages.__anext__()
+            except StopAsyncIteration:
+                return
+            except GoogleAPICallError as err:
+                error = to_google_ads_exception(err)
+                if not isinstance(error, (GoogleAdsException, ServerError, TooManyRequests)) or should_give_up(error):
+                    raise error from err
+                LOGGER.info(f"Fetching the next page failed with {type(error).__name__}, searching for it again.")
+                stats.add_backoff(0)
+                pager = await retrying_search(self.client, dict(request, page_token=page_token), metadata,
+                                              self.request_timeout, stats=stats)
+                pages = pager.pages.__aiter__()
+                first_page = True
+                continue
+            # The first page came back with the search, every other one is a request of its own
+            if not first_page:
+                stats.add_request(started)
+            first_page = False
+            page = type(page).pb(page)
+            yield page_token, page
+            page_token = page.next_page_token
+
+    async def sync_day(self, unit, index):
+        from google.ads.googleads.errors import GoogleAdsException  # pylint: disable=import-outside-toplevel
+
+        query_date = unit.query_dates[index]
+        query_day = utils.strftime(query_date, '%Y-%m-%d')
+        if self.operation_budget.exhausted():
+            # The unit's bookmark stops before this day, so later days are left for a later run too
+            LOGGER.warning(f"The daily operation limit is reached, leaving {unit.stream_name} for {query_day} "
+                           f"for customer Id {unit.customer_id} for a later run.")
+            return
+        query = create_report_query(unit.resource_name, unit.selected_fields, query_date)
+        LOGGER.info(f"Requesting {unit.stream_name} data for {query_day} for customer Id {unit.customer_id}.")
+
+        page_token = get_checkpoint_page_token(unit.bookmark, query_date, query)
+        if page_token:
+            LOGGER.info(f"Resuming {unit.stream_name} data for {query_day} from its last checkpoint.")
+
+        stats = INSTRUMENTATION.get_unit(unit.stream_name, unit.customer_id, query_day)
+        digests = self.digest_store.load_report_day(unit.tap_stream_id, unit.customer_id, query_day,
+                                                    unit.metric_properties)
+        report_day = self.report_output.open_report_day(unit.catalog_entry, unit.customer_id, query_day)
+        started = time.monotonic()
+        try:
+            with Transformer() as transformer:
+                async for page_token, page in self.iter_pages(unit, query, page_token, stats):
+                    rows = stats.iter_rows(page.results)
+                    page_columns = None
+                    if report_day.columnar is not None:
+                        rows = list(rows)
+                        page_columns = report_day.columnar.build(rows)
+
+                    if page_columns is not None:
+                        await self.writer.put(self.writer.write_columns_now, report_day, unit.stream_name,
+                                              page_columns)
+                    else:
+                        for message in rows:
+                            record = unit.stream_obj.build_record(message, transformer, unit.catalog_entry,
+                                                                  unit.record_hasher)
+                            if digests.changed(record):
+                                await self.writer.write_record(report_day, unit.stream_name, record)
+                    await self.writer.put(report_day.commit, page_token)
+
+                    if page.next_page_token and unit.is_earliest(index):
+                        await self.writer.put(write_checkpoint_for_report_streams, self.state, unit.tap_stream_id,
+                                              unit.customer_id, query_date, query, page.next_page_token)
+        except BaseException as err:
+            # Whatever ended the day early, be it the API, a record or a cancellation, its pages
+            # after the last committed one are dropped
+            await self.writer.put_cleanup(report_day.abort)
+            if isinstance(err, GoogleAdsException):
+                LOGGER.warning("Failed query: %s", query)
+                LOGGER.critical(str(err.failure.errors[0].message))
+                raise RuntimeError from None
+            raise
+        finally:
+            stats.wall_seconds += time.monotonic() - started
+            INSTRUMENTATION.log_unit(stats)
+
+        await self.writer.put(self.digest_store.save_report_day, unit.tap_stream_id, unit.customer_id, query_day,
+                              digests)
+        bookmark_date = unit.complete(index)
+        if bookmark_date is not None:
+            await self.writer.put(write_report_bookmark, self.state, unit.tap_stream_id, unit.customer_id,
+                                  bookmark_date)
+        if unit.done:
+            await self.finish_unit(unit)
+
+    async def finish_unit(self, unit):
+        if unit.first_query_day:
+            await self.writer.put(self.digest_store.compact_reports, unit.tap_stream_id, unit.customer_id,
+                                  unit.first_query_day)
+
+
+def build_units(catalog_entries, report_streams, customers, config, state, operation_budget=None):
+    if operation_budget is None:
+        operation_budget = NullOperationBudget()
+    units = []
+    for catalog_entry in catalog_entries:
+        stream_obj = report_streams[catalog_entry["stream"]]
+        selected_fields = get_selected_fields(catalog_entry["metadata"])
+        for customer in customers:
+            bookmark = singer.get_bookmark(state, catalog_entry["tap_stream_id"], customer["customerId"], default={})
+            query_date, end_date = stream_obj.get_date_range(catalog_entry["stream"], selected_fields,
+                                                             bookmark.get("date"), config)
+            first_query_date = query_date
+            query_date, end_date = operation_budget.limit_date_range(catalog_entry["tap_stream_id"],
+                                                                     customer["customerId"], query_date, end_date)
+            query_dates = []
+            while query_date <= end_date:
+                query_dates.append(query_date)
+                query_date += timedelta(days=1)
+            units.append(ReportUnit(stream_obj, catalog_entry, customer, query_dates, bookmark, first_query_date))
+    return units
+
+
+async def sync_report_streams(config, catalog_entries, report_streams, customers, state, digest_store,
+                              report_output, operation_budget=None):
+    """Sync every selected report stream for every customer"""
+    units = build_units(catalog_entries, report_streams, customers, config, state, operation_budget)
+    LOGGER.info(f"Syncing {sum(len(unit.query_dates) for unit in units)} report days "
+                f"of {len(catalog_entries)} streams asynchronously.")
+
+    client, developer_token = create_async_client(config)
+    writer = AsyncWriter()
+    writer.start()
+    try:
+        await AsyncReportSync(client, developer_token, config, state, digest_store, report_output,
+                              writer, operation_budget).run(units)
+    finally:
+        try:
+            await writer.close()
+        finally:
+            await client.transport.close()
@@ -0,0 +1,303 @@
+"""Optional change-only emission.
+
+Report streams re-query the days of the conversion window on every run, and
+core streams are FULL_TABLE, so most of what a run emits was emitted before,
+unchanged. A digest store is a SQLite database that keeps a digest of what
+was emitted, so unchanged records can be skipped:
+
+- `report_digest_path`: a digest of the metric values of every report row,
+  keyed by stream, customer and `_sdc_record_hash` (which covers everything
+  but the metrics). A re-queried row is only emitted again if its metrics
+  changed. Days before the start of each run's window are never queried
+  again, so their digests are deleted when a stream finishes for a customer.
+- `core_digest_path`: a digest of every core stream record, keyed by stream,
+  customer and primary key. Only new or changed entities are emitted. After a
+  complete scan of a stream, entities that are gone from it are dropped from
+  the store and, with `core_deletion_markers`, emitted with only their primary
+  key and `_sdc_deleted_at`.
+
+Digests are saved once a report day, or a core stream for a customer, has
+been emitted in full, so an interrupted sync emits those records again. The
+store assumes the target loads everything the tap emits: a target that drops
+records needs the store deleted to re-emit them.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Seconds to wait on a store another tap process has locked
+LOCK_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_digests (
+    stream TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    record_hash TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    PRIMARY KEY (stream, customer_id, record_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS report_digests_by_day ON report_digests (stream, customer_id, day);
+CREATE TABLE IF NOT EXISTS entity_digests (
+    stream TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    primary_key TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    scan INTEGER NOT NULL,
+    PRIMARY KEY (stream, customer_id, primary_key)
+) WITHOUT ROWID;
+"""
+
+DELETED_AT = "_sdc_deleted_at"
+
+# What a core stream scan has seen so far, kept apart from the store until the scan is saved
+SCAN_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS scan_digests (
+    primary_key TEXT PRIMARY KEY,
+    digest BLOB NOT NULL,
+    changed INTEGER NOT NULL
+) WITHOUT ROWID;
+DELETE FROM temp.scan_digests;
+"""
+
+# Rows staged at a time while scanning a core stream
+SCAN_BATCH_SIZE = 1000
+
+
+def digest_values(record, properties):
+    """A short digest of `record`'s values for `properties`"""
+    values = json.dumps([record.get(name) for name in properties]).encode("utf-8")
+    return hashlib.blake2b(values, digest_size=16).digest()
+
+
+class NullReportDay:
+    skipped = 0
+
+    def changed(self, record):  # pylint: disable=unused-argument
+        return True
+
+
+class ReportDay:
+    """The stored digests of one (stream, customer, day), and the ones to save"""
+
+    def __init__(self, stored, metric_properties):
+        self.stored = stored
+        self.metric_properties = metric_properties
+        self.updated = {}
+        self.skipped = 0
+
+    def changed(self, record):
+        """Whether `record`'s metrics differ from the ones last emitted for it"""
+        record_hash = record["_sdc_record_hash"]
+        digest = digest_values(record, self.metric_properties)
+        if self.stored.get(record_hash) == digest:
+            self.skipped += 1
+            return False
+        self.updated[record_hash] = digest
+        return True
+
+
+class NullEntityScan:
+    skipped = 0
+
+    def changed(self, record):  # pylint: disable=unused-argument
+        return True
+
+    def finish(self):
+        pass
+
+    def deleted_records(self):
+        return iter(())
+
+
+class EntityScan:
+    """Compare one scan of a core stream for a customer with the stored digests
+
+    The stored digests are read once, when the scan starts. What the scan sees
+    is staged in a temporary table, which other processes sharing the store
+    don't see or wait on, and `save` writes it to the store in one short
+    transaction. Once the scan has covered the whole stream, and `finish` says
+    so, stored entities it did not see are gone."""
+
+    def __init__(self, connection, stream, customer_id, primary_keys):
+        self.connection = connection
+        self.stream = stream
+        self.customer_id = customer_id
+        self.primary_keys = primary_keys
+        self.scan = time.time_ns()
+        self.stored = dict(connection.execute(
+            "SELECT primary_key, digest FROM entity_digests WHERE stream = ? AND customer_id = ?",
+            (stream, customer_id),
+        ))
+        connection.executescript(SCAN_SCHEMA)
+        self.pending = []
+        self.skipped = 0
+        self.complete = False
+
+    def changed(self, record):
+        """Whether `record` is new or differs from the one last emitted for its primary key"""
+        primary_key = json.dumps([record.get(key) for key in self.primary_keys])
+        digest = digest_values(record, sorted(record))
+        changed = self.stored.get(primary_key) != digest
+
+        self.pending.append((primary_key, digest, changed))
+        if len(self.pending) >= SCAN_BATCH_SIZE:
+            self.flush()
+
+        if not changed:
+            self.skipped += 1
+        return changed
+
+    def flush(self):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO temp.scan_digests (primary_key, digest, changed) VALUES (?, ?, ?)",
+            self.pending,
+        )
+        self.pending = []
+
+    def finish(self):
+        """Mark the scan as covering the whole stream, so the entities it did not see are dropped when saved"""
+        self.complete = True
+
+    def deleted_records(self):
+        """Yield a deletion marker for every stored entity a finished scan has not seen"""
+        if not self.complete:
+            raise RuntimeError("Only a finished scan knows which entities were deleted")
+        self.flush()
+        deleted_at = singer.utils.strftime(singer.utils.now())
+        rows = self.connection.execute(
+            "SELECT primary_key FROM entity_digests WHERE stream = ? AND customer_id = ? "
+            "AND primary_key NOT IN (SELECT primary_key FROM temp.scan_digests)",
+            (self.stream, self.customer_id),
+        ).fetchall()
+        for (primary_key,) in rows:
+            yield {**dict(zip(self.primary_keys, json.loads(primary_key))), DELETED_AT: deleted_at}
+
+    def save(self):
+        """Write the new and changed digests, and drop the entities a complete scan did not see"""
+        self.flush()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entity_digests (stream, customer_id, primary_key, digest, scan) "
+                "SELECT ?, ?, primary_key, digest, ? FROM temp.scan_digests WHERE changed",
+                (self.stream, self.customer_id, self.scan),
+            )
+            if self.complete:
+                self.connection.execute(
+                    "DELETE FROM entity_digests WHERE stream = ? AND customer_id = ? "
+                    "AND primary_key NOT IN (SELECT primary_key FROM temp.scan_digests)",
+                    (self.stream, self.customer_id),
+                )
+
+
+class NullDigestStore:
+    """Used when change-only emission is off"""
+
+    @contextmanager
+    def report_day(self, stream, customer_id, day, metric_properties):  # pylint: disable=unused-argument
+        yield NullReportDay()
+
+    def load_report_day(self, stream, customer_id, day, metric_properties):  # pylint: disable=unused-argument
+        return NullReportDay()
+
+    def save_report_day(self, stream, customer_id, day, report_day):
+        pass
+
+    def compact_reports(self, stream, customer_id, before_day):
+        pass
+
+    @contextmanager
+    def entity_scan(self, stream, customer_id, primary_keys):  # pylint: disable=unused-argument
+        yield NullEntityScan()
+
+    def close(self):
+        pass
+
+
+class DigestStore:
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    @contextmanager
+    def report_day(self, stream, customer_id, day, metric_properties):
+        """Yield a `ReportDay` comparing `metric_properties`, and save its digests if the whole day went through"""
+        report_day = self.load_report_day(stream, customer_id, day, metric_properties)
+        yield report_day
+        self.save_report_day(stream, customer_id, day, report_day)
+
+    def load_report_day(self, stream, customer_id, day, metric_properties):
+        rows = self.connection.execute(
+            "SELECT record_hash, digest FROM report_digests WHERE stream = ? AND customer_id = ? AND day = ?",
+            (stream, customer_id, day),
+        )
+        return ReportDay(dict(rows), metric_properties)
+
+    def save_report_day(self, stream, customer_id, day, report_day):
+        """Save the digests of a day once all of its records are written"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO report_digests (stream, customer_id, day, record_hash, digest) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((stream, customer_id, day, record_hash, digest)
+                 for record_hash, digest in report_day.updated.items()),
+            )
+        if report_day.skipped:
+            LOGGER.info(f"Skipped {report_day.skipped} unchanged {stream} rows for {day}.")
+
+    def compact_reports(self, stream, customer_id, before_day):
+        """Delete the digests of days this stream will not query again"""
+        with self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM report_digests WHERE stream = ? AND customer_id = ? AND day < ?",
+                (stream, customer_id, before_day),
+            ).rowcount
+        if deleted:
+            LOGGER.info(f"Deleted {deleted} {stream} digests from before {before_day}.")
+
+    @contextmanager
+    def entity_scan(self, stream, customer_id, primary_keys):
+        """Yield an `EntityScan`, and save its digests in one transaction if the scan went through"""
+        entity_scan = EntityScan(self.connection, stream, customer_id, primary_keys)
+        try:
+            yield entity_scan
+        except BaseException:
+            self.connection.rollback()
+            raise
+        entity_scan.save()
+        if entity_scan.skipped:
+            LOGGER.info(f"Skipped {entity_scan.skipped} unchanged {stream} records.")
+
+    def close(self):
+        self.connection.close()
+
+
+def create_digest_store(config, config_key):
+    """Open the digest store at `config[config_key]`, `report_digest_path` or `core_digest_path`"""
+    digest_path = config.get(config_key)
+    if not digest_path:
+        return NullDigestStore()
+    return DigestStore(digest_path)
+
+
+def get_core_deletion_markers(config):
+    """Whether `core_deletion_markers` asks for records of deleted core entities"""
+    core_deletion_markers = config.get("core_deletion_markers", False)
+    if isinstance(core_deletion_markers, str):
+        return core_deletion_markers.strip().lower() == "true"
+    return bool(core_deletion_markers)
+
+
+def add_deleted_at(schema):
+    """Return `schema` with the `_sdc_deleted_at` property of deletion markers"""
+    properties = dict(schema.get("properties", {}))
+    properties[DELETED_AT] = {"type": ["null", "string"], "format": "date-time"}
+    return dict(schema, properties=properties)
@@ -1,14 +1,18 @@
 import json
+import multiprocessing
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import singer
 
 from tap_google_ads.client import create_sdk_client
-from tap_google_ads.streams import initialize_core_streams
-from tap_google_ads.streams import initialize_reports
+from tap_google_ads.streams import CORE_STREAM_SPECS
+from tap_google_ads.streams import REPORT_STREAM_SPECS
 
 LOGGER = singer.get_logger()
 
+DEFAULT_DISCOVERY_PROCESSES = 1
+
 STREAMS = [
     "accessible_bidding_strategy",
     "ad_group",
@@ -158,6 +162,74 @@ def get_root_resource_name(field_name):
     return field_root_resource
 
 
+def build_base_resource_schema(api_objects):
+    """Describe every field and resource Google Ads returned, without the per stream `fields`"""
+    resource_schema = {}
+
+    for resource in api_objects:
+        resource_schema[resource.name] = build_resource_metadata(api_objects, resource)
+
+    for resource in resource_schema.values():
+        updated_segments = get_segments(resource_schema, resource)
+        resource["segments"] = updated_segments
+
+    return resource_schema
+
+
+def add_resource_fields(resource_schema, resource_name):
+    """Set `fields` on `resource_name`: every field it can return, with the fields each one can't be selected with"""
+    stream_object = resource_schema[resource_name]
+    fields = {}
+    attributes = stream_object["attributes"]
+    metrics = stream_object["metrics"]
+    segments = stream_object["segments"]
+    for field in attributes + metrics + segments:
+        field_schema = dict(resource_schema[field])
+
+        if field_schema["name"] in segments:
+            field_schema["category"] = "SEGMENT"
+
+        fields[field_schema["name"]] = {
+            "field_details": field_schema,
+            "incompatible_fields": [],
+        }
+
+    # Start discovery of field exclusions, in a fixed order so rediscovery
+    # lists incompatible fields the same way every time
+    metrics_and_segments = dict.fromkeys(metrics + segments)
+    root_resource_names = {field_name: get_root_resource_name(field_name) for field_name in fields}
+
+    for field_name, field in fields.items():
+        if field["field_details"]["category"] == "ATTRIBUTE":
+            continue
+        field_root_resource = root_resource_names[field_name]
+        for compared_field in metrics_and_segments:
+            compared_field_root_resource = root_resource_names[compared_field]
+
+            if (
+                field_name != compared_field
+                and not compared_field.startswith(f"{field_root_resource}.")
+            ):
+                field_to_check = field_root_resource or field_name
+                compared_field_to_check = compared_field_root_resource or compared_field
+
+                # The `selectable_with` for any given metric will not include
+                # any other metrics despite compatibility, so don't check those
+                if field_name.startswith("metrics.") and compared_field.startswith("metrics."):
+                    continue
+
+                # If a resource is selectable with another resource they should be in
+                # each other's 'selectable_with' list, but Google is missing some of
+                # these so we have to check both ways
+                if (
+                    field_to_check not in resource_schema[compared_field_to_check]["selectable_with"]
+                    and compared_field_to_check not in resource_schema[field_to_check]["selectable_with"]
+                ):
+                    field["incompatible_fields"].append(compared_field)
+
+    stream_object["fields"] = fields
+
+
 def create_resource_schema(config):
     """
     The resource schema is necessary to create a 'source of truth' with regards to the fields
@@ -172,90 +244,135 @@ def create_resource_schema(config):
     https://ads-developers.googleblog.com/2021/04/the-query-builder-blog-series-part-3.html
     """
 
-    resource_schema = {}
-
     api_objects = get_api_objects(config)
+    resource_schema = build_base_resource_schema(api_objects)
 
-    for resource in api_objects:
-        resource_schema[resource.name] = build_resource_metadata(api_objects, resource)
+    for stream in STREAMS:
+        add_resource_fields(resource_schema, stream)
+    return resource_schema
 
-    for resource in resource_schema.values():
-        updated_segments = get_segments(resource_schema, resource)
-        resource["segments"] = updated_segments
 
-    for stream in STREAMS:
-        stream_object = resource_schema[stream]
-        fields = {}
-        attributes = stream_object["attributes"]
-        metrics = stream_object["metrics"]
-        segments = stream_object["segments"]
-        for field in attributes + metrics + segments:
-            field_schema = dict(resource_schema[field])
-
-            if field_schema["name"] in segments:
-                field_schema["category"] = "SEGMENT"
-
-            fields[field_schema["name"]] = {
-                "field_details": field_schema,
-                "incompatible_fields": [],
-            }
-
-        # Start discovery of field exclusions
-        metrics_and_segments = set(metrics + segments)
-
-        for field_name, field in fields.items():
-            if field["field_details"]["category"] == "ATTRIBUTE":
-                continue
-            for compared_field in metrics_and_segments:
-                field_root_resource = get_root_resource_name(field_name)
-                compared_field_root_resource = get_root_resource_name(compared_field)
+def get_compact_catalog(config):
+    """Whether `compact_catalog` asks for a catalog without indentation"""
+    compact_catalog = config.get("compact_catalog", False)
+    if isinstance(compact_catalog, str):
+        return compact_catalog.strip().lower() == "true"
+    return bool(compact_catalog)
 
-                if (
-                    field_name != compared_field
-                    and not compared_field.startswith(f"{field_root_resource}.")
-                ):
-                    field_to_check = field_root_resource or field_name
-                    compared_field_to_check = compared_field_root_resource or compared_field
-
-                    # The `selectable_with` for any given metric will not include
-                    # any other metrics despite compatibility, so don't check those
-                    if field_name.startswith("metrics.") and compared_field.startswith("metrics."):
-                        continue
-
-                    # If a resource is selectable with another resource they should be in
-                    # each other's 'selectable_with' list, but Google is missing some of
-                    # these so we have to check both ways
-                    if (
-                        field_to_check not in resource_schema[compared_field_to_check]["selectable_with"]
-                        and compared_field_to_check not in resource_schema[field_to_check]["selectable_with"]
-                    ):
-                        field["incompatible_fields"].append(compared_field)
-
-        stream_object["fields"] = fields
-    return resource_schema
 
+def format_catalog_entry(catalog_entry, compact=False):
+    if compact:
+        return json.dumps(catalog_entry, separators=(",", ":"))
+    # Entries sit two levels deep in the catalog, so shift every line of them right by 4 spaces
+    return json.dumps(catalog_entry, indent=2).replace("\n", "\n    ")
 
-def do_discover_streams(stream_name_to_resource):
 
-    streams = []
-    for stream_name, stream in stream_name_to_resource.items():
+def write_formatted_catalog(formatted_entries, out, compact=False):
+    """Write `{"streams": [...]}` to `out` from entries already run through `format_catalog_entry`"""
+    if compact:
+        out.write('{"streams":[')
+        for index, formatted_entry in enumerate(formatted_entries):
+            if index:
+                out.write(",")
+            out.write(formatted_entry)
+        out.write("]}")
+        return
+
+    out.write('{\n  "streams": [')
+    wrote_entry = False
+    for formatted_entry in formatted_entries:
+        out.write(",\n    " if wrote_entry else "\n    ")
+        out.write(formatted_entry)
+        wrote_entry = True
+    out.write("\n  ]\n}" if wrote_entry else "]\n}")
+
+
+def write_catalog(catalog_entries, out, compact=False):
+    """Write `{"streams": [...]}` to `out`, serializing one catalog entry at a time.
+
+    The default output is byte for byte what `json.dump(catalog, out, indent=2)`
+    writes. `compact` drops all whitespace, which makes the catalog about a
+    third smaller and much faster to write."""
+    formatted_entries = (format_catalog_entry(catalog_entry, compact) for catalog_entry in catalog_entries)
+    write_formatted_catalog(formatted_entries, out, compact)
+
+
+def get_stream_specs():
+    return {**CORE_STREAM_SPECS, **REPORT_STREAM_SPECS}
+
+
+def build_catalog_entry(stream_name, stream):
+    return {
+        "tap_stream_id": stream_name,
+        "stream": stream_name,
+        "schema": stream.stream_schema,
+        "metadata": singer.metadata.to_list(stream.stream_metadata),
+    }
 
-        catalog_entry = {
-            "tap_stream_id": stream_name,
-            "stream": stream_name,
-            "schema": stream.stream_schema,
-            "metadata": singer.metadata.to_list(stream.stream_metadata),
-        }
-        streams.append(catalog_entry)
 
-    return streams
+def iter_catalog_entries(resource_schema):
+    """Build the streams one at a time, so each can be dropped once its catalog entry is written"""
+    for stream_name, spec in get_stream_specs().items():
+        yield build_catalog_entry(stream_name, spec.build(resource_schema))
 
 
-def do_discover(resource_schema):
-    core_streams = do_discover_streams(initialize_core_streams(resource_schema))
-    report_streams = do_discover_streams(initialize_reports(resource_schema))
-    streams = []
+# Set in each discovery worker process by `init_discovery_worker`
+WORKER_RESOURCE_SCHEMA = None
 
-    streams.extend(core_streams)
-    streams.extend(report_streams)
-    json.dump({"streams": streams}, sys.stdout, indent=2)
+
+def init_discovery_worker(resource_schema):
+    global WORKER_RESOURCE_SCHEMA  # pylint: disable=global-statement
+    WORKER_RESOURCE_SCHEMA = resource_schema
+
+
+def format_stream_entry(stream_name, spec, compact):
+    """Build and format one catalog entry in a discovery worker"""
+    stream = spec.build(WORKER_RESOURCE_SCHEMA)
+    return format_catalog_entry(build_catalog_entry(stream_name, stream), compact)
+
+
+def get_discovery_mp_context():
+    """Fork the discovery workers where the platform can, so they share the resource schema"""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def iter_formatted_entries_in_parallel(resource_schema, processes, compact):
+    """Build and format the catalog entries on a pool of `processes` workers.
+
+    Workers are forked where the platform supports it, and then share the
+    parent's resource schema without copying it; elsewhere it is pickled
+    to each worker once. Each worker is sent the spec of the stream it
+    builds. Only the formatted entries come back, in stream order, so the
+    catalog is the same as the one `iter_catalog_entries` produces."""
+    stream_specs = get_stream_specs()
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=get_discovery_mp_context(),
+                             initializer=init_discovery_worker,
+                             initargs=(resource_schema,)) as executor:
+        yield from executor.map(format_stream_entry, stream_specs, stream_specs.values(),
+                                [compact] * len(stream_specs))
+
+
+def get_discovery_processes(config):
+    """Get `discovery_processes` from config, falling back to building streams in this process"""
+    discovery_processes = config.get("discovery_processes") or DEFAULT_DISCOVERY_PROCESSES
+
+    try:
+        discovery_processes = int(discovery_processes)
+    except (ValueError, TypeError):
+        discovery_processes = 0
+    if discovery_processes < 1:
+        LOGGER.warning(f"The provided discovery_processes {config.get('discovery_processes')} is invalid; "
+                       f"it will be set to the default of {DEFAULT_DISCOVERY_PROCESSES}.")
+        discovery_processes = DEFAULT_DISCOVERY_PROCESSES
+    return discovery_processes
+
+
+def do_discover(resource_schema, compact=False, processes=DEFAULT_DISCOVERY_PROCESSES):
+    if processes > 1:
+        formatted_entries = iter_formatted_entries_in_parallel(resource_schema, processes, compact)
+        write_formatted_catalog(formatted_entries, sys.stdout, compact=compact)
+    else:
+        write_catalog(iter_catalog_entries(resource_schema), sys.stdout, compact=compact)
@@ -0,0 +1,211 @@
+"""Incremental discovery, driven by `discovery_cache_dir`.
+
+Most of the time discovery spends is in `add_resource_fields`, which works
+out the incompatible fields of every resource a stream reads from. What it
+produces only depends on a small part of what `GoogleAdsFieldService`
+returns, so each stream gets a fingerprint of exactly that part:
+
+- the stream's spec: its class, its `report_definitions` field list, the
+  resources it reads from and its keys
+- every field those resources can return, as described by the field service
+- the `selectable_with` of the resources those fields belong to
+
+`catalog_cache.json` keeps each stream's fingerprint next to its catalog
+entry. On rediscovery, a stream whose fingerprint has not changed reuses its
+cached entry and the rest are rebuilt. `discovery_diff.json` then describes
+which streams were added, removed, changed or left as they were, and which
+properties of the changed streams differ from the previous catalog.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import singer
+
+from tap_google_ads.discover import add_resource_fields
+from tap_google_ads.discover import build_base_resource_schema
+from tap_google_ads.discover import build_catalog_entry
+from tap_google_ads.discover import get_api_objects
+from tap_google_ads.discover import get_root_resource_name
+from tap_google_ads.discover import get_stream_specs
+from tap_google_ads.discover import write_catalog
+
+LOGGER = singer.get_logger()
+
+# Bump this when a change to the tap changes the catalog it writes for the
+# same fields, so caches written by older versions are rebuilt
+CACHE_VERSION = 2
+
+CACHE_FILE_NAME = "catalog_cache.json"
+DIFF_FILE_NAME = "discovery_diff.json"
+
+
+def fingerprint(value):
+    # `selectable_with` is a set, so serialize sets as sorted lists
+    serialized = json.dumps(value, sort_keys=True, default=sorted, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def resource_fingerprint(resource_schema, resource_name, field_fingerprints):
+    """Fingerprint everything `add_resource_fields` reads for `resource_name`
+
+    Most fields belong to many resources, so each one is only fingerprinted
+    once, into `field_fingerprints`."""
+    resource = resource_schema[resource_name]
+    field_names = resource["attributes"] + resource["metrics"] + resource["segments"]
+    for field_name in field_names:
+        if field_name not in field_fingerprints:
+            field_fingerprints[field_name] = fingerprint(resource_schema[field_name])
+
+    root_resource_names = {get_root_resource_name(field_name) for field_name in field_names}
+    return fingerprint({
+        "resource": resource,
+        "fields": [field_fingerprints[field_name] for field_name in field_names],
+        "selectable_with": {
+            root_resource_name: resource_schema[root_resource_name]["selectable_with"]
+            for root_resource_name in root_resource_names
+            if root_resource_name in resource_schema
+        },
+    })
+
+
+def stream_fingerprint(spec, resource_fingerprints):
+    return fingerprint({
+        "version": CACHE_VERSION,
+        "stream_class": spec.stream_class.__name__,
+        "fields": spec.fields,
+        "google_ads_resource_names": spec.google_ads_resource_names,
+        "primary_keys": spec.primary_keys,
+        "automatic_keys": spec.automatic_keys,
+        "filter_param": spec.filter_param,
+        "resources": [resource_fingerprints[resource_name] for resource_name in spec.google_ads_resource_names],
+    })
+
+
+def load_cache(cache_path):
+    """Read the cached streams, ignoring a cache that is missing, unreadable or from another version"""
+    try:
+        with open(cache_path, encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as err:
+        LOGGER.warning(f"Could not read the discovery cache at {cache_path}, rebuilding every stream: {err}")
+        return {}
+
+    if cache.get("version") != CACHE_VERSION:
+        LOGGER.info(f"The discovery cache at {cache_path} is from another version of the tap, rebuilding every stream")
+        return {}
+    return cache.get("streams", {})
+
+
+def write_json(path, value):
+    """Write `value` to `path` through a temporary file, so a failed write leaves the old file in place"""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as json_file:
+        json_file.write(json.dumps(value, separators=(",", ":")))
+    os.replace(temporary_path, path)
+
+
+def get_properties(catalog_entry):
+    """Map each property of a catalog entry to its schema and metadata"""
+    metadata = {
+        tuple(mdata["breadcrumb"]): mdata["metadata"]
+        for mdata in catalog_entry["metadata"]
+    }
+    return {
+        name: (schema, metadata.get(("properties", name)))
+        for name, schema in catalog_entry["schema"]["properties"].items()
+    }
+
+
+def diff_catalog_entries(previous_entry, catalog_entry):
+    # Compare the entry the way it will be read back from the cache, with lists for tuples
+    catalog_entry = json.loads(json.dumps(catalog_entry))
+    previous_properties = get_properties(previous_entry)
+    properties = get_properties(catalog_entry)
+    return {
+        "properties_added": sorted(properties.keys() - previous_properties.keys()),
+        "properties_removed": sorted(previous_properties.keys() - properties.keys()),
+        "properties_changed": sorted(
+            name for name in properties.keys() & previous_properties.keys()
+            if properties[name] != previous_properties[name]
+        ),
+    }
+
+
+class IncrementalDiscovery:
+    """Build catalog entries, reusing the cached ones whose fingerprint is unchanged"""
+
+    def __init__(self, resource_schema, cached_streams):
+        self.resource_schema = resource_schema
+        self.cached_streams = cached_streams
+        self.field_fingerprints = {}
+        self.resource_fingerprints = {}
+        self.resources_with_fields = set()
+        self.streams = {}
+        self.diff = {"added": [], "removed": [], "changed": {}, "unchanged": []}
+
+    def get_resource_fingerprints(self, spec):
+        for resource_name in spec.google_ads_resource_names:
+            if resource_name not in self.resource_fingerprints:
+                self.resource_fingerprints[resource_name] = resource_fingerprint(self.resource_schema, resource_name,
+                                                                          self.field_fingerprints)
+        return self.resource_fingerprints
+
+    def build_stream(self, spec):
+        for resource_name in spec.google_ads_resource_names:
+            if resource_name not in self.resources_with_fields:
+                add_resource_fields(self.resource_schema, resource_name)
+                self.resources_with_fields.add(resource_name)
+        return spec.build(self.resource_schema)
+
+    def iter_catalog_entries(self):
+        stream_specs = get_stream_specs()
+
+        for stream_name, spec in stream_specs.items():
+            current_fingerprint = stream_fingerprint(spec, self.get_resource_fingerprints(spec))
+            cached_stream = self.cached_streams.get(stream_name)
+
+            if cached_stream and cached_stream["fingerprint"] == current_fingerprint:
+                catalog_entry = cached_stream["catalog_entry"]
+                self.diff["unchanged"].append(stream_name)
+            else:
+                catalog_entry = build_catalog_entry(stream_name, self.build_stream(spec))
+                if cached_stream:
+                    self.diff["changed"][stream_name] = diff_catalog_entries(cached_stream["catalog_entry"],
+                                                                             catalog_entry)
+                else:
+                    self.diff["added"].append(stream_name)
+
+            self.streams[stream_name] = {"fingerprint": current_fingerprint, "catalog_entry": catalog_entry}
+            yield catalog_entry
+
+        self.diff["removed"] = sorted(self.cached_streams.keys() - stream_specs.keys())
+
+
+def discover_incrementally(resource_schema, cache_dir, compact=False):
+    """Write the catalog, rebuilding only the streams whose fingerprint changed since the last run
+
+    `resource_schema` is the output of `build_base_resource_schema`; `fields`
+    are only added to the resources of the streams that get rebuilt."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, CACHE_FILE_NAME)
+
+    discovery = IncrementalDiscovery(resource_schema, load_cache(cache_path))
+    write_catalog(discovery.iter_catalog_entries(), sys.stdout, compact=compact)
+
+    write_json(cache_path, {"version": CACHE_VERSION, "streams": discovery.streams})
+    write_json(os.path.join(cache_dir, DIFF_FILE_NAME), discovery.diff)
+
+    diff = discovery.diff
+    LOGGER.info(f"Incremental discovery rebuilt {len(diff['added']) + len(diff['changed'])} streams "
+                f"({len(diff['added'])} added, {len(diff['changed'])} changed), "
+                f"reused {len(diff['unchanged'])} and dropped {len(diff['removed'])}")
+    return diff
+
+
+def do_incremental_discover(config, cache_dir, compact=False):
+    resource_schema = build_base_resource_schema(get_api_objects(config))
+    return discover_incrementally(resource_schema, cache_dir, compact=compact)
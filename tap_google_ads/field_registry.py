@@ -0,0 +1,55 @@
+"""Compiled views of the field lists in `report_definitions`.
+
+The lists in `report_definitions` are meant to be read and edited by people,
+so they are plain lists and some fields appear in them twice. Streams work
+from a `CompiledFields` instead:
+
+- `names`: the fields in their original order, each listed once
+- `columns`: the stream column each field ends up in
+
+`transform_exclusion_name` memoizes the names used in `fieldExclusions`,
+which are looked up thousands of times while building report metadata.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+CompiledFields = namedtuple("CompiledFields", ["names", "columns"])
+
+
+def transform_field_name(field_name):
+    """Return the report stream column for an API field name
+
+    - `ad_group_ad.ad.x` is lifted up to `x`
+    - `metrics.x` and `segments.x` become `x`
+    - `resource.x` becomes `resource_x`"""
+    parts = field_name.split(".")
+    if field_name.startswith("ad_group_ad.ad."):
+        return parts[2]
+    if parts[0] in {"metrics", "segments"}:
+        return parts[1]
+    return "_".join(parts[:2])
+
+
+@lru_cache(maxsize=None)
+def transform_exclusion_name(field_name):
+    """Return the name a report stream uses for a field in its `fieldExclusions`
+
+    Unlike `transform_field_name`, nested resource fields keep every part:
+    `ad_group_ad.ad.id` becomes `ad_group_ad_ad_id`."""
+    if field_name.startswith("metrics.") or field_name.startswith("segments."):
+        return field_name.split(".")[1]
+    return field_name.replace(".", "_")
+
+
+@lru_cache(maxsize=None)
+def compile_field_tuple(fields):
+    names = tuple(dict.fromkeys(fields))
+    return CompiledFields(
+        names=names,
+        columns={field_name: transform_field_name(field_name) for field_name in names},
+    )
+
+
+def compile_fields(fields):
+    """Return the `CompiledFields` for a list of API field names, compiled once per distinct list"""
+    return compile_field_tuple(tuple(fields))
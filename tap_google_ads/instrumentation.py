@@ -0,0 +1,210 @@
+"""Request-level instrumentation for the sync loops.
+
+Every request made through `make_request` is attributed to the unit of work
+that is currently active, a (stream, customer, date) triple for report streams
+and a (stream, customer) pair for core streams. For each unit we keep the
+request latency, the time until the first row came back, the row and byte
+counts, and how often and how long backoff made us wait. The next pages of a
+result are fetched as it is iterated, and each fetch is timed as a request of
+its own.
+
+The active unit is held in a context variable, like the message sink, so a
+sync running on another thread, such as one of `iter_records`, keeps its own.
+"""
+import contextvars
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import singer
+from singer import metrics
+
+LOGGER = singer.get_logger()
+
+_CURRENT_UNIT = contextvars.ContextVar("tap_google_ads_current_unit", default=None)
+
+
+class UnitStats:  # pylint: disable=too-many-instance-attributes
+    """Counters for a single (stream, customer, date) unit of work"""
+
+    def __init__(self, stream, customer_id, date=None):
+        self.stream = stream
+        self.customer_id = customer_id
+        self.date = date
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.max_request_seconds = 0.0
+        self.time_to_first_row = None
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.last_request_started = None
+
+    @property
+    def rows_per_second(self):
+        if not self.wall_seconds:
+            return 0.0
+        return self.rows / self.wall_seconds
+
+    def add_request(self, started):
+        """Count a successful request, or fetch of a next page, that began at `started`"""
+        seconds = time.monotonic() - started
+        self.requests += 1
+        self.request_seconds += seconds
+        self.max_request_seconds = max(self.max_request_seconds, seconds)
+        self.last_request_started = started
+
+    def iter_pages(self, pages):
+        """Yield the pages of a response, timing the fetch of every page after the first
+
+        The first page comes back with the request `make_request` already counted."""
+        pages = iter(pages)
+        first_page = True
+        while True:
+            started = time.monotonic()
+            page = next(pages, None)
+            if page is None:
+                return
+            if not first_page:
+                self.add_request(started)
+            first_page = False
+            yield page
+
+    def iter_response_rows(self, response):
+        """`iter_rows` over every page of a `search` response, timing the fetch of each page"""
+        pages = getattr(response, "pages", None)
+        if pages is None:
+            return self.iter_rows(response)
+        return self.iter_rows(row for page in self.iter_pages(pages) for row in page.results)
+
+    def add_backoff(self, wait):
+        """Count a retry and the time we are about to sleep before it"""
+        self.retries += 1
+        self.backoff_seconds += wait or 0.0
+
+    def iter_rows(self, response):
+        """Yield the rows of `response`, counting rows and bytes as they go by"""
+        first_row_seen = self.time_to_first_row is not None
+        for message in response:
+            if not first_row_seen:
+                first_row_seen = True
+                if self.last_request_started is not None:
+                    self.time_to_first_row = time.monotonic() - self.last_request_started
+            self.rows += 1
+            self.bytes += message.ByteSize()
+            yield message
+
+    def to_dict(self):
+        return {
+            "stream": self.stream,
+            "customer_id": self.customer_id,
+            "date": self.date,
+            "requests": self.requests,
+            "request_seconds": round(self.request_seconds, 6),
+            "max_request_seconds": round(self.max_request_seconds, 6),
+            "time_to_first_row": None if self.time_to_first_row is None else round(self.time_to_first_row, 6),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rows_per_second": round(self.rows_per_second, 3),
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 6),
+            "wall_seconds": round(self.wall_seconds, 6),
+        }
+
+
+def summarize_units(units, key):
+    """Aggregate unit stats by `key` ("stream" or "customer_id"), slowest first"""
+    totals = defaultdict(lambda: {"units": 0, "requests": 0, "request_seconds": 0.0, "rows": 0,
+                                  "bytes": 0, "retries": 0, "backoff_seconds": 0.0, "wall_seconds": 0.0})
+    for unit in units:
+        total = totals[unit[key]]
+        total["units"] += 1
+        for counter in ("requests", "request_seconds", "rows", "bytes", "retries", "backoff_seconds", "wall_seconds"):
+            total[counter] += unit[counter]
+
+    return [dict(total, **{key: name})
+            for name, total in sorted(totals.items(), key=lambda item: item[1]["wall_seconds"], reverse=True)]
+
+
+class SyncInstrumentation:
+
+    def __init__(self):
+        self.units = {}
+
+    def reset(self):
+        self.units = {}
+
+    @property
+    def current(self):
+        """The stats of the unit active in this context, if any"""
+        return _CURRENT_UNIT.get()
+
+    def get_unit(self, stream, customer_id, date=None):
+        """The stats of (stream, customer_id, date), for code that counts its requests itself"""
+        key = (stream, customer_id, date)
+        stats = self.units.get(key)
+        if stats is None:
+            stats = self.units[key] = UnitStats(stream, customer_id, date)
+        return stats
+
+    @contextmanager
+    def unit(self, stream, customer_id, date=None):
+        """Attribute every request made inside the block to (stream, customer_id, date)"""
+        stats = self.get_unit(stream, customer_id, date)
+
+        token = _CURRENT_UNIT.set(stats)
+        started = time.monotonic()
+        try:
+            yield stats
+        finally:
+            stats.wall_seconds += time.monotonic() - started
+            _CURRENT_UNIT.reset(token)
+            self.log_unit(stats)
+
+    def record_request(self, started):
+        """Called by `make_request` after a successful `search` call that began at `started`"""
+        stats = self.current
+        if stats is not None:
+            stats.add_request(started)
+
+    def on_backoff(self, details):
+        """`backoff` handler: count the retry and the time we are about to sleep"""
+        stats = self.current
+        if stats is not None:
+            stats.add_backoff(details.get("wait"))
+
+    @staticmethod
+    def log_unit(stats):
+        tags = {
+            "stream": stats.stream,
+            "customer_id": stats.customer_id,
+            "date": stats.date,
+            "requests": stats.requests,
+            "max_request_seconds": stats.max_request_seconds,
+            "time_to_first_row": stats.time_to_first_row,
+            "rows": stats.rows,
+            "bytes": stats.bytes,
+            "rows_per_second": round(stats.rows_per_second, 3),
+            "retries": stats.retries,
+            "backoff_seconds": stats.backoff_seconds,
+        }
+        metrics.log(LOGGER, metrics.Point("timer", "google_ads_request_duration", stats.request_seconds, tags))
+
+    def summary(self):
+        units = [stats.to_dict() for stats in self.units.values()]
+        return {
+            "units": units,
+            "streams": summarize_units(units, "stream"),
+            "customers": summarize_units(units, "customer_id"),
+        }
+
+    def write_summary(self, path):
+        with open(path, "w", encoding="utf-8") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+        LOGGER.info("Wrote request instrumentation summary to %s", path)
+
+
+INSTRUMENTATION = SyncInstrumentation()
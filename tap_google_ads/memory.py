@@ -0,0 +1,112 @@
+"""Optional memory tracking for sync.
+
+When `memory_report_path` is set in the config, the sync runs under
+`tracemalloc` and every (stream, customer) unit records:
+
+- `peak_kib`: the highest traced allocation above what was live when the unit started
+- `steady_state_kib`: the median of periodic samples over the second half of the
+  unit, which is where a streaming sync should have levelled off
+- `retained_kib`: what was still allocated when the unit finished
+
+The units are logged as they finish and written to `memory_report_path` as
+JSON at the end of the run. Tracing slows the sync down noticeably, so it is
+off by default.
+"""
+import json
+import statistics
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Seconds between samples of the traced memory while a unit runs
+SAMPLE_INTERVAL = 0.05
+
+
+def to_kib(size):
+    return round(size / 1024, 1)
+
+
+class MemorySampler(threading.Thread):
+    """Sample the traced memory every `interval` seconds until stopped"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(tracemalloc.get_traced_memory()[0])
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.samples
+
+
+class NullMemoryTracker:
+    """Used when memory tracking is off"""
+
+    @contextmanager
+    def unit(self, stream, customer_id):  # pylint: disable=unused-argument
+        yield
+
+    def write_report(self):
+        pass
+
+
+class MemoryTracker:
+
+    def __init__(self, report_path, sample_interval=SAMPLE_INTERVAL):
+        self.report_path = report_path
+        self.sample_interval = sample_interval
+        self.units = []
+
+    @contextmanager
+    def unit(self, stream, customer_id):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        sampler = MemorySampler(self.sample_interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            samples = sampler.stop()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            # The first half of a unit is ramp up: schemas, the first page, the Transformer
+            steady_samples = samples[len(samples) // 2:] or [current]
+            stats = {
+                "stream": stream,
+                "customer_id": customer_id,
+                "peak_kib": to_kib(peak - baseline),
+                "steady_state_kib": to_kib(statistics.median(steady_samples) - baseline),
+                "retained_kib": to_kib(current - baseline),
+                "samples": len(samples),
+            }
+            self.units.append(stats)
+            LOGGER.info("Memory for %s, customer %s: peak %s KiB, steady state %s KiB, retained %s KiB",
+                        stream, customer_id, stats["peak_kib"], stats["steady_state_kib"], stats["retained_kib"])
+
+    def write_report(self):
+        with open(self.report_path, "w", encoding="utf-8") as report_file:
+            json.dump({"units": self.units}, report_file, indent=2)
+        LOGGER.info("Wrote memory report to %s", self.report_path)
+
+
+def create_memory_tracker(config):
+    report_path = config.get("memory_report_path")
+    if not report_path:
+        return NullMemoryTracker()
+    return MemoryTracker(report_path)
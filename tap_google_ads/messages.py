@@ -0,0 +1,50 @@
+"""Where the tap's Singer messages go.
+
+The sync writes every SCHEMA, RECORD and STATE message through these
+functions. By default they go to stdout through singer-python, as the
+`tap-google-ads` command needs. `iter_records` installs a sink for the
+thread it syncs on, and gets the messages as Python objects instead.
+
+The sink is held in a context variable, so it is seen by the tasks of the
+async engine and by nothing outside the sync that installed it.
+"""
+import contextvars
+from contextlib import contextmanager
+
+import singer
+
+_SINK = contextvars.ContextVar("tap_google_ads_message_sink", default=None)
+
+
+@contextmanager
+def message_sink(sink):
+    """Send the messages written in this context to `sink.write_message` instead of stdout"""
+    token = _SINK.set(sink)
+    try:
+        yield sink
+    finally:
+        _SINK.reset(token)
+
+
+def write_record(stream_name, record):
+    sink = _SINK.get()
+    if sink is None:
+        singer.write_record(stream_name, record)
+    else:
+        sink.write_message(singer.RecordMessage(stream=stream_name, record=record))
+
+
+def write_schema(stream_name, schema, key_properties):
+    sink = _SINK.get()
+    if sink is None:
+        singer.messages.write_schema(stream_name, schema, key_properties)
+    else:
+        sink.write_message(singer.SchemaMessage(stream=stream_name, schema=schema, key_properties=key_properties))
+
+
+def write_state(state):
+    sink = _SINK.get()
+    if sink is None:
+        singer.write_state(state)
+    else:
+        sink.write_message(singer.StateMessage(value=state))
@@ -0,0 +1,261 @@
+"""Optional accounting of the developer token's daily operations.
+
+A developer token with Basic access can make a limited number of API
+operations a day. Every Search request the tap makes is one operation,
+except the requests for the next pages of a result, which Google does not
+count. With `operation_budget_path` set, the tap keeps how many operations
+each developer token made on each day in a SQLite database, so every run,
+and every shard syncing at the same time, sees what the others spent. The
+token is stored as a hash, never as it is. Google's days start at midnight
+Pacific time, and so do the ones here. A run reads what was spent once, when
+it starts, and keeps count of its own operations from there, so it doesn't
+see what shards running at the same time spend after that.
+
+Before a sync, the tap plans one operation per core stream and customer,
+and one per report day, and compares that with what is left of
+`daily_operation_limit`. If the plan does not fit, report days are left for
+a later run, the least recent first:
+
+- A report day before the bookmark is re-queried to pick up late metrics.
+  These days are dropped oldest first.
+- A day after the bookmark is new, and the bookmark only moves past a day
+  once every day before it is synced. New days are kept from the bookmark
+  on, so the ones left for later are always the latest of a customer's
+  stream. A stream and customer whose new days start before everyone
+  else's, a backfill, gets what is left once the recent days are planned.
+
+Core streams are always synced. A core stream that supports `query_limit`
+makes one query per `query_limit` entities, which can't be known before it
+runs, so the plan counts one and is a lower bound. Report days therefore also
+stop once the limit is reached.
+"""
+import contextvars
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pytz
+import singer
+from singer import utils
+
+LOGGER = singer.get_logger()
+
+DEFAULT_DAILY_OPERATION_LIMIT = 15000
+
+# Seconds to wait on a database another tap process has locked
+LOCK_TIMEOUT = 60
+
+# Operations counted in memory before they are added to the database
+FLUSH_EVERY = 20
+
+QUOTA_TIMEZONE = pytz.timezone("America/Los_Angeles")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    token_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    operations INTEGER NOT NULL,
+    PRIMARY KEY (token_id, day)
+) WITHOUT ROWID;
+"""
+
+_BUDGET = contextvars.ContextVar("tap_google_ads_operation_budget", default=None)
+
+
+def get_daily_operation_limit(config):
+    """Get `daily_operation_limit` from config, falling back to the limit of Basic access"""
+    daily_operation_limit = config.get("daily_operation_limit") or DEFAULT_DAILY_OPERATION_LIMIT
+
+    try:
+        daily_operation_limit = int(daily_operation_limit)
+    except (ValueError, TypeError):
+        daily_operation_limit = 0
+    if daily_operation_limit < 1:
+        LOGGER.warning(f"The provided daily_operation_limit {config.get('daily_operation_limit')} is invalid; "
+                       f"it will be set to the default of {DEFAULT_DAILY_OPERATION_LIMIT}.")
+        daily_operation_limit = DEFAULT_DAILY_OPERATION_LIMIT
+    return daily_operation_limit
+
+
+def get_token_id(developer_token):
+    """A key for a developer token that does not reveal it"""
+    return hashlib.sha256(developer_token.encode("utf-8")).hexdigest()[:16]
+
+
+def get_quota_day(now=None):
+    """The day Google counts operations towards, in Pacific time"""
+    if now is None:
+        now = utils.now()
+    return now.astimezone(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+
+@contextmanager
+def spending(budget):
+    """Count the operations made in this context against `budget`"""
+    token = _BUDGET.set(budget)
+    try:
+        yield budget
+    finally:
+        _BUDGET.reset(token)
+
+
+def record_operation():
+    """Called by the searches for every request that is not for a next page"""
+    budget = _BUDGET.get()
+    if budget is not None:
+        budget.add(1)
+
+
+def iter_days(query_date, end_date):
+    while query_date <= end_date:
+        yield query_date
+        query_date += timedelta(days=1)
+
+
+def plan_report_days(date_ranges, budget):
+    """Choose the report days to query with `budget` operations
+
+    `date_ranges` maps a (stream, customer id) to the first and last day
+    `get_date_range` would query, and its bookmark, None without one. Returns
+    the same keys with the first and last day to query, where a last day
+    before the first means the stream waits for a later run."""
+    # (most recent day it needs, days, key, whether they are new)
+    candidates = []
+    for key, (query_date, end_date, bookmark) in date_ranges.items():
+        days = list(iter_days(query_date, end_date))
+        refresh_days = [day for day in days if bookmark is not None and day <= bookmark]
+        new_days = days[len(refresh_days):]
+        candidates.extend((day, [day], key, False) for day in refresh_days)
+        if new_days:
+            # New days are only useful from the first one on, so they are as recent as it is
+            candidates.append((new_days[0], new_days, key, True))
+
+    planned = {key: [] for key in date_ranges}
+    backfills = []
+    for _, days, key, new in sorted(candidates, key=lambda candidate: candidate[0], reverse=True):
+        if len(days) <= budget:
+            planned[key].extend(days)
+            budget -= len(days)
+        elif new:
+            backfills.append((days, key))
+    for days, key in backfills:
+        if budget <= 0:
+            break
+        planned[key].extend(days[:budget])
+        budget -= len(days[:budget])
+
+    plan = {}
+    for key, (query_date, _, _) in date_ranges.items():
+        days = sorted(planned[key])
+        if days:
+            plan[key] = (days[0], days[-1])
+        else:
+            plan[key] = (query_date, query_date - timedelta(days=1))
+    return plan
+
+
+class NullOperationBudget:
+    """Used when operation accounting is off"""
+
+    def add(self, operations):
+        pass
+
+    def plan(self, core_operations, date_ranges):  # pylint: disable=unused-argument
+        return None
+
+    def limit_date_range(self, stream, customer_id, query_date, end_date):  # pylint: disable=unused-argument
+        return query_date, end_date
+
+    def exhausted(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class OperationBudget:
+
+    def __init__(self, path, developer_token, daily_limit):
+        self.connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.token_id = get_token_id(developer_token)
+        self.daily_limit = daily_limit
+        self.pending = 0
+        self.date_ranges = {}
+        row = self.connection.execute(
+            "SELECT operations FROM operations WHERE token_id = ? AND day = ?",
+            (self.token_id, get_quota_day()),
+        ).fetchone()
+        # Today's operations as of opening, and every one this run made since
+        self.spent = row[0] if row else 0
+
+    def add(self, operations):
+        self.spent += operations
+        self.pending += operations
+        if self.pending >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # Adding in SQL keeps the count right when shards spend the same token at the same time
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO operations (token_id, day, operations) VALUES (?, ?, ?) "
+                "ON CONFLICT (token_id, day) DO UPDATE SET operations = operations + excluded.operations",
+                (self.token_id, get_quota_day(), self.pending),
+            )
+        self.pending = 0
+
+    def used(self):
+        """The operations the developer token made today, as far as this run knows"""
+        return self.spent
+
+    def remaining(self):
+        return max(self.daily_limit - self.used(), 0)
+
+    def exhausted(self):
+        return self.remaining() == 0
+
+    def plan(self, core_operations, date_ranges):
+        """Plan the report days of a sync that also makes `core_operations` core stream requests
+
+        `date_ranges` is as `plan_report_days` takes it. Returns the plan."""
+        remaining = self.remaining()
+        report_days = sum(len(list(iter_days(query_date, end_date)))
+                          for query_date, end_date, _ in date_ranges.values())
+        planned = core_operations + report_days
+        LOGGER.info(f"Planned {planned} operations: {core_operations} for core streams and {report_days} "
+                    f"report days. {remaining} of the daily limit of {self.daily_limit} are left.")
+
+        self.date_ranges = plan_report_days(date_ranges, remaining - core_operations)
+        deferred = report_days - sum(len(list(iter_days(query_date, end_date)))
+                                     for query_date, end_date in self.date_ranges.values())
+        if deferred:
+            LOGGER.warning(f"Leaving {deferred} report days for a later run to stay within the daily "
+                           f"operation limit.")
+        return self.date_ranges
+
+    def limit_date_range(self, stream, customer_id, query_date, end_date):
+        """The days of `get_date_range` a report stream queries for a customer, as planned"""
+        planned = self.date_ranges.get((stream, customer_id))
+        if planned is None:
+            return query_date, end_date
+        first_day, last_day = planned
+        if last_day < first_day:
+            return query_date, query_date - timedelta(days=1)
+        return max(query_date, first_day), min(end_date, last_day)
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+def create_operation_budget(config):
+    """Open the operation accounting at `operation_budget_path`, if it is set"""
+    operation_budget_path = config.get("operation_budget_path")
+    if not operation_budget_path:
+        return NullOperationBudget()
+    return OperationBudget(operation_budget_path, config["developer_token"], get_daily_operation_limit(config))
@@ -0,0 +1,170 @@
+"""Built-in profiling for discovery and sync.
+
+When `profile_dir` is set in the config, discovery and every
+(stream, customer) sync run under `cProfile`. Each unit is written to
+`<profile_dir>/<unit>.prof`, and at the end of the run the units are merged
+into `merged.prof`, a folded-stack `merged.folded` that flame graph tools
+(flamegraph.pl, speedscope, inferno) read directly, and `hot_functions.json`
+with the wall time spent in the per-row pipeline functions.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+from contextlib import contextmanager
+
+import singer
+from singer import Transformer
+
+from tap_google_ads import messages
+from tap_google_ads import streams
+from tap_google_ads.record_hash import RecordHasher
+
+LOGGER = singer.get_logger()
+
+# Ignore call paths that account for less than this many seconds when folding
+MIN_FOLDED_SECONDS = 1e-6
+MAX_FOLDED_DEPTH = 200
+
+
+def function_key(function):
+    code = function.__code__
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def get_hot_functions():
+    """The per-row pipeline functions whose wall time we always report"""
+    return {
+        "google_message_to_json": [function_key(streams.google_message_to_json)],
+        "transform_keys": [function_key(streams.BaseStream.transform_keys),
+                           function_key(streams.UserInterestStream.transform_keys),
+                           function_key(streams.ReportStream.transform_keys)],
+        "Transformer.transform": [function_key(Transformer.transform)],
+        # `generate_hash` hashes through a `RecordHasher` too
+        "generate_hash": [function_key(RecordHasher.hash)],
+        # Every record goes through here, to stdout, a compressed stream or an `iter_records` sink
+        "write_record": [function_key(messages.write_record)],
+    }
+
+
+def safe_file_name(unit_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", unit_name)
+
+
+def format_function(func):
+    filename, line, name = func
+    if filename == "~":
+        # Built-in functions are reported as ("~", 0, "<built-in method ...>")
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def stats_to_folded(stats):
+    """Turn the call graph in `stats` into folded stacks ("a;b;c <microseconds>").
+
+    cProfile only records caller/callee edges, so a function's self time is
+    split between its call paths in proportion to the cumulative time each
+    caller spent in it."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_cumtime) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_cumtime))
+
+    folded = {}
+
+    def walk(func, path, fraction):
+        tottime = stats.stats[func][2]
+        path = path + (format_function(func),)
+        self_seconds = tottime * fraction
+        if self_seconds >= MIN_FOLDED_SECONDS:
+            stack = ";".join(path)
+            folded[stack] = folded.get(stack, 0.0) + self_seconds
+
+        for callee, edge_cumtime in callees.get(func, []):
+            callee_cumtime = stats.stats[callee][3]
+            if format_function(callee) in path or not callee_cumtime or len(path) >= MAX_FOLDED_DEPTH:
+                # Recursion is already accounted for in the cumulative time of the outer call
+                continue
+            callee_fraction = min(1.0, edge_cumtime * fraction / callee_cumtime)
+            if callee_cumtime * callee_fraction >= MIN_FOLDED_SECONDS:
+                walk(callee, path, callee_fraction)
+
+    roots = [func for func, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    for root in roots:
+        walk(root, (), 1.0)
+
+    return [f"{stack} {int(seconds * 1e6)}" for stack, seconds in sorted(folded.items())
+            if int(seconds * 1e6) > 0]
+
+
+def summarize_hot_functions(stats):
+    summary = {}
+    for label, keys in get_hot_functions().items():
+        calls = 0
+        seconds = 0.0
+        for key in keys:
+            if key in stats.stats:
+                _, num_calls, _, cumtime, _ = stats.stats[key]
+                calls += num_calls
+                seconds += cumtime
+        summary[label] = {"calls": calls, "seconds": round(seconds, 6)}
+    return summary
+
+
+class NullProfiler:
+    """Stands in for `SyncProfiler` when profiling is turned off"""
+
+    @contextmanager
+    def unit(self, name):  # pylint: disable=unused-argument
+        yield
+
+    def write_reports(self):
+        pass
+
+
+class SyncProfiler:
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self.profiles = []
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @contextmanager
+    def unit(self, name):
+        """Profile the block and write it to `<profile_dir>/<name>.prof`"""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(self.profile_dir, safe_file_name(name) + ".prof")
+            profiler.dump_stats(path)
+            self.profiles.append(path)
+
+    def write_reports(self):
+        if not self.profiles:
+            return
+
+        stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(os.path.join(self.profile_dir, "merged.prof"))
+
+        with open(os.path.join(self.profile_dir, "merged.folded"), "w", encoding="utf-8") as folded_file:
+            for line in stats_to_folded(stats):
+                folded_file.write(line + "\n")
+
+        hot_functions = summarize_hot_functions(stats)
+        with open(os.path.join(self.profile_dir, "hot_functions.json"), "w", encoding="utf-8") as hot_file:
+            json.dump(hot_functions, hot_file, indent=2)
+
+        for label, timing in hot_functions.items():
+            LOGGER.info("Profile: %s called %s times, %ss wall time", label, timing["calls"], timing["seconds"])
+        LOGGER.info("Wrote %s profiles to %s", len(self.profiles), self.profile_dir)
+
+
+def create_profiler(config):
+    profile_dir = config.get("profile_dir")
+    if profile_dir:
+        return SyncProfiler(profile_dir)
+    return NullProfiler()
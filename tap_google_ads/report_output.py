@@ -0,0 +1,237 @@
+"""Where report stream records go.
+
+By default they are Singer RECORD messages on stdout. With `output_format`
+set to `parquet`, each report stream is written to Parquet files under
+`parquet_path` instead, partitioned Hive style by customer and day:
+
+    <parquet_path>/<stream>/customer_id=<id>/date=<YYYY-MM-DD>/part-<page>.parquet
+
+Every page of a day's results is one part file, written to a temporary name
+and renamed into place before the page's checkpoint or the day's bookmark is
+written, so the STATE on stdout never gets ahead of the files. Parts are
+named after the page token that fetched them, so a day resumed from a
+checkpoint overwrites the page that was in flight instead of duplicating it.
+A day requested from its first page replaces the day's partition, which is
+how the days of the conversion window get updated.
+
+Pages are converted to columns with `ColumnarPageBuilder` rather than one
+record at a time, where the stream allows it.
+
+Core streams, the SCHEMA messages of core streams and every STATE message
+still go to stdout.
+"""
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import singer
+
+from . import messages
+from .columnar import ColumnarPageBuilder
+
+OUTPUT_FORMATS = ("singer", "parquet")
+
+
+def get_output_format(config):
+    """Fetch `output_format` from the config and error on invalid values"""
+    output_format = config.get("output_format") or "singer"
+    if output_format not in OUTPUT_FORMATS:
+        raise RuntimeError(f"Output Format must be one of {', '.join(OUTPUT_FORMATS)}")
+    if output_format == "parquet":
+        if not config.get("parquet_path"):
+            raise RuntimeError("Output Format parquet needs a Parquet Path to write to")
+        if config.get("report_digest_path"):
+            # A day's partition is rewritten in full, so the rows the digests skip would be lost
+            raise RuntimeError("Output Format parquet can't be combined with a Report Digest Path")
+    return output_format
+
+
+def get_selected_properties(catalog_entry):
+    """The properties of a report stream that end up in its records, in schema order"""
+    mdata_map = singer.metadata.to_map(catalog_entry["metadata"])
+    return [
+        name
+        for name in catalog_entry["schema"]["properties"]
+        if name == "_sdc_record_hash"
+        or mdata_map.get(("properties", name), {}).get("selected")
+        or mdata_map.get(("properties", name), {}).get("inclusion") == "automatic"
+    ]
+
+
+class SingerReportDay:
+
+    # Records are built one at a time
+    columnar = None
+
+    def __init__(self, stream_name):
+        self.stream_name = stream_name
+
+    def write(self, record):
+        messages.write_record(self.stream_name, record)
+
+    def commit(self, page_token):
+        pass
+
+    def abort(self):
+        pass
+
+
+class ReportOutput:
+
+    def open_report_day(self, catalog_entry, customer_id, day):
+        raise NotImplementedError
+
+    @contextmanager
+    def report_day(self, catalog_entry, customer_id, day):
+        report_day = self.open_report_day(catalog_entry, customer_id, day)
+        try:
+            yield report_day
+        except BaseException:
+            report_day.abort()
+            raise
+
+    def close(self):
+        pass
+
+
+class SingerOutput(ReportOutput):
+    """Report records as Singer RECORD messages on stdout"""
+
+    writes_report_schemas = True
+
+    def open_report_day(self, catalog_entry, customer_id, day):  # pylint: disable=unused-argument
+        return SingerReportDay(catalog_entry["stream"])
+
+
+def get_arrow_type(json_schema):
+    """The Arrow type of a report stream property, and how to turn a column of its values into an array
+
+    Date-times are parsed by Arrow from their strings, a column at a time. Decimals
+    stay the strings the Transformer made of them, as no float holds every one."""
+    import pyarrow  # pylint: disable=import-outside-toplevel
+
+    types = json_schema.get("type", [])
+    types = [types] if isinstance(types, str) else types
+
+    def parse_strings(arrow_type):
+        return lambda values: pyarrow.array(values, pyarrow.string()).cast(arrow_type)
+
+    if "object" in types or "array" in types:
+        return pyarrow.string(), lambda values: pyarrow.array(
+            [value if value is None or isinstance(value, str) else json.dumps(value) for value in values],
+            pyarrow.string())
+    if "integer" in types:
+        return pyarrow.int64(), lambda values: pyarrow.array(values, pyarrow.int64())
+    if json_schema.get("format") == "singer.decimal":
+        return pyarrow.string(), lambda values: pyarrow.array(values, pyarrow.string())
+    if "number" in types:
+        return pyarrow.float64(), lambda values: pyarrow.array(values, pyarrow.float64())
+    if "boolean" in types:
+        return pyarrow.bool_(), lambda values: pyarrow.array(values, pyarrow.bool_())
+    if json_schema.get("format") == "date-time":
+        return pyarrow.timestamp("us", tz="UTC"), parse_strings(pyarrow.timestamp("us", tz="UTC"))
+    return pyarrow.string(), lambda values: pyarrow.array(values, pyarrow.string())
+
+
+class ParquetReportDay:
+    """The part files of one (stream, customer, day) partition
+
+    A page comes either as records, or as the columns of a `ColumnarPageBuilder`."""
+
+    def __init__(self, directory, schema, converters, columnar=None):
+        self.directory = directory
+        self.schema = schema
+        self.converters = converters
+        self.columnar = columnar
+        self.rows = []
+        self.tables = []
+
+    def write(self, record):
+        self.rows.append(record)
+
+    def write_columns(self, columns):
+        self.append_table(columns, len(columns["_sdc_record_hash"]))
+
+    def append_table(self, columns, num_rows):
+        import pyarrow  # pylint: disable=import-outside-toplevel
+
+        if num_rows:
+            arrays = [converter(columns.get(field.name) or [None] * num_rows)
+                      for field, converter in zip(self.schema, self.converters)]
+            self.tables.append(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def commit(self, page_token):
+        """Write the page fetched with `page_token` ("" for the first page) to its part file"""
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.parquet
+
+        if not page_token:
+            # Starting the day over, drop the parts of any earlier sync of it
+            shutil.rmtree(self.directory, ignore_errors=True)
+        if self.rows:
+            self.append_table({field.name: [row.get(field.name) for row in self.rows] for field in self.schema},
+                              len(self.rows))
+            self.rows = []
+        if not self.tables:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        table = pyarrow.concat_tables(self.tables)
+        part_name = hashlib.sha256(page_token.encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.directory, f"part-{part_name}.parquet")
+        pyarrow.parquet.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self.tables = []
+
+    def abort(self):
+        self.rows = []
+        self.tables = []
+
+
+class ParquetOutput(ReportOutput):
+    """Report records as Parquet files under `path`"""
+
+    writes_report_schemas = False
+
+    def __init__(self, path):
+        self.path = path
+        self.schemas = {}
+        self.columnar_builders = {}
+
+    def get_schema(self, catalog_entry):
+        """The Arrow schema of a report stream's selected properties, and their converters"""
+        import pyarrow  # pylint: disable=import-outside-toplevel
+
+        stream_name = catalog_entry["stream"]
+        if stream_name not in self.schemas:
+            fields, converters = [], []
+            for name in get_selected_properties(catalog_entry):
+                arrow_type, converter = get_arrow_type(catalog_entry["schema"]["properties"][name])
+                fields.append(pyarrow.field(name, arrow_type))
+                converters.append(converter)
+            self.schemas[stream_name] = (pyarrow.schema(fields), converters)
+        return self.schemas[stream_name]
+
+    def get_columnar_builder(self, catalog_entry):
+        stream_name = catalog_entry["stream"]
+        if stream_name not in self.columnar_builders:
+            self.columnar_builders[stream_name] = ColumnarPageBuilder(catalog_entry)
+        return self.columnar_builders[stream_name]
+
+    def open_report_day(self, catalog_entry, customer_id, day):
+        schema, converters = self.get_schema(catalog_entry)
+        directory = os.path.join(self.path, catalog_entry["stream"], f"customer_id={customer_id}", f"date={day}")
+        return ParquetReportDay(directory, schema, converters, self.get_columnar_builder(catalog_entry))
+
+
+def create_report_output(config):
+    if get_output_format(config) == "parquet":
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError as err:
+            raise RuntimeError("Output Format parquet needs pyarrow, install tap-google-ads[parquet]") from err
+        return ParquetOutput(config["parquet_path"])
+    return SingerOutput()
@@ -0,0 +1,118 @@
+"""Merge the state files of tap runs over disjoint, or overlapping, sets of customers.
+
+    tap-google-ads merge-state shard-0.json shard-1.json [--output state.json]
+
+Bookmarks are kept per stream and per customer, so most of them come from a
+single file. Where several files have a bookmark for the same stream and
+customer:
+
+- report streams keep the bookmark that got furthest: the latest day,
+  whether complete (`date`) or checkpointed part way (`page_date`), with a
+  complete day ahead of a checkpoint into the same day
+- core streams only have a `last_pk_fetched` bookmark while their sync is
+  unfinished, and keep the lowest one, so the resumed sync does not skip
+  records any of the runs have not written yet
+
+`currently_syncing` only decides where the next sync starts, since every
+selected stream and customer is synced either way. The merged state keeps the
+earliest of the inputs' values, in the order the tap syncs them.
+"""
+import argparse
+import json
+import sys
+
+import singer
+from singer import utils
+
+LOGGER = singer.get_logger()
+
+
+def pk_sort_key(last_pk_fetched):
+    # Ids are integers, but compare anything else as a string rather than fail
+    try:
+        return (0, int(last_pk_fetched), "")
+    except (ValueError, TypeError):
+        return (1, 0, str(last_pk_fetched))
+
+
+def is_report_bookmark(bookmark):
+    return "date" in bookmark or "page_date" in bookmark
+
+
+def report_progress(bookmark):
+    """Sort key for how far a report stream bookmark got"""
+    if "page_date" in bookmark:
+        return (utils.strptime_to_utc(bookmark["page_date"]), False)
+    return (utils.strptime_to_utc(bookmark["date"]), True)
+
+
+def merge_bookmarks(bookmark, other_bookmark):
+    """Return the bookmark to keep for a stream and customer both states have one for"""
+    if is_report_bookmark(bookmark) and is_report_bookmark(other_bookmark):
+        if report_progress(other_bookmark) > report_progress(bookmark):
+            return other_bookmark
+        return bookmark
+
+    if "last_pk_fetched" in bookmark and "last_pk_fetched" in other_bookmark:
+        if pk_sort_key(other_bookmark["last_pk_fetched"]) < pk_sort_key(bookmark["last_pk_fetched"]):
+            return other_bookmark
+        return bookmark
+
+    # Bookmarks of different shapes should not happen; keep everything either of them has
+    return {**other_bookmark, **bookmark}
+
+
+def merge_currently_syncing(currently_syncing_values):
+    currently_syncing_values = [value for value in currently_syncing_values if value]
+    if not currently_syncing_values:
+        return None
+    # The tap syncs streams sorted by tap_stream_id, then customers sorted by customerId
+    return min(currently_syncing_values, key=lambda value: (value[0] or "", value[1] or ""))
+
+
+def merge_states(states):
+    merged = {}
+    for state in states:
+        for key, value in state.items():
+            if key not in {"bookmarks", "currently_syncing"}:
+                merged[key] = value
+
+    bookmarks = {}
+    for state in states:
+        for stream_name, customer_bookmarks in state.get("bookmarks", {}).items():
+            merged_customer_bookmarks = bookmarks.setdefault(stream_name, {})
+            for customer_id, bookmark in customer_bookmarks.items():
+                if customer_id in merged_customer_bookmarks:
+                    bookmark = merge_bookmarks(merged_customer_bookmarks[customer_id], bookmark)
+                merged_customer_bookmarks[customer_id] = bookmark
+    merged["bookmarks"] = bookmarks
+
+    currently_syncing = merge_currently_syncing(state.get("currently_syncing") for state in states)
+    if currently_syncing:
+        merged["currently_syncing"] = currently_syncing
+    return merged
+
+
+def load_state(path):
+    with open(path, encoding="utf-8") as state_file:
+        return json.load(state_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="tap-google-ads merge-state",
+        description="Merge the state files of several tap runs into one state",
+    )
+    parser.add_argument("states", nargs="+", help="State files to merge")
+    parser.add_argument("-o", "--output", help="Write the merged state to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    merged = merge_states([load_state(path) for path in args.states])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(merged, output, indent=2, sort_keys=True)
+    else:
+        json.dump(merged, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+    LOGGER.info(f"Merged {len(args.states)} state files")
@@ -0,0 +1,174 @@
+"""Compress the Singer message stream the tap writes to stdout.
+
+With `stdout_compression` set, a sync writes its SCHEMA, RECORD and STATE
+messages as one compressed stream instead of plain JSON lines, for a target
+on another host to decompress on its end:
+
+- `gzip`: the messages are cut into blocks of `BLOCK_SIZE` bytes and each
+  block is written as a gzip member of its own, compressed on a pool of
+  `stdout_compression_workers` threads like `pigz` does. Concatenated members
+  are one gzip file to `gunzip` and Python's `gzip` module.
+- `zstd`: a single zstd frame, compressed on zstd's own worker threads.
+
+Messages are still written in order, but a STATE message only reaches the
+target once the block or frame around it is flushed. The stream is finished
+when the sync ends, even if it fails, so everything written before a STATE
+message can be decompressed with it.
+"""
+import gzip
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import singer
+
+from tap_google_ads.messages import message_sink
+
+LOGGER = singer.get_logger()
+
+STDOUT_COMPRESSIONS = ("none", "gzip", "zstd")
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+LEVEL_RANGES = {"gzip": (1, 9), "zstd": (1, 22)}
+DEFAULT_WORKERS = 1
+
+# Uncompressed bytes per gzip member
+BLOCK_SIZE = 1024 * 1024
+
+
+def get_stdout_compression(config):
+    """Fetch `stdout_compression` from the config and error on invalid values"""
+    stdout_compression = config.get("stdout_compression") or "none"
+    if stdout_compression not in STDOUT_COMPRESSIONS:
+        raise RuntimeError(f"Stdout Compression must be one of {', '.join(STDOUT_COMPRESSIONS)}")
+    return stdout_compression
+
+
+def get_compression_level(config, stdout_compression):
+    """Get `stdout_compression_level` from config, falling back to the codec's default"""
+    default_level = DEFAULT_LEVELS[stdout_compression]
+    min_level, max_level = LEVEL_RANGES[stdout_compression]
+    level = config.get("stdout_compression_level") or default_level
+
+    try:
+        level = int(level)
+    except (ValueError, TypeError):
+        level = 0
+    if not min_level <= level <= max_level:
+        LOGGER.warning(f"The provided stdout_compression_level {config.get('stdout_compression_level')} is invalid "
+                       f"for {stdout_compression}; it will be set to the default of {default_level}.")
+        level = default_level
+    return level
+
+
+def get_compression_workers(config):
+    """Get `stdout_compression_workers` from config, falling back to compressing on the sync's thread"""
+    workers = config.get("stdout_compression_workers") or DEFAULT_WORKERS
+
+    try:
+        workers = int(workers)
+    except (ValueError, TypeError):
+        workers = 0
+    if workers < 1:
+        LOGGER.warning(f"The provided stdout_compression_workers {config.get('stdout_compression_workers')} is invalid; "
+                       f"it will be set to the default of {DEFAULT_WORKERS}.")
+        workers = DEFAULT_WORKERS
+    return workers
+
+
+class GzipBlockWriter:
+    """Writes gzip members of up to `block_size` uncompressed bytes, compressed on `workers` threads"""
+
+    def __init__(self, output, level, workers, block_size=BLOCK_SIZE):
+        self.output = output
+        self.level = level
+        self.block_size = block_size
+        self.buffer = bytearray()
+        # zlib releases the GIL while it compresses, so blocks compress in parallel
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="gzip") if workers > 1 else None
+        self.max_pending = 2 * workers
+        self.pending = deque()
+
+    def compress(self, block):
+        return gzip.compress(block, self.level, mtime=0)
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.block_size:
+            self.write_block()
+
+    def write_block(self):
+        block, self.buffer = bytes(self.buffer), bytearray()
+        if self.executor is None:
+            self.output.write(self.compress(block))
+            return
+
+        self.pending.append(self.executor.submit(self.compress, block))
+        # Blocks are written in order, and only `max_pending` are held in memory
+        while self.pending and (len(self.pending) >= self.max_pending or self.pending[0].done()):
+            self.output.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.buffer:
+            self.write_block()
+        while self.pending:
+            self.output.write(self.pending.popleft().result())
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.output.flush()
+
+
+class ZstdWriter:
+    """Writes a zstd frame, compressed on `workers` of zstd's threads"""
+
+    def __init__(self, output, level, workers):
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        self.output = output
+        compressor = zstandard.ZstdCompressor(level=level, threads=workers if workers > 1 else 0)
+        self.writer = compressor.stream_writer(output, closefd=False)
+
+    def write(self, data):
+        self.writer.write(data)
+
+    def close(self):
+        # Ends the frame without closing stdout
+        self.writer.close()
+        self.output.flush()
+
+
+def create_writer(output, stdout_compression, level, workers):
+    if stdout_compression == "gzip":
+        return GzipBlockWriter(output, level, workers)
+    return ZstdWriter(output, level, workers)
+
+
+class CompressedSink:
+    """A message sink that writes each message as a JSON line to a compressing writer"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write_message(self, message):
+        self.writer.write((singer.messages.format_message(message) + "\n").encode("utf-8"))
+
+
+@contextmanager
+def compressed_stdout(config):
+    """Compress the messages written in this context to stdout as `stdout_compression` says"""
+    stdout_compression = get_stdout_compression(config)
+    if stdout_compression == "none":
+        yield
+        return
+
+    level = get_compression_level(config, stdout_compression)
+    workers = get_compression_workers(config)
+    LOGGER.info(f"Compressing stdout with {stdout_compression} at level {level} on {workers} worker(s).")
+
+    sys.stdout.flush()
+    writer = create_writer(sys.stdout.buffer, stdout_compression, level, workers)
+    try:
+        with message_sink(CompressedSink(writer)):
+            yield
+    finally:
+        writer.close()
@@ -1,16 +1,29 @@
 from collections import defaultdict
+from collections import namedtuple
+from functools import lru_cache
+from importlib import import_module
 import json
 import hashlib
+import time
 from datetime import timedelta
 import singer
 from singer import Transformer
 from singer import utils, metrics
-from google.protobuf.json_format import MessageToJson
-from google.ads.googleads.errors import GoogleAdsException
-from google.api_core.exceptions import ServerError, TooManyRequests
 from requests.exceptions import ReadTimeout
 import backoff
+from . import messages
 from . import report_definitions
+from .digest_store import get_core_deletion_markers
+from .digest_store import NullDigestStore
+from .field_registry import compile_fields
+from .field_registry import transform_exclusion_name
+from .instrumentation import INSTRUMENTATION
+from .operation_budget import NullOperationBudget
+from .operation_budget import record_operation
+from .record_hash import DEFAULT_HASH_VERSION
+from .record_hash import HASH_VERSION_KEY
+from .record_hash import RecordHasher
+from .report_output import SingerOutput
 
 LOGGER = singer.get_logger()
 
@@ -45,6 +58,67 @@ def get_conversion_window(config):
     raise RuntimeError("Conversion Window must be between 1 - 30 inclusive, 60, or 90")
 
 
+def get_conversion_window_overrides(config):
+    """Fetch the per stream conversion windows from the config and error on invalid values
+
+    `0` is allowed here, for a stream that should resume from its bookmark with no lookback."""
+    overrides = config.get("conversion_window_overrides") or {}
+
+    if isinstance(overrides, str):
+        try:
+            overrides = json.loads(overrides)
+        except ValueError as err:
+            raise RuntimeError("Conversion Window Overrides must be a JSON object of stream names to windows") from err
+    if not isinstance(overrides, dict):
+        raise RuntimeError("Conversion Window Overrides must be a JSON object of stream names to windows")
+
+    conversion_windows = {}
+    for stream_name, conversion_window in overrides.items():
+        try:
+            conversion_window = int(conversion_window)
+        except (ValueError, TypeError) as err:
+            raise RuntimeError(f"Conversion Window for {stream_name} must be an int or string") from err
+        if not (conversion_window in set(range(0, 31)) or conversion_window in {60, 90}):
+            raise RuntimeError(f"Conversion Window for {stream_name} must be between 0 - 30 inclusive, 60, or 90")
+        conversion_windows[stream_name] = conversion_window
+    return conversion_windows
+
+
+def get_auto_conversion_window(config):
+    """Whether `auto_conversion_window` drops the lookback of streams without late arriving metrics"""
+    auto_conversion_window = config.get("auto_conversion_window", False)
+    if isinstance(auto_conversion_window, str):
+        return auto_conversion_window.strip().lower() == "true"
+    return bool(auto_conversion_window)
+
+
+def has_late_arriving_metrics(selected_fields):
+    """Conversions are attributed to the day of the ad interaction, so every conversion
+    metric (`conversions`, `all_conversions`, `view_through_conversions`, their values
+    and rates) can still change for days after that day was synced"""
+    return any(
+        field_name.startswith("metrics.") and "conversion" in field_name
+        for field_name in selected_fields
+    )
+
+
+def get_stream_conversion_window(config, stream_name, selected_fields):
+    """Return the conversion window of one report stream, in days
+
+    - an entry for the stream in `conversion_window_overrides`
+    - else no lookback with `auto_conversion_window`, if no late arriving metric is selected
+    - else `conversion_window`"""
+    overrides = get_conversion_window_overrides(config)
+    if stream_name in overrides:
+        return overrides[stream_name]
+
+    if get_auto_conversion_window(config) and not has_late_arriving_metrics(selected_fields):
+        LOGGER.info(f"Stream: {stream_name} has no conversion metrics selected, resuming from its bookmark.")
+        return 0
+
+    return get_conversion_window(config)
+
+
 def get_request_timeout(config):
     """Get `request_timeout` value from config and error on invalid values"""
     request_timeout = config.get("request_timeout") or DEFAULT_REQUEST_TIMEOUT
@@ -160,21 +234,17 @@ def create_report_query(resource_name, selected_fields, query_date):
 
     format_str = "%Y-%m-%d"
     query_date = utils.strftime(query_date, format_str=format_str)
-    report_query = f"SELECT {','.join(selected_fields)} FROM {resource_name} WHERE segments.date = '{query_date}' {build_parameters()}"
+    # Sorted, so a day's query is the same from run to run and a checkpoint's page token stays valid for it
+    report_query = f"SELECT {','.join(sorted(selected_fields))} FROM {resource_name} WHERE segments.date = '{query_date}' {build_parameters()}"
 
     return report_query
 
 
 def generate_hash(record, metadata):
-    metadata = singer.metadata.to_map(metadata)
-    fields_to_hash = []
-    for key, val in record.items():
-        if metadata[("properties", key)]["behavior"] != "METRIC":
-            fields_to_hash.append((key, val))
+    """The `_sdc_record_hash` of `record`, with the hash version in the stream's `metadata`
 
-    hash_source_data = sorted(fields_to_hash, key=lambda x: x[0])
-    hash_bytes = json.dumps(hash_source_data).encode("utf-8")
-    return hashlib.sha256(hash_bytes).hexdigest()
+    Syncs build a `RecordHasher` once per stream instead of once per record."""
+    return RecordHasher(metadata).hash(record)
 
 
 class TimeoutException(Exception):
@@ -195,6 +265,7 @@ timeout_errors = [
 
 
 def should_give_up(ex):
+    from google.api_core.exceptions import ServerError, TooManyRequests  # pylint: disable=import-outside-toplevel
 
     # ServerError is the parent class of InternalServerError, MethodNotImplemented, BadGateway,
     # ServiceUnavailable, GatewayTimeout, DataLoss and Unknown classes.
@@ -227,52 +298,165 @@ def on_giveup_func(err):
     LOGGER.warning("Giving up request after %s tries", err.get("tries"))
 
 
-@backoff.on_exception(backoff.expo,
-                      (GoogleAdsException,
-                       ServerError, TooManyRequests,
-                       ReadTimeout,
-                       AttributeError),
-                      max_tries=5,
-                      jitter=None,
-                      giveup=should_give_up,
-                      on_giveup=on_giveup_func,
-                      logger=None)
-def make_request(gas, query, customer_id, config=None):
-    if config is None:
-        config = {}
+def search(gas, query, customer_id, config, page_token=None):
     request_timeout = get_request_timeout(config)
-    response = gas.search(query=query, customer_id=customer_id, timeout=request_timeout)
+    started = time.monotonic()
+    if page_token:
+        # The page token isn't one of the flattened arguments, so it needs the full request
+        request = {"customer_id": customer_id, "query": query, "page_token": page_token}
+        response = gas.search(request=request, timeout=request_timeout)
+    else:
+        response = gas.search(query=query, customer_id=customer_id, timeout=request_timeout)
+    INSTRUMENTATION.record_request(started)
+    if not page_token:
+        # Google doesn't count the requests for the next pages of a result as operations
+        record_operation()
     return response
 
 
+@lru_cache(maxsize=None)
+def get_retrying_search():
+    """`search` wrapped in our backoff policy.
+
+    The google-ads and api-core packages are slow to import, so their
+    exception classes are only loaded once the first request is made."""
+    # pylint: disable=import-outside-toplevel
+    from google.ads.googleads.errors import GoogleAdsException
+    from google.api_core.exceptions import ServerError, TooManyRequests
+
+    return backoff.on_exception(backoff.expo,
+                                (GoogleAdsException,
+                                 ServerError, TooManyRequests,
+                                 ReadTimeout,
+                                 AttributeError),
+                                max_tries=5,
+                                jitter=None,
+                                giveup=should_give_up,
+                                on_giveup=on_giveup_func,
+                                on_backoff=INSTRUMENTATION.on_backoff,
+                                logger=None)(search)
+
+
+def make_request(gas, query, customer_id, config=None, page_token=None):
+    if config is None:
+        config = {}
+    if page_token:
+        return get_retrying_search()(gas, query, customer_id, config, page_token=page_token)
+    return get_retrying_search()(gas, query, customer_id, config)
+
+
+def is_page_token_error(ex):
+    request_error_module = import_module(f"google.ads.googleads.{API_VERSION}.errors.types.request_error")
+    request_error = request_error_module.RequestErrorEnum.RequestError
+    # Compare enum values rather than strings, `str` of an error code is just its number
+    page_token_errors = {request_error.INVALID_PAGE_TOKEN, request_error.EXPIRED_PAGE_TOKEN}
+    return any(
+        googleads_error.error_code.request_error in page_token_errors
+        for googleads_error in ex.failure.errors
+    )
+
+
+def make_report_request(gas, query, customer_id, config, page_token=None):
+    """`make_request`, resuming from `page_token` if Google still accepts it
+
+    Page tokens expire, so an old checkpoint falls back to requesting the whole day.
+    Returns the response and the page token it starts from, `""` for the whole day."""
+    from google.ads.googleads.errors import GoogleAdsException  # pylint: disable=import-outside-toplevel
+
+    if page_token:
+        try:
+            return make_request(gas, query, customer_id, config, page_token=page_token), page_token
+        except GoogleAdsException as err:
+            if not is_page_token_error(err):
+                raise
+            LOGGER.warning("The checkpoint's page token was rejected, requesting the whole day again.")
+    return make_request(gas, query, customer_id, config), ""
+
+
+@lru_cache(maxsize=None)
+def get_message_to_json():
+    """protobuf's `MessageToJson`, imported once rather than for every row"""
+    from google.protobuf.json_format import MessageToJson  # pylint: disable=import-outside-toplevel
+
+    return MessageToJson
+
+
 def google_message_to_json(message):
     """
     The proto field name for `type` is `type_` which will
     get stripped by the Transformer. So we replace all
     instances of the key `"type_"` before `json.loads`ing it
+
+    `indent=None` lets `json.dumps` use its C encoder; the pure Python
+    encoder used for indented output leaves a reference cycle behind for
+    every row, which only the garbage collector gets back
     """
 
-    json_string = MessageToJson(message, preserving_proto_field_name=True)
+    json_string = get_message_to_json()(message, preserving_proto_field_name=True, indent=None)
     json_string = json_string.replace('"type_":', '"type":')
     return json.loads(json_string)
 
 
+def release_transformer_errors(transformer):
+    """Drop the errors a successful `transform` left behind.
+
+    A field that fails one of its schema types records an error holding the
+    row's data even when a later type succeeds, so a Transformer that lives
+    for a whole query would otherwise keep a reference to every such row."""
+    transformer.errors.clear()
+
+
 def filter_out_non_attribute_fields(fields):
     return {field_name: field_data
             for field_name, field_data in fields.items()
             if field_data["field_details"]["category"] == "ATTRIBUTE"}
 
+def get_metric_properties(stream_mdata):
+    """The properties of a report stream whose values change as conversions come in"""
+    return sorted(
+        mdata["breadcrumb"][1]
+        for mdata in stream_mdata
+        if mdata["breadcrumb"] and mdata["metadata"].get("behavior") == "METRIC"
+    )
+
+
+def hash_query(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def write_checkpoint_for_report_streams(state, stream, customer_id, query_date, query, page_token):
+    """Record how far into `query_date` a report stream got, on top of its last complete day"""
+    bookmark = dict(singer.get_bookmark(state, stream, customer_id, default={}))
+    bookmark.update({
+        "page_date": utils.strftime(query_date),
+        "page_query": hash_query(query),
+        "page_token": page_token,
+    })
+    singer.write_bookmark(state, stream, customer_id, bookmark)
+    messages.write_state(state)
+
+
+def get_checkpoint_page_token(bookmark, query_date, query):
+    """Return the page token to resume `query_date` from, if the bookmark has one for this exact query"""
+    if bookmark.get("page_date") != utils.strftime(query_date):
+        return None
+    if bookmark.get("page_query") != hash_query(query):
+        return None
+    return bookmark.get("page_token")
+
+
 def write_bookmark_for_core_streams(state, stream, customer_id, last_pk_fetched):
     # Write bookmark for core streams.
     singer.write_bookmark(state, stream, customer_id, {'last_pk_fetched': last_pk_fetched})
 
-    singer.write_state(state)
+    messages.write_state(state)
     LOGGER.info("Write state for stream: %s, value: %s", stream, last_pk_fetched)
 
 class BaseStream:  # pylint: disable=too-many-instance-attributes
 
     def __init__(self, fields, google_ads_resource_names, resource_schema, primary_keys, automatic_keys = None, filter_param = None):
         self.fields = fields
+        self.compiled_fields = compile_fields(fields)
         self.google_ads_resource_names = google_ads_resource_names
         self.primary_keys = primary_keys
         self.automatic_keys = automatic_keys if automatic_keys else set()
@@ -287,7 +471,9 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
 
 
     def extract_field_information(self, resource_schema):
-        self.field_exclusions = defaultdict(set)
+        # Dicts rather than sets keep the exclusions in the order Google lists them, so the
+        # catalog is the same from run to run and from one process to another
+        self.field_exclusions = defaultdict(dict)
         self.schema = {}
         self.behavior = {}
 
@@ -295,15 +481,17 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
 
             # field_exclusions step
             fields = resource_schema[resource_name]["fields"]
-            for field_name, field in fields.items():
-                if field_name in self.fields:
-                    self.field_exclusions[field_name].update(
-                        field["incompatible_fields"]
-                    )
+            for field_name in self.compiled_fields.names:
+                field = fields.get(field_name)
+                if field is None:
+                    continue
+                self.field_exclusions[field_name].update(
+                    dict.fromkeys(field["incompatible_fields"])
+                )
 
-                    self.schema[field_name] = field["field_details"]["json_schema"]
+                self.schema[field_name] = field["field_details"]["json_schema"]
 
-                    self.behavior[field_name] = field["field_details"]["category"]
+                self.behavior[field_name] = field["field_details"]["category"]
 
         self.field_exclusions = {k: list(v) for k, v in self.field_exclusions.items()}
 
@@ -421,14 +609,18 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
 
         return transformed_message
 
-    def sync(self, sdk_client, customer, stream, config, state, query_limit): # pylint: disable=unused-argument
+    def sync(self, sdk_client, customer, stream, config, state, query_limit, digest_store=None, report_output=None, # pylint: disable=unused-argument
+             operation_budget=None):
+        from google.ads.googleads.errors import GoogleAdsException  # pylint: disable=import-outside-toplevel
+
         gas = sdk_client.get_service("GoogleAdsService", version=API_VERSION)
         resource_name = self.google_ads_resource_names[0]
         stream_name = stream["stream"]
         stream_mdata = stream["metadata"]
+        mdata_map = singer.metadata.to_map(stream_mdata)
         selected_fields = get_selected_fields(stream_mdata)
         state = singer.set_currently_syncing(state, [stream_name, customer["customerId"]])
-        singer.write_state(state)
+        messages.write_state(state)
 
         # last run was interrupted if there is a bookmark available for core streams.
         last_pk_fetched = singer.get_bookmark(state,
@@ -456,8 +648,15 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
         record = None
         # Retrieve the last saved state. If last_pk_fetched is not found in the state, then the WHERE clause will not be added to the state.
         last_pk_fetched_value = last_pk_fetched.get('last_pk_fetched')
+        # A sync resumed part way through doesn't see every entity, so it can't tell which ones were deleted
+        full_scan = last_pk_fetched_value is None
 
-        with metrics.record_counter(stream_name) as counter:
+        if digest_store is None:
+            digest_store = NullDigestStore()
+
+        with metrics.record_counter(stream_name) as counter, \
+             INSTRUMENTATION.unit(stream_name, customer["customerId"]) as unit, \
+             digest_store.entity_scan(stream["tap_stream_id"], customer["customerId"], self.primary_keys) as scan:
 
             # Loop until the last page.
             while is_more_records:
@@ -471,17 +670,21 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
 
                 with Transformer() as transformer:
                     # Pages are fetched automatically while iterating through the response
-                    for message in response:
+                    for message in unit.iter_response_rows(response):
                         json_message = google_message_to_json(message)
                         transformed_message = self.transform_keys(json_message)
-                        record = transformer.transform(transformed_message, stream["schema"], singer.metadata.to_map(stream_mdata))
-                        singer.write_record(stream_name, record)
+                        record = transformer.transform(transformed_message, stream["schema"], mdata_map)
+                        release_transformer_errors(transformer)
+                        if scan.changed(record):
+                            messages.write_record(stream_name, record)
                         counter.increment()
                         num_rows = num_rows + 1
                         if stream_name in limit_not_possible:
                             # Write state(last_pk_fetched) using primary key(id) value for core streams after query_limit records
                             if counter.value % query_limit == 0 and self.filter_param:
                                 write_bookmark_for_core_streams(state, stream["tap_stream_id"], customer["customerId"], record[self.primary_keys[0]])
+                # The pager holds on to its last page, let it go before the next request
+                del response
 
                 if record and self.filter_param and stream_name not in limit_not_possible:
                     # Write the id of the last record for the stream, which supports the filter parameter(WHERE clause) and do not belong to limit_not_possible category.
@@ -494,11 +697,17 @@ class BaseStream:  # pylint: disable=too-many-instance-attributes
                 # Break the loop if no more records are available or the LIMIT clause is not possible.
                 is_more_records = False
 
+            if full_scan:
+                scan.finish()
+                if get_core_deletion_markers(config):
+                    for deletion_marker in scan.deleted_records():
+                        messages.write_record(stream_name, deletion_marker)
+
 
         # Flush the state for core streams if sync is completed
         if stream["tap_stream_id"] in state.get('bookmarks', {}):
             state['bookmarks'].pop(stream["tap_stream_id"])
-            singer.write_state(state)
+            messages.write_state(state)
 
 def get_query_date(start_date, bookmark, conversion_window_date):
     """Return a date within the conversion window and after start date
@@ -588,7 +797,7 @@ class ReportStream(BaseStream):
         google_ads_name = self.google_ads_resource_names[0]
         self.resource_object = resource_schema[google_ads_name]
         self.resource_fields = self.resource_object["fields"]
-        self.full_schema = create_nested_resource_schema(resource_schema, self.fields)
+        self.full_schema = create_nested_resource_schema(resource_schema, self.compiled_fields.names)
 
     def set_stream_schema(self):
         self.stream_schema = {
@@ -621,23 +830,17 @@ class ReportStream(BaseStream):
                 "inclusion": "available",
                 "table-key-properties": ["_sdc_record_hash"],
                 "forced-replication-method": "INCREMENTAL",
-                "valid-replication-keys": ["date"]
+                "valid-replication-keys": ["date"],
+                HASH_VERSION_KEY: DEFAULT_HASH_VERSION,
             },
             ("properties", "_sdc_record_hash"): {
                 "inclusion": "automatic",
                 "behavior": "PRIMARY KEY"
             },
         }
-        for report_field in self.fields:
+        for report_field in self.compiled_fields.names:
             # Transform the field name to match the schema
-            is_metric_or_segment = report_field.startswith("metrics.") or report_field.startswith("segments.")
-            # Transform ad_group_ad.ad.x fields to just x to reflect ad_group_ads schema
-            if report_field.startswith("ad_group_ad.ad."):
-                transformed_field_name = report_field.split(".")[2]
-            elif not is_metric_or_segment:
-                transformed_field_name = "_".join(report_field.split(".")[:2])
-            else:
-                transformed_field_name = report_field.split(".")[1]
+            transformed_field_name = self.compiled_fields.columns[report_field]
             # TODO: Maybe refactor this
             # metadata_key = ("properties", transformed_field_name)
             # Base metadata for every field
@@ -648,14 +851,9 @@ class ReportStream(BaseStream):
                 }
 
                 # Transform field exclusion names so they match the schema
-                for field_name in self.field_exclusions[report_field]:
-                    is_metric_or_segment = field_name.startswith("metrics.") or field_name.startswith("segments.")
-                    if not is_metric_or_segment:
-                        new_field_name = field_name.replace(".", "_")
-                    else:
-                        new_field_name = field_name.split(".")[1]
-
-                    self.stream_metadata[("properties", transformed_field_name)]["fieldExclusions"].append(new_field_name)
+                self.stream_metadata[("properties", transformed_field_name)]["fieldExclusions"].extend(
+                    transform_exclusion_name(field_name) for field_name in self.field_exclusions[report_field]
+                )
 
             # Add inclusion metadata
             if self.behavior[report_field]:
@@ -695,25 +893,13 @@ class ReportStream(BaseStream):
 
         return transformed_message
 
-    def sync(self, sdk_client, customer, stream, config, state, query_limit):
-        gas = sdk_client.get_service("GoogleAdsService", version=API_VERSION)
-        resource_name = self.google_ads_resource_names[0]
-        stream_name = stream["stream"]
-        stream_mdata = stream["metadata"]
-        selected_fields = get_selected_fields(stream_mdata)
-        replication_key = "date"
-        state = singer.set_currently_syncing(state, [stream_name, customer["customerId"]])
-        singer.write_state(state)
-
+    def get_date_range(self, stream_name, selected_fields, bookmark_value, config):
+        """Return the first and last day to query, from the bookmark, conversion window and config"""
         conversion_window = timedelta(
-            days=get_conversion_window(config)
+            days=get_stream_conversion_window(config, stream_name, selected_fields)
         )
         conversion_window_date = utils.now().replace(hour=0, minute=0, second=0, microsecond=0) - conversion_window
 
-        bookmark_object = singer.get_bookmark(state, stream["tap_stream_id"], customer["customerId"], default={})
-
-        bookmark_value = bookmark_object.get(replication_key)
-
         query_date = get_query_date(
             start_date=config["start_date"],
             bookmark=bookmark_value,
@@ -735,406 +921,517 @@ class ReportStream(BaseStream):
         if selected_fields == {'segments.date'}:
             raise Exception(f"Selected fields is currently limited to {', '.join(selected_fields)}. Please select at least one attribute and metric in order to replicate {stream_name}.")
 
-        while query_date <= end_date:
-            query = create_report_query(resource_name, selected_fields, query_date)
-            LOGGER.info(f"Requesting {stream_name} data for {utils.strftime(query_date, '%Y-%m-%d')}.")
+        return query_date, end_date
 
-            try:
-                response = make_request(gas, query, customer["customerId"], config)
-            except GoogleAdsException as err:
-                LOGGER.warning("Failed query: %s", query)
-                LOGGER.critical(str(err.failure.errors[0].message))
-                raise RuntimeError from None
+    def build_record(self, message, transformer, stream, record_hasher=None):
+        """Turn one row of a report response into the stream's record"""
+        json_message = google_message_to_json(message)
+        transformed_message = self.transform_keys(json_message)
+        record = transformer.transform(transformed_message, stream["schema"])
+        release_transformer_errors(transformer)
+        if record_hasher is None:
+            record["_sdc_record_hash"] = generate_hash(record, stream["metadata"])
+        else:
+            record["_sdc_record_hash"] = record_hasher.hash(record)
+        return record
 
+    def sync(self, sdk_client, customer, stream, config, state, query_limit, digest_store=None, report_output=None,
+             operation_budget=None):
+        from google.ads.googleads.errors import GoogleAdsException  # pylint: disable=import-outside-toplevel
 
-            with Transformer() as transformer:
-                # Pages are fetched automatically while iterating through the response
-                for message in response:
-                    json_message = google_message_to_json(message)
-                    transformed_message = self.transform_keys(json_message)
-                    record = transformer.transform(transformed_message, stream["schema"])
-                    record["_sdc_record_hash"] = generate_hash(record, stream_mdata)
+        gas = sdk_client.get_service("GoogleAdsService", version=API_VERSION)
+        resource_name = self.google_ads_resource_names[0]
+        stream_name = stream["stream"]
+        stream_mdata = stream["metadata"]
+        selected_fields = get_selected_fields(stream_mdata)
+        replication_key = "date"
+        state = singer.set_currently_syncing(state, [stream_name, customer["customerId"]])
+        messages.write_state(state)
+
+        bookmark_object = singer.get_bookmark(state, stream["tap_stream_id"], customer["customerId"], default={})
 
-                    singer.write_record(stream_name, record)
+        query_date, end_date = self.get_date_range(stream_name, selected_fields,
+                                                   bookmark_object.get(replication_key), config)
+
+        if digest_store is None:
+            digest_store = NullDigestStore()
+        if report_output is None:
+            report_output = SingerOutput()
+        if operation_budget is None:
+            operation_budget = NullOperationBudget()
+        # Days the plan leaves for a later run are still in the window, so their digests are kept
+        first_query_day = utils.strftime(query_date, '%Y-%m-%d')
+        query_date, end_date = operation_budget.limit_date_range(stream["tap_stream_id"], customer["customerId"],
+                                                                 query_date, end_date)
+        metric_properties = get_metric_properties(stream_mdata)
+        record_hasher = RecordHasher(stream_mdata)
+
+        while query_date <= end_date:
+            query = create_report_query(resource_name, selected_fields, query_date)
+            query_day = utils.strftime(query_date, '%Y-%m-%d')
+            if operation_budget.exhausted():
+                LOGGER.warning(f"The daily operation limit is reached, leaving {stream_name} from {query_day} "
+                               f"for a later run.")
+                break
+            LOGGER.info(f"Requesting {stream_name} data for {query_day}.")
+
+            page_token = get_checkpoint_page_token(bookmark_object, query_date, query)
+            if page_token:
+                LOGGER.info(f"Resuming {stream_name} data for {query_day} from its last checkpoint.")
+
+            with INSTRUMENTATION.unit(stream_name, customer["customerId"], query_day) as unit, \
+                 digest_store.report_day(stream["tap_stream_id"], customer["customerId"], query_day,
+                                         metric_properties) as digests, \
+                 report_output.report_day(stream, customer["customerId"], query_day) as output:
+                try:
+                    response, page_token = make_report_request(gas, query, customer["customerId"], config, page_token)
+                except GoogleAdsException as err:
+                    LOGGER.warning("Failed query: %s", query)
+                    LOGGER.critical(str(err.failure.errors[0].message))
+                    raise RuntimeError from None
+
+                with Transformer() as transformer:
+                    # Pages are fetched automatically while iterating through the response
+                    for page in unit.iter_pages(response.pages):
+                        rows = unit.iter_rows(page.results)
+                        page_columns = None
+                        if output.columnar is not None:
+                            rows = list(rows)
+                            page_columns = output.columnar.build(rows)
+
+                        if page_columns is not None:
+                            output.write_columns(page_columns)
+                        else:
+                            for message in rows:
+                                record = self.build_record(message, transformer, stream, record_hasher)
+                                if digests.changed(record):
+                                    output.write(record)
+                        output.commit(page_token)
+                        page_token = page.next_page_token
+
+                        # Every record of the page is written, so a restart can pick up from the next one
+                        if page.next_page_token:
+                            write_checkpoint_for_report_streams(state, stream["tap_stream_id"], customer["customerId"],
+                                                                query_date, query, page.next_page_token)
+                # Neither the pager nor the loop variable should keep the last page alive
+                page = response = None
 
             new_bookmark_value = {replication_key: utils.strftime(query_date)}
             singer.write_bookmark(state, stream["tap_stream_id"], customer["customerId"], new_bookmark_value)
 
-            singer.write_state(state)
+            messages.write_state(state)
 
             query_date += timedelta(days=1)
 
+        digest_store.compact_reports(stream["tap_stream_id"], customer["customerId"], first_query_day)
 
-def initialize_core_streams(resource_schema):
-    return {
-        "accessible_bidding_strategies": BaseStream(
-            report_definitions.ACCESSIBLE_BIDDING_STRATEGY_FIELDS,
-            ["accessible_bidding_strategy"],
-            resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="accessible_bidding_strategy.id"
-        ),
-        "accounts": BaseStream(
-            report_definitions.ACCOUNT_FIELDS,
-            ["customer"],
-            resource_schema,
-            ["id"],
-            filter_param="customer.id"
-        ),
-        "ad_groups": BaseStream(
-            report_definitions.AD_GROUP_FIELDS,
-            ["ad_group"],
-            resource_schema,
-            ["id"],
-            {
-                "campaign_id",
-                "customer_id",
-             },
-            filter_param="ad_group.id"
-        ),
-        "ad_group_criterion": BaseStream(
-            report_definitions.AD_GROUP_CRITERION_FIELDS,
-            ["ad_group_criterion"],
-            resource_schema,
-            ["ad_group_id","criterion_id"],
-            {
-                "campaign_id",
-                "customer_id",
-            },
-            filter_param="ad_group.id"
-        ),
-        "ads": BaseStream(
-            report_definitions.AD_GROUP_AD_FIELDS,
-            ["ad_group_ad"],
-            resource_schema,
-            ["id"],
-            {
-                "ad_group_id",
-                "campaign_id",
-                "customer_id",
-             },
-            filter_param = "ad_group_ad.ad.id"
-        ),
-        "assets": BaseStream(
-            report_definitions.ASSET_FIELDS,
-            ["asset"],
-            resource_schema,
-            ["id"],
-            filter_param="asset.id"
-        ),
-        "bidding_strategies": BaseStream(
-            report_definitions.BIDDING_STRATEGY_FIELDS,
-            ["bidding_strategy"],
-            resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="bidding_strategy.id"
-        ),
-        "call_details": BaseStream(
-            report_definitions.CALL_VIEW_FIELDS,
-            ["call_view"],
-            resource_schema,
-            ["resource_name"],
-            {
-                "ad_group_id",
-                "campaign_id",
-                "customer_id",
-             },
-        ),
-        "campaigns": BaseStream(
-            report_definitions.CAMPAIGN_FIELDS,
-            ["campaign"],
-            resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="campaign.id"
-        ),
-        "campaign_budgets": BaseStream(
-            report_definitions.CAMPAIGN_BUDGET_FIELDS,
-            ["campaign_budget"],
-            resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="campaign_budget.id"
-        ),
-        "campaign_criterion": BaseStream(
-            report_definitions.CAMPAIGN_CRITERION_FIELDS,
-            ["campaign_criterion"],
-            resource_schema,
-            ["campaign_id","criterion_id"],
-            {"customer_id"},
-            filter_param="campaign.id"
-        ),
-        "campaign_labels": BaseStream(
-            report_definitions.CAMPAIGN_LABEL_FIELDS,
-            ["campaign_label"],
-            resource_schema,
-            ["resource_name"],
-            {
-                "campaign_id",
-                "customer_id",
-                "label_id",
-            },
-        ),
-        "carrier_constant": BaseStream(
-            report_definitions.CARRIER_CONSTANT_FIELDS,
-            ["carrier_constant"],
-            resource_schema,
-            ["id"],
-           filter_param="carrier_constant.id"
-        ),
-        "labels": BaseStream(
-            report_definitions.LABEL_FIELDS,
-            ["label"],
-            resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="label.id"
-        ),
-        "language_constant": BaseStream(
-            report_definitions.LANGUAGE_CONSTANT_FIELDS,
-            ["language_constant"],
-            resource_schema,
-            ["id"],
-            filter_param="language_constant.id"
-        ),
-        "mobile_app_category_constant": BaseStream(
-            report_definitions.MOBILE_APP_CATEGORY_CONSTANT_FIELDS,
-            ["mobile_app_category_constant"],
-            resource_schema,
-            ["id"],
-            filter_param="mobile_app_category_constant.id"
-        ),
-        "mobile_device_constant": BaseStream(
-            report_definitions.MOBILE_DEVICE_CONSTANT_FIELDS,
-            ["mobile_device_constant"],
-            resource_schema,
-            ["id"],
-            filter_param="mobile_device_constant.id"
-        ),
-        "operating_system_version_constant": BaseStream(
-            report_definitions.OPERATING_SYSTEM_VERSION_CONSTANT_FIELDS,
-            ["operating_system_version_constant"],
-            resource_schema,
-            ["id"],
-            filter_param="operating_system_version_constant.id"
-        ),
-        "topic_constant": BaseStream(
-            report_definitions.TOPIC_CONSTANT_FIELDS,
-            ["topic_constant"],
-            resource_schema,
-            ["id"],
-            filter_param="topic_constant.id"
-        ),
-        "user_interest": UserInterestStream(
-            report_definitions.USER_INTEREST_FIELDS,
-            ["user_interest"],
-            resource_schema,
-            ["id"],
-            filter_param="user_interest.user_interest_id"
-        ),
-        "user_list": BaseStream(
-            report_definitions.USER_LIST_FIELDS,
-            ["user_list"],
+
+class StreamSpec(namedtuple("StreamSpec", ["stream_class", "fields", "google_ads_resource_names", "primary_keys",
+                                           "automatic_keys", "filter_param"], defaults=(None, None))):
+    """Everything needed to build a stream object except the resource schema"""
+
+    def build(self, resource_schema):
+        return self.stream_class(
+            self.fields,
+            self.google_ads_resource_names,
             resource_schema,
-            ["id"],
-            {"customer_id"},
-            filter_param="user_list.id"
-        ),
-    }
+            self.primary_keys,
+            self.automatic_keys,
+            filter_param=self.filter_param,
+        )
+
+
+CORE_STREAM_SPECS = {
+    "accessible_bidding_strategies": StreamSpec(
+        BaseStream,
+        report_definitions.ACCESSIBLE_BIDDING_STRATEGY_FIELDS,
+        ["accessible_bidding_strategy"],
+        ["id"],
+        {"customer_id"},
+        filter_param="accessible_bidding_strategy.id"
+    ),
+    "accounts": StreamSpec(
+        BaseStream,
+        report_definitions.ACCOUNT_FIELDS,
+        ["customer"],
+        ["id"],
+        filter_param="customer.id"
+    ),
+    "ad_groups": StreamSpec(
+        BaseStream,
+        report_definitions.AD_GROUP_FIELDS,
+        ["ad_group"],
+        ["id"],
+        {
+            "campaign_id",
+            "customer_id",
+         },
+        filter_param="ad_group.id"
+    ),
+    "ad_group_criterion": StreamSpec(
+        BaseStream,
+        report_definitions.AD_GROUP_CRITERION_FIELDS,
+        ["ad_group_criterion"],
+        ["ad_group_id","criterion_id"],
+        {
+            "campaign_id",
+            "customer_id",
+        },
+        filter_param="ad_group.id"
+    ),
+    "ads": StreamSpec(
+        BaseStream,
+        report_definitions.AD_GROUP_AD_FIELDS,
+        ["ad_group_ad"],
+        ["id"],
+        {
+            "ad_group_id",
+            "campaign_id",
+            "customer_id",
+         },
+        filter_param = "ad_group_ad.ad.id"
+    ),
+    "assets": StreamSpec(
+        BaseStream,
+        report_definitions.ASSET_FIELDS,
+        ["asset"],
+        ["id"],
+        filter_param="asset.id"
+    ),
+    "bidding_strategies": StreamSpec(
+        BaseStream,
+        report_definitions.BIDDING_STRATEGY_FIELDS,
+        ["bidding_strategy"],
+        ["id"],
+        {"customer_id"},
+        filter_param="bidding_strategy.id"
+    ),
+    "call_details": StreamSpec(
+        BaseStream,
+        report_definitions.CALL_VIEW_FIELDS,
+        ["call_view"],
+        ["resource_name"],
+        {
+            "ad_group_id",
+            "campaign_id",
+            "customer_id",
+         },
+    ),
+    "campaigns": StreamSpec(
+        BaseStream,
+        report_definitions.CAMPAIGN_FIELDS,
+        ["campaign"],
+        ["id"],
+        {"customer_id"},
+        filter_param="campaign.id"
+    ),
+    "campaign_budgets": StreamSpec(
+        BaseStream,
+        report_definitions.CAMPAIGN_BUDGET_FIELDS,
+        ["campaign_budget"],
+        ["id"],
+        {"customer_id"},
+        filter_param="campaign_budget.id"
+    ),
+    "campaign_criterion": StreamSpec(
+        BaseStream,
+        report_definitions.CAMPAIGN_CRITERION_FIELDS,
+        ["campaign_criterion"],
+        ["campaign_id","criterion_id"],
+        {"customer_id"},
+        filter_param="campaign.id"
+    ),
+    "campaign_labels": StreamSpec(
+        BaseStream,
+        report_definitions.CAMPAIGN_LABEL_FIELDS,
+        ["campaign_label"],
+        ["resource_name"],
+        {
+            "campaign_id",
+            "customer_id",
+            "label_id",
+        },
+    ),
+    "carrier_constant": StreamSpec(
+        BaseStream,
+        report_definitions.CARRIER_CONSTANT_FIELDS,
+        ["carrier_constant"],
+        ["id"],
+       filter_param="carrier_constant.id"
+    ),
+    "labels": StreamSpec(
+        BaseStream,
+        report_definitions.LABEL_FIELDS,
+        ["label"],
+        ["id"],
+        {"customer_id"},
+        filter_param="label.id"
+    ),
+    "language_constant": StreamSpec(
+        BaseStream,
+        report_definitions.LANGUAGE_CONSTANT_FIELDS,
+        ["language_constant"],
+        ["id"],
+        filter_param="language_constant.id"
+    ),
+    "mobile_app_category_constant": StreamSpec(
+        BaseStream,
+        report_definitions.MOBILE_APP_CATEGORY_CONSTANT_FIELDS,
+        ["mobile_app_category_constant"],
+        ["id"],
+        filter_param="mobile_app_category_constant.id"
+    ),
+    "mobile_device_constant": StreamSpec(
+        BaseStream,
+        report_definitions.MOBILE_DEVICE_CONSTANT_FIELDS,
+        ["mobile_device_constant"],
+        ["id"],
+        filter_param="mobile_device_constant.id"
+    ),
+    "operating_system_version_constant": StreamSpec(
+        BaseStream,
+        report_definitions.OPERATING_SYSTEM_VERSION_CONSTANT_FIELDS,
+        ["operating_system_version_constant"],
+        ["id"],
+        filter_param="operating_system_version_constant.id"
+    ),
+    "topic_constant": StreamSpec(
+        BaseStream,
+        report_definitions.TOPIC_CONSTANT_FIELDS,
+        ["topic_constant"],
+        ["id"],
+        filter_param="topic_constant.id"
+    ),
+    "user_interest": StreamSpec(
+        UserInterestStream,
+        report_definitions.USER_INTEREST_FIELDS,
+        ["user_interest"],
+        ["id"],
+        filter_param="user_interest.user_interest_id"
+    ),
+    "user_list": StreamSpec(
+        BaseStream,
+        report_definitions.USER_LIST_FIELDS,
+        ["user_list"],
+        ["id"],
+        {"customer_id"},
+        filter_param="user_list.id"
+    ),
+}
+
+# Core streams of Google's global constants. Every customer gets the same records, which
+# have no customer_id, so a sync only needs to query them for one customer.
+GLOBAL_CONSTANT_STREAMS = frozenset({
+    "carrier_constant",
+    "language_constant",
+    "mobile_app_category_constant",
+    "mobile_device_constant",
+    "operating_system_version_constant",
+    "topic_constant",
+    "user_interest",
+})
+
+# Every report stream reads its own resource, so there are no two report queries for a customer
+# and day that could be merged into one. Core streams on the same resource as a report, like
+# ad_groups and ad_group_performance_report, cannot share its queries either: a report query is
+# segmented by date and only returns rows with metrics, where a core query returns every entity.
+REPORT_STREAM_SPECS = {
+    "account_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.ACCOUNT_PERFORMANCE_REPORT_FIELDS,
+        ["customer"],
+        ["_sdc_record_hash"],
+        {"customer_id"},
+    ),
+    "ad_group_audience_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.AD_GROUP_AUDIENCE_PERFORMANCE_REPORT_FIELDS,
+        ["ad_group_audience_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+         },
+    ),
+    "ad_group_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.AD_GROUP_PERFORMANCE_REPORT_FIELDS,
+        ["ad_group"],
+        ["_sdc_record_hash"],
+        {"ad_group_id"},
+    ),
+    "ad_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.AD_PERFORMANCE_REPORT_FIELDS,
+        ["ad_group_ad"],
+        ["_sdc_record_hash"],
+        {"id"},
+    ),
+    "age_range_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.AGE_RANGE_PERFORMANCE_REPORT_FIELDS,
+        ["age_range_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_age_range",
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+         },
+    ),
+    "campaign_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.CAMPAIGN_PERFORMANCE_REPORT_FIELDS,
+        ["campaign"],
+        ["_sdc_record_hash"],
+        {"campaign_id"},
+    ),
+    "campaign_audience_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.CAMPAIGN_AUDIENCE_PERFORMANCE_REPORT_FIELDS,
+        ["campaign_audience_view"],
+        ["_sdc_record_hash"],
+        {
+            "campaign_id",
+            "campaign_criterion_criterion_id",
+        },
+    ),
+    "click_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.CLICK_PERFORMANCE_REPORT_FIELDS,
+        ["click_view"],
+        ["_sdc_record_hash"],
+        {
+            "clicks",
+            "click_view_gclid",
+        },
+    ),
+    "display_keyword_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.DISPLAY_KEYWORD_PERFORMANCE_REPORT_FIELDS,
+        ["display_keyword_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+        },
+    ),
+    "display_topics_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.DISPLAY_TOPICS_PERFORMANCE_REPORT_FIELDS,
+        ["topic_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+        },
+    ),
+    "expanded_landing_page_report": StreamSpec(
+        ReportStream,
+        report_definitions.EXPANDED_LANDING_PAGE_REPORT_FIELDS,
+        ["expanded_landing_page_view"],
+        ["_sdc_record_hash"],
+        {"expanded_landing_page_view_expanded_final_url"},
+    ),
+    "gender_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.GENDER_PERFORMANCE_REPORT_FIELDS,
+        ["gender_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+        },
+    ),
+    "geo_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.GEO_PERFORMANCE_REPORT_FIELDS,
+        ["geographic_view"],
+        ["_sdc_record_hash"],
+        {
+            "geographic_view_country_criterion_id",
+            "geographic_view_location_type",
+        },
+    ),
+    "keywordless_query_report": StreamSpec(
+        ReportStream,
+        report_definitions.KEYWORDLESS_QUERY_REPORT_FIELDS,
+        ["dynamic_search_ads_search_term_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_id",
+            "dynamic_search_ads_search_term_view_headline",
+            "dynamic_search_ads_search_term_view_landing_page",
+            "dynamic_search_ads_search_term_view_page_url",
+            "dynamic_search_ads_search_term_view_search_term",
+        },
+    ),
+    "keywords_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.KEYWORDS_PERFORMANCE_REPORT_FIELDS,
+        ["keyword_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+        },
+    ),
+    "landing_page_report": StreamSpec(
+        ReportStream,
+        report_definitions.LANDING_PAGE_REPORT_FIELDS,
+        ["landing_page_view"],
+        ["_sdc_record_hash"],
+        {"landing_page_view_unexpanded_final_url"},
+    ),
+    "placement_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.PLACEMENT_PERFORMANCE_REPORT_FIELDS,
+        ["managed_placement_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_criterion_criterion_id",
+            "ad_group_id",
+        },
+    ),
+    "search_query_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.SEARCH_QUERY_PERFORMANCE_REPORT_FIELDS,
+        ["search_term_view"],
+        ["_sdc_record_hash"],
+        {
+            "ad_group_id",
+            "campaign_id",
+            "search_term_view_search_term",
+        },
+    ),
+    "shopping_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.SHOPPING_PERFORMANCE_REPORT_FIELDS,
+        ["shopping_performance_view"],
+        ["_sdc_record_hash"],
+    ),
+    "user_location_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.USER_LOCATION_PERFORMANCE_REPORT_FIELDS,
+        ["user_location_view"],
+        ["_sdc_record_hash"],
+        {
+            "user_location_view_country_criterion_id",
+            "user_location_view_targeting_location",
+        },
+    ),
+    "video_performance_report": StreamSpec(
+        ReportStream,
+        report_definitions.VIDEO_PERFORMANCE_REPORT_FIELDS,
+        ["video"],
+        ["_sdc_record_hash"],
+        {"video_id"},
+    ),
+}
+
+
+def initialize_core_streams(resource_schema):
+    return {stream_name: spec.build(resource_schema) for stream_name, spec in CORE_STREAM_SPECS.items()}
 
 
 def initialize_reports(resource_schema):
-    return {
-        "account_performance_report": ReportStream(
-            report_definitions.ACCOUNT_PERFORMANCE_REPORT_FIELDS,
-            ["customer"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"customer_id"},
-        ),
-        "ad_group_audience_performance_report": ReportStream(
-            report_definitions.AD_GROUP_AUDIENCE_PERFORMANCE_REPORT_FIELDS,
-            ["ad_group_audience_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-             },
-        ),
-        "ad_group_performance_report": ReportStream(
-            report_definitions.AD_GROUP_PERFORMANCE_REPORT_FIELDS,
-            ["ad_group"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"ad_group_id"},
-        ),
-        "ad_performance_report": ReportStream(
-            report_definitions.AD_PERFORMANCE_REPORT_FIELDS,
-            ["ad_group_ad"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"id"},
-        ),
-        "age_range_performance_report": ReportStream(
-            report_definitions.AGE_RANGE_PERFORMANCE_REPORT_FIELDS,
-            ["age_range_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_age_range",
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-             },
-        ),
-        "campaign_performance_report": ReportStream(
-            report_definitions.CAMPAIGN_PERFORMANCE_REPORT_FIELDS,
-            ["campaign"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"campaign_id"},
-        ),
-        "campaign_audience_performance_report": ReportStream(
-            report_definitions.CAMPAIGN_AUDIENCE_PERFORMANCE_REPORT_FIELDS,
-            ["campaign_audience_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "campaign_id",
-                "campaign_criterion_criterion_id",
-            },
-        ),
-        "click_performance_report": ReportStream(
-            report_definitions.CLICK_PERFORMANCE_REPORT_FIELDS,
-            ["click_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "clicks",
-                "click_view_gclid",
-            },
-        ),
-        "display_keyword_performance_report": ReportStream(
-            report_definitions.DISPLAY_KEYWORD_PERFORMANCE_REPORT_FIELDS,
-            ["display_keyword_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-            },
-        ),
-        "display_topics_performance_report": ReportStream(
-            report_definitions.DISPLAY_TOPICS_PERFORMANCE_REPORT_FIELDS,
-            ["topic_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-            },
-        ),
-        "expanded_landing_page_report": ReportStream(
-            report_definitions.EXPANDED_LANDING_PAGE_REPORT_FIELDS,
-            ["expanded_landing_page_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"expanded_landing_page_view_expanded_final_url"},
-        ),
-        "gender_performance_report": ReportStream(
-            report_definitions.GENDER_PERFORMANCE_REPORT_FIELDS,
-            ["gender_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-            },
-        ),
-        "geo_performance_report": ReportStream(
-            report_definitions.GEO_PERFORMANCE_REPORT_FIELDS,
-            ["geographic_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "geographic_view_country_criterion_id",
-                "geographic_view_location_type",
-            },
-        ),
-        "keywordless_query_report": ReportStream(
-            report_definitions.KEYWORDLESS_QUERY_REPORT_FIELDS,
-            ["dynamic_search_ads_search_term_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_id",
-                "dynamic_search_ads_search_term_view_headline",
-                "dynamic_search_ads_search_term_view_landing_page",
-                "dynamic_search_ads_search_term_view_page_url",
-                "dynamic_search_ads_search_term_view_search_term",
-            },
-        ),
-        "keywords_performance_report": ReportStream(
-            report_definitions.KEYWORDS_PERFORMANCE_REPORT_FIELDS,
-            ["keyword_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-            },
-        ),
-        "landing_page_report": ReportStream(
-            report_definitions.LANDING_PAGE_REPORT_FIELDS,
-            ["landing_page_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"landing_page_view_unexpanded_final_url"},
-        ),
-        "placement_performance_report": ReportStream(
-            report_definitions.PLACEMENT_PERFORMANCE_REPORT_FIELDS,
-            ["managed_placement_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_criterion_criterion_id",
-                "ad_group_id",
-            },
-        ),
-        "search_query_performance_report": ReportStream(
-            report_definitions.SEARCH_QUERY_PERFORMANCE_REPORT_FIELDS,
-            ["search_term_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "ad_group_id",
-                "campaign_id",
-                "search_term_view_search_term",
-            },
-        ),
-        "shopping_performance_report": ReportStream(
-            report_definitions.SHOPPING_PERFORMANCE_REPORT_FIELDS,
-            ["shopping_performance_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-        ),
-        "user_location_performance_report": ReportStream(
-            report_definitions.USER_LOCATION_PERFORMANCE_REPORT_FIELDS,
-            ["user_location_view"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {
-                "user_location_view_country_criterion_id",
-                "user_location_view_targeting_location",
-            },
-        ),
-        "video_performance_report": ReportStream(
-            report_definitions.VIDEO_PERFORMANCE_REPORT_FIELDS,
-            ["video"],
-            resource_schema,
-            ["_sdc_record_hash"],
-            {"video_id"},
-        ),
-    }
+    return {stream_name: spec.build(resource_schema) for stream_name, spec in REPORT_STREAM_SPECS.items()}
@@ -1,10 +1,27 @@
+import asyncio
+import hashlib
 import json
 import singer
+from tap_google_ads.async_sync import sync_report_streams
 from tap_google_ads.client import create_sdk_client
+from tap_google_ads.digest_store import add_deleted_at
+from tap_google_ads.digest_store import create_digest_store
+from tap_google_ads.digest_store import get_core_deletion_markers
+from tap_google_ads.instrumentation import INSTRUMENTATION
+from tap_google_ads.memory import create_memory_tracker
+from tap_google_ads import messages
+from tap_google_ads.operation_budget import create_operation_budget
+from tap_google_ads.operation_budget import spending
+from tap_google_ads.profiling import NullProfiler
+from tap_google_ads.report_output import create_report_output
+from tap_google_ads.streams import GLOBAL_CONSTANT_STREAMS
+from tap_google_ads.streams import get_conversion_window_overrides
+from tap_google_ads.streams import get_selected_fields
 from tap_google_ads.streams import initialize_core_streams, initialize_reports
 
 LOGGER = singer.get_logger()
 DEFAULT_QUERY_LIMIT = 1000000
+SYNC_ENGINES = ("blocking", "async")
 
 
 def get_currently_syncing(state):
@@ -20,6 +37,44 @@ def get_currently_syncing(state):
 def sort_customers(customers):
     return sorted(customers, key=lambda x: x["customerId"])
 
+def get_shard(config):
+    """Fetch `shard_index` and `shard_count` from the config and error on invalid values"""
+    shard_index = config.get("shard_index") or 0
+    shard_count = config.get("shard_count") or 1
+
+    try:
+        shard_index = int(shard_index)
+        shard_count = int(shard_count)
+    except (ValueError, TypeError) as err:
+        raise RuntimeError("Shard Index and Shard Count must be ints or strings") from err
+
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise RuntimeError("Shard Count must be at least 1 and Shard Index between 0 and Shard Count - 1 inclusive")
+    return shard_index, shard_count
+
+
+def get_customer_shard(customer_id, shard_count):
+    """Hash the customer id rather than use its position, so a customer stays in
+    its shard when other customers are added to or removed from the config"""
+    digest = hashlib.sha256(str(customer_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def shard_customers(customers, shard_index, shard_count):
+    """Return the customers that belong to `shard_index`, keeping their order"""
+    return [
+        customer
+        for customer in customers
+        if get_customer_shard(customer["customerId"], shard_count) == shard_index
+    ]
+
+def get_sync_engine(config):
+    """Fetch `sync_engine` from the config and error on invalid values"""
+    sync_engine = config.get("sync_engine") or "blocking"
+    if sync_engine not in SYNC_ENGINES:
+        raise RuntimeError(f"Sync Engine must be one of {', '.join(SYNC_ENGINES)}")
+    return sync_engine
+
 def sort_selected_streams(sort_list):
     return sorted(sort_list, key=lambda x: x["tap_stream_id"])
 
@@ -70,7 +125,63 @@ def get_query_limit(config):
         LOGGER.warning(f"The entered query limit is invalid; it will be set to the default query limit of {DEFAULT_QUERY_LIMIT}")
         return DEFAULT_QUERY_LIMIT
 
-def do_sync(config, catalog, resource_schema, state):
+def check_conversion_window_overrides(config, catalog):
+    """Warn about `conversion_window_overrides` entries for streams not in the catalog,
+    a misspelled stream name would otherwise leave that stream on `conversion_window`"""
+    stream_names = {catalog_entry["stream"] for catalog_entry in catalog["streams"]}
+    for stream_name in sorted(get_conversion_window_overrides(config).keys() - stream_names):
+        LOGGER.warning(f"Conversion Window Overrides name an unknown stream: {stream_name}; it will be ignored")
+
+def get_stream_customers(catalog_entry, customers, state):
+    """The customers a stream is synced for
+
+    Global constants are the same for every customer, so only one customer queries them,
+    and always the same one, so their records and digests keep the same customer. That is
+    the first customer by id, unless the stream was interrupted, when it is the customer
+    its `last_pk_fetched` bookmark belongs to."""
+    if catalog_entry["stream"] not in GLOBAL_CONSTANT_STREAMS or not customers:
+        return customers
+
+    bookmarks = state.get("bookmarks", {}).get(catalog_entry["tap_stream_id"], {})
+    for customer in customers:
+        if bookmarks.get(customer["customerId"], {}).get("last_pk_fetched") is not None:
+            return [customer]
+    return sort_customers(customers)[:1]
+
+
+def plan_operations(operation_budget, selected_streams, core_streams, report_streams, customers, config, state):
+    """Plan the sync's report days within what is left of the daily operation limit
+
+    Each core stream is planned as one operation per customer, its first query. Streams paged
+    with `query_limit` can make more, so the core operations are a lower bound."""
+    core_operations = 0
+    date_ranges = {}
+    for catalog_entry in selected_streams:
+        stream_name = catalog_entry["stream"]
+        if core_streams.get(stream_name):
+            core_operations += len(get_stream_customers(catalog_entry, customers, state))
+            continue
+
+        selected_fields = get_selected_fields(catalog_entry["metadata"])
+        for customer in customers:
+            bookmark = singer.get_bookmark(state, catalog_entry["tap_stream_id"], customer["customerId"], default={})
+            query_date, end_date = report_streams[stream_name].get_date_range(stream_name, selected_fields,
+                                                                              bookmark.get("date"), config)
+            bookmark_date = singer.utils.strptime_to_utc(bookmark["date"]) if bookmark.get("date") else None
+            date_ranges[(catalog_entry["tap_stream_id"], customer["customerId"])] = (query_date, end_date,
+                                                                                    bookmark_date)
+    return operation_budget.plan(core_operations, date_ranges)
+
+
+def do_sync(config, catalog, resource_schema, state, profiler=None):
+    if profiler is None:
+        profiler = NullProfiler()
+    memory_tracker = create_memory_tracker(config)
+    report_digest_store = create_digest_store(config, "report_digest_path")
+    core_digest_store = create_digest_store(config, "core_digest_path")
+    report_output = create_report_output(config)
+    operation_budget = create_operation_budget(config)
+
     # QA ADDED WORKAROUND [START]
     try:
         customers = json.loads(config["login_customer_ids"])
@@ -82,6 +193,13 @@ def do_sync(config, catalog, resource_schema, state):
     # QA ADDED WORKAROUND [END]
     customers = sort_customers(customers)
 
+    shard_index, shard_count = get_shard(config)
+    if shard_count > 1:
+        customers = shard_customers(customers, shard_index, shard_count)
+        LOGGER.info(f"Syncing shard {shard_index} of {shard_count}: {len(customers)} customers.")
+
+    check_conversion_window_overrides(config, catalog)
+
     selected_streams = [
         stream
         for stream in catalog["streams"]
@@ -109,24 +227,75 @@ def do_sync(config, catalog, resource_schema, state):
             sort_function=sort_customers
         )
 
+    if config.get("operation_budget_path"):
+        plan_operations(operation_budget, selected_streams, core_streams, report_streams, customers, config, state)
+
+    try:
+        with spending(operation_budget):
+            sync_streams(config, selected_streams, core_streams, report_streams, customers, state, query_limit,
+                         profiler, memory_tracker, report_digest_store, core_digest_store, report_output,
+                         operation_budget)
+
+        state.pop("currently_syncing", None)
+        messages.write_state(state)
+
+        if config.get("metrics_summary_path"):
+            INSTRUMENTATION.write_summary(config["metrics_summary_path"])
+        memory_tracker.write_report()
+        report_output.close()
+    finally:
+        # A failed sync still spent its operations, and the stores only hold what was saved
+        report_digest_store.close()
+        core_digest_store.close()
+        operation_budget.close()
+
+
+def sync_streams(config, selected_streams, core_streams, report_streams, customers, state, query_limit,
+                 profiler, memory_tracker, report_digest_store, core_digest_store, report_output,
+                 operation_budget):
+    """Sync every selected stream for every customer, in order"""
+    sync_engine = get_sync_engine(config)
+    async_report_streams = []
+
     for catalog_entry in selected_streams:
         stream_name = catalog_entry["stream"]
         mdata_map = singer.metadata.to_map(catalog_entry["metadata"])
 
         primary_key = mdata_map[()].get("table-key-properties", [])
-        singer.messages.write_schema(stream_name, catalog_entry["schema"], primary_key)
+        schema = catalog_entry["schema"]
+        if core_streams.get(stream_name) and get_core_deletion_markers(config):
+            schema = add_deleted_at(schema)
+        if core_streams.get(stream_name) or report_output.writes_report_schemas:
+            messages.write_schema(stream_name, schema, primary_key)
 
-        for customer in customers:
+        if sync_engine == "async" and not core_streams.get(stream_name):
+            # Report streams are synced together, once every core stream is done
+            async_report_streams.append(catalog_entry)
+            continue
+
+        stream_customers = get_stream_customers(catalog_entry, customers, state)
+        if stream_customers is not customers:
+            LOGGER.info(f"{stream_name} is the same for every customer, syncing it for customer Id "
+                        f"{stream_customers[0]['customerId']} only.")
+
+        for customer in stream_customers:
             sdk_client = create_sdk_client(config, customer["loginCustomerId"])
 
             LOGGER.info(f"Syncing {stream_name} for customer Id {customer['customerId']}.")
 
             if core_streams.get(stream_name):
                 stream_obj = core_streams[stream_name]
+                digest_store = core_digest_store
             else:
                 stream_obj = report_streams[stream_name]
+                digest_store = report_digest_store
 
-            stream_obj.sync(sdk_client, customer, catalog_entry, config, state, query_limit=query_limit)
+            with profiler.unit(f"{stream_name}__{customer['customerId']}"), \
+                 memory_tracker.unit(stream_name, customer["customerId"]):
+                stream_obj.sync(sdk_client, customer, catalog_entry, config, state, query_limit=query_limit,
+                                digest_store=digest_store, report_output=report_output,
+                                operation_budget=operation_budget)
 
-    state.pop("currently_syncing", None)
-    singer.write_state(state)
+    if async_report_streams:
+        asyncio.run(sync_report_streams(config, async_report_streams, report_streams, customers, state,
+                                        report_digest_store, report_output, operation_budget))
@@ -0,0 +1,71 @@
+"""
+Stored benchmark baselines and regression checks.
+
+Results live in `baselines.json` next to this file, keyed by benchmark, case and
+metric. Metrics are either higher-is-better (`records_per_second`) or
+lower-is-better (`seconds`, `peak_kib`, ...); `compare` reports any metric that
+moved the wrong way by more than `tolerance`.
+"""
+import json
+import os
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+HIGHER_IS_BETTER = {"records_per_second", "megabytes_per_second", "compression_ratio"}
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baselines(benchmark, results, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines[benchmark] = results
+    with open(path, "w", encoding="utf-8") as baselines_file:
+        json.dump(baselines, baselines_file, indent=2, sort_keys=True)
+        baselines_file.write("\n")
+
+
+def compare(benchmark, results, tolerance, path=BASELINES_PATH):
+    """Return a list of human readable regressions against the stored baseline"""
+    baseline = load_baselines(path).get(benchmark, {})
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(case, {}).get(metric)
+            if not expected:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                regressed = value < expected * (1 - tolerance)
+            else:
+                regressed = value > expected * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{benchmark}: {case} {metric} = {value} (baseline {expected})")
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression against the baseline (default 0.25)")
+
+
+def report(benchmark, results, args):
+    """Print the results, then store or check them. Returns a process exit code"""
+    for case, metrics in sorted(results.items()):
+        formatted = ", ".join(f"{metric}={value}" for metric, value in sorted(metrics.items()))
+        print(f"{case:55} {formatted}")
+
+    if args.update_baselines:
+        save_baselines(benchmark, results)
+        print(f"Stored baseline for {benchmark} in {BASELINES_PATH}")
+        return 0
+
+    regressions = compare(benchmark, results, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,158 @@
+"""
+Benchmark catalog generation in `do_discover`.
+
+The resource schema is built by `create_resource_schema` from the fields the
+fake `GoogleAdsFieldService` in `fake_google_ads.py` describes, so no API
+access is needed. Each case then writes the full catalog to /dev/null:
+
+- `list_then_dump`: every catalog entry in one list, then a single
+  `json.dump(..., indent=2)`, which is how discovery used to work
+- `streaming`: `do_discover`, one entry serialized at a time
+- `streaming_compact`: `do_discover` with `compact_catalog` on
+- `parallel`: `do_discover` building and formatting the streams on a pool of
+  `--processes` workers (`discovery_processes`)
+- `full_from_fields`: the whole of discovery from the fields the API
+  describes, including `create_resource_schema`'s field exclusions
+- `incremental_unchanged`: the same with a warm `discovery_cache_dir` and no
+  field changes, so every entry comes from the cache
+
+Every case reports the best wall time of `--repeat` runs, the peak memory of
+a separate `tracemalloc` pass and the size of the catalog.
+
+Usage:
+
+    python tests/benchmarks/bench_catalog.py [--repeat 3] [--update-baselines]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from functools import partial
+from unittest import mock
+
+import singer
+
+from tap_google_ads import discover
+from tap_google_ads import discovery_cache
+from tap_google_ads.streams import initialize_core_streams
+from tap_google_ads.streams import initialize_reports
+
+import baselines
+import fake_google_ads
+
+BENCHMARK = "catalog"
+
+
+def build_resource_schema():
+    with mock.patch.object(discover, "get_api_objects", return_value=fake_google_ads.build_fields()):
+        return discover.create_resource_schema({})
+
+
+def list_then_dump(resource_schema):
+    stream_objects = {**initialize_core_streams(resource_schema), **initialize_reports(resource_schema)}
+    streams = [
+        {
+            "tap_stream_id": stream_name,
+            "stream": stream_name,
+            "schema": stream.stream_schema,
+            "metadata": singer.metadata.to_list(stream.stream_metadata),
+        }
+        for stream_name, stream in stream_objects.items()
+    ]
+    json.dump({"streams": streams}, sys.stdout, indent=2)
+
+
+def streaming(resource_schema):
+    discover.do_discover(resource_schema)
+
+
+def streaming_compact(resource_schema):
+    discover.do_discover(resource_schema, compact=True)
+
+
+def parallel(resource_schema, processes):
+    discover.do_discover(resource_schema, processes=processes)
+
+
+def full_from_fields(resource_schema, fields):  # pylint: disable=unused-argument
+    with mock.patch.object(discover, "get_api_objects", return_value=fields):
+        discover.do_discover(discover.create_resource_schema({}))
+
+
+def incremental_unchanged(resource_schema, fields, cache_dir):  # pylint: disable=unused-argument
+    discovery_cache.discover_incrementally(discover.build_base_resource_schema(fields), cache_dir)
+
+
+CASES = {
+    "list_then_dump": list_then_dump,
+    "streaming": streaming,
+    "streaming_compact": streaming_compact,
+}
+
+
+def catalog_megabytes(function, resource_schema):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        function(resource_schema)
+    return round(len(output.getvalue().encode("utf-8")) / 1e6, 3)
+
+
+def run(repeat, processes, cache_dir):
+    resource_schema = build_resource_schema()
+    fields = fake_google_ads.build_fields()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        # Fill the cache; nothing changes between this run and the measured ones
+        incremental_unchanged(resource_schema, fields, cache_dir)
+
+    cases = dict(CASES,
+                 parallel=partial(parallel, processes=processes),
+                 full_from_fields=partial(full_from_fields, fields=fields),
+                 incremental_unchanged=partial(incremental_unchanged, fields=fields, cache_dir=cache_dir))
+    results = {}
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        for case, function in cases.items():
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function(resource_schema)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            tracemalloc.start()
+            try:
+                function(resource_schema)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            results[case] = {"seconds": round(best, 3), "peak_kib": round(peak / 1024, 1)}
+
+    for case, function in cases.items():
+        results[case]["catalog_megabytes"] = catalog_megabytes(function, resource_schema)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs (default 3)")
+    parser.add_argument("--processes", type=int, default=4, help="Workers for the parallel case (default 4)")
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        results = run(args.repeat, args.processes, cache_dir)
+    finally:
+        shutil.rmtree(cache_dir)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
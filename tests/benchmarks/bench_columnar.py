@@ -0,0 +1,92 @@
+"""
+Benchmark building report records a row at a time against a page of columns.
+
+Each report stream's synthetic rows are split into pages of `--page-size`
+rows and turned into the values the tap writes, through:
+
+- `rows`: `ReportStream.build_record` for every row, the path of `output_format` singer
+- `columns`: `ColumnarPageBuilder.build` for every page, the path of `output_format` parquet
+
+Both give the same values, `_sdc_record_hash` included; each case reports
+records per second and `speedup` is the columns rate over the rows rate.
+
+Usage:
+
+    python tests/benchmarks/bench_columnar.py [--rows 5000] [--update-baselines]
+
+The exit code is non-zero when a result regressed against `baselines.json`.
+"""
+import argparse
+import sys
+import time
+
+from singer import Transformer
+
+from tap_google_ads.columnar import ColumnarPageBuilder
+
+import baselines
+import synthetic
+
+BENCHMARK = "columnar"
+
+
+def pages(rows, page_size):
+    for start in range(0, len(rows), page_size):
+        yield rows[start:start + page_size]
+
+
+def build_rows(stream, catalog_entry, rows, page_size):
+    started = time.perf_counter()
+    with Transformer() as transformer:
+        for page in pages(rows, page_size):
+            for row in page:
+                stream.build_record(row, transformer, catalog_entry)
+    return time.perf_counter() - started
+
+
+def build_columns(catalog_entry, rows, page_size):
+    builder = ColumnarPageBuilder(catalog_entry)
+    started = time.perf_counter()
+    for page in pages(rows, page_size):
+        if builder.build(page) is None:
+            raise RuntimeError(f"{catalog_entry['stream']} can't be built as columns")
+    return time.perf_counter() - started
+
+
+def run(stream_names, row_count, page_size, repeat):
+    resource_schema = synthetic.build_resource_schema()
+    results = {}
+
+    for stream_name in stream_names:
+        _, fields = synthetic.REPORT_STREAMS[stream_name]
+        stream, catalog_entry = synthetic.build_catalog_entry(stream_name, resource_schema)
+        rows = synthetic.make_rows(fields, row_count)
+
+        rows_seconds = min(build_rows(stream, catalog_entry, rows, page_size) for _ in range(repeat))
+        columns_seconds = min(build_columns(catalog_entry, rows, page_size) for _ in range(repeat))
+        results[f"{stream_name}/rows"] = {
+            "records_per_second": round(row_count / rows_seconds),
+        }
+        results[f"{stream_name}/columns"] = {
+            "records_per_second": round(row_count / columns_seconds),
+            "speedup": round(rows_seconds / columns_seconds, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per stream, baselines are stored for the default (default 5000)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows per page (default 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs (default 3)")
+    parser.add_argument("--streams", nargs="+", default=sorted(synthetic.REPORT_STREAMS),
+                        choices=sorted(synthetic.REPORT_STREAMS))
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.streams, args.rows, args.page_size, args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
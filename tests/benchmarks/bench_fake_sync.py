@@ -0,0 +1,205 @@
+"""
+Load test a full sync against the local fake Google Ads API.
+
+Starts `fake_google_ads.py` in a subprocess, points `create_sdk_client` at it,
+runs discovery, selects the requested streams with all of their fields and
+then syncs them for every fake customer. With `--processes N` the customers
+are split over N tap processes running side by side, each one syncing its
+own shard (`shard_index` of `shard_count`). `--engine async` syncs the
+report streams with the asyncio engine instead. Singer output goes to
+/dev/null; the row and request counts come from the tap's own request
+instrumentation. Injected errors are retried as the tap retries them; see
+`fake_google_ads.py` for which requests fail.
+
+Usage:
+
+    python tests/benchmarks/bench_fake_sync.py --customers 20 --days 7 --rows 2000 --processes 4
+    python tests/benchmarks/bench_fake_sync.py --customers 20 --days 7 --latency 0.05 --engine async
+    python tests/benchmarks/bench_fake_sync.py --page-size 100 --server-error-rate 0.1 --engine async
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from importlib import import_module
+from unittest import mock
+
+import grpc
+import grpc.aio
+from google.auth.credentials import AnonymousCredentials
+
+import baselines
+import fake_google_ads
+
+BENCHMARK = "fake_sync"
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STREAMS = ["ad_groups", "campaigns", "keywords_performance_report", "search_query_performance_report"]
+PATCHED_SERVICES = ["google_ads_service", "google_ads_field_service"]
+# Customer ids have to be ten digits to pass the client's config validation
+FIRST_CUSTOMER_ID = 1000000000
+
+
+@contextmanager
+def fake_google_ads_server(server_args):
+    """Run the fake API in its own process and yield its address"""
+    command = [sys.executable, os.path.join(HERE, "fake_google_ads.py"), "--port", "0"] + server_args
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)  # pylint: disable=consider-using-with
+    try:
+        line = process.stdout.readline()
+        address = line.strip().rsplit(" ", 1)[-1]
+        yield address
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def fake_sdk_client(address):
+    """Make every client built by `create_sdk_client` talk to `address` over an insecure channel.
+
+    Only the OAuth refresh and the channel are replaced, so the tap still goes
+    through the real GoogleAdsClient, its interceptors and its exception handling."""
+    from tap_google_ads.streams import API_VERSION  # pylint: disable=import-outside-toplevel
+
+    patches = [mock.patch("google.ads.googleads.oauth2.get_credentials",
+                          lambda *args, **kwargs: AnonymousCredentials())]
+    for service in PATCHED_SERVICES:
+        transports = import_module(f"google.ads.googleads.{API_VERSION}.services.services.{service}.transports.grpc")
+        transport_class = next(value for name, value in vars(transports).items()
+                               if name.endswith("GrpcTransport"))
+        patches.append(mock.patch.object(transport_class, "create_channel",
+                                         lambda *args, **kwargs: grpc.insecure_channel(address, options=kwargs.get("options"))))
+    # The async engine's channel
+    transports = import_module(f"google.ads.googleads.{API_VERSION}.services.services.google_ads_service.transports")
+    patches.append(mock.patch.object(transports.GoogleAdsServiceGrpcAsyncIOTransport, "create_channel",
+                                     lambda *args, **kwargs: grpc.aio.insecure_channel(address, options=kwargs.get("options"))))
+    for patch in patches:
+        patch.start()
+    try:
+        yield
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def build_config(customers, days, engine="blocking"):
+    return {
+        "sync_engine": engine,
+        "start_date": "2022-01-01T00:00:00Z",
+        "end_date": f"2022-01-{days:02d}T00:00:00Z",
+        "oauth_client_id": "fake",
+        "oauth_client_secret": "fake",
+        "refresh_token": "fake",
+        "developer_token": "fake",
+        "customer_ids": ",".join(str(FIRST_CUSTOMER_ID + index) for index in range(customers)),
+        "login_customer_ids": [{"customerId": str(FIRST_CUSTOMER_ID + index),
+                                "loginCustomerId": str(FIRST_CUSTOMER_ID + index)}
+                               for index in range(customers)],
+    }
+
+
+def select_streams(catalog, stream_names):
+    selected = []
+    for stream in catalog["streams"]:
+        if stream["tap_stream_id"] not in stream_names:
+            continue
+        for entry in stream["metadata"]:
+            if entry["metadata"].get("inclusion") != "unsupported":
+                entry["metadata"]["selected"] = True
+        selected.append(stream)
+    return {"streams": selected}
+
+
+def sync_worker(address, config, catalog, resource_schema, results):
+    """Sync `config`'s customers with Singer output discarded, report instrumentation totals"""
+    # pylint: disable=import-outside-toplevel
+    from tap_google_ads.instrumentation import INSTRUMENTATION
+    from tap_google_ads.sync import do_sync
+
+    with fake_sdk_client(address), open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        do_sync(config, catalog, resource_schema, {})
+
+    units = INSTRUMENTATION.summary()["units"]
+    results.put({
+        "rows": sum(unit["rows"] for unit in units),
+        "requests": sum(unit["requests"] for unit in units),
+        "retries": sum(unit["retries"] for unit in units),
+        "bytes": sum(unit["bytes"] for unit in units),
+    })
+
+
+def run(args):
+    config = build_config(args.customers, args.days, args.engine)
+    server_args = ["--rows", str(args.rows), "--page-size", str(args.page_size), "--latency", str(args.latency),
+                   "--quota-error-rate", str(args.quota_error_rate),
+                   "--server-error-rate", str(args.server_error_rate), "--seed", str(args.seed)]
+    if args.fail_next_pages:
+        server_args.append("--fail-next-pages")
+
+    with fake_google_ads_server(server_args) as address:
+        # pylint: disable=import-outside-toplevel
+        from tap_google_ads.discover import create_resource_schema, do_discover
+
+        with fake_sdk_client(address):
+            started = time.perf_counter()
+            resource_schema = create_resource_schema(config)
+            catalog_buffer = io.StringIO()
+            with redirect_stdout(catalog_buffer):
+                do_discover(resource_schema)
+            discovery_seconds = time.perf_counter() - started
+
+        catalog = select_streams(json.loads(catalog_buffer.getvalue()), args.streams)
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = [context.Process(target=sync_worker,
+                                   args=(address, dict(config, shard_index=index, shard_count=args.processes),
+                                         catalog, resource_schema, results))
+                   for index in range(args.processes)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        sync_seconds = time.perf_counter() - started
+        if any(worker.exitcode != 0 for worker in workers):
+            raise RuntimeError("A sync worker failed, see its traceback above")
+        totals = [results.get() for _ in workers]
+
+    rows = sum(total["rows"] for total in totals)
+    name = f"{args.processes}_processes" if args.engine == "blocking" else f"{args.processes}_processes_{args.engine}"
+    return {
+        name: {
+            "discovery_seconds": round(discovery_seconds, 3),
+            "sync_seconds": round(sync_seconds, 3),
+            "records_per_second": round(rows / sync_seconds),
+            "rows": rows,
+            "requests": sum(total["requests"] for total in totals),
+            "retries": sum(total["retries"] for total in totals),
+            "megabytes_per_second": round(sum(total["bytes"] for total in totals) / sync_seconds / 1e6, 3),
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=4)
+    parser.add_argument("--days", type=int, default=3, help="Days of report data to sync, starting 2022-01-01")
+    parser.add_argument("--processes", type=int, default=1, help="Tap processes to split the customers over")
+    parser.add_argument("--streams", nargs="+", default=DEFAULT_STREAMS)
+    parser.add_argument("--engine", choices=["blocking", "async"], default="blocking", help="The tap's sync_engine")
+    fake_google_ads.add_arguments(parser)
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark the cold start of the tap.
+
+Every case runs in a fresh interpreter so nothing is cached in `sys.modules`:
+
+- `interpreter`: `python -c pass`, the floor everything else is measured against
+- `import`: `import tap_google_ads`
+- `entry_point`: the `tap-google-ads` entry point up to argument parsing, via `--help`
+
+Each case reports the best wall time of `--repeat` runs, and the import case
+also reports how many modules got loaded and whether google-ads was among
+them. Importing the tap should not load google-ads; that only happens once a
+client is created.
+
+Usage:
+
+    python tests/benchmarks/bench_import_time.py [--repeat 10] [--update-baselines]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import baselines
+
+BENCHMARK = "import_time"
+
+CASES = {
+    "interpreter": "pass",
+    "import": "import tap_google_ads",
+    "entry_point": ("import sys\n"
+                    "sys.argv = ['tap-google-ads', '--help']\n"
+                    "import tap_google_ads\n"
+                    "try:\n"
+                    "    tap_google_ads.main()\n"
+                    "except SystemExit:\n"
+                    "    pass\n"),
+}
+
+LOADED_MODULES = ("import sys, json\n"
+                  "import tap_google_ads\n"
+                  "print(json.dumps(sorted(sys.modules)))\n")
+
+
+def best_wall_time(code, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def loaded_modules():
+    output = subprocess.run([sys.executable, "-c", LOADED_MODULES], check=True,
+                            stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output)
+
+
+def run(repeat):
+    seconds = {case: best_wall_time(code, repeat) for case, code in CASES.items()}
+    modules = loaded_modules()
+
+    results = {"interpreter": {"seconds": round(seconds["interpreter"], 4)}}
+    for case in ("import", "entry_point"):
+        results[case] = {
+            "seconds": round(seconds[case], 4),
+            "seconds_over_interpreter": round(seconds[case] - seconds["interpreter"], 4),
+        }
+    results["import"]["modules"] = len(modules)
+    results["import"]["google_ads_modules"] = len([name for name in modules if name.startswith("google.ads")])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Report the best of this many runs (default 10)")
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
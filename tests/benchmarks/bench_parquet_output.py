@@ -0,0 +1,126 @@
+"""
+Benchmark writing report records as Singer JSON against `output_format` parquet.
+
+Each report stream's synthetic rows are turned into records once, then
+written a day at a time, `--page-size` records per page, through:
+
+- `singer`: `singer.write_record` to an in-memory stdout, the bytes a target reads
+- `parquet`: `ParquetOutput`, one part file per page under a temporary directory
+
+Each case reports records per second and the bytes written; the parquet cases
+also report `compression_ratio`, the JSON bytes over the Parquet bytes.
+
+Usage:
+
+    python tests/benchmarks/bench_parquet_output.py [--rows 5000] [--update-baselines]
+
+The exit code is non-zero when a result regressed against `baselines.json`.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import singer
+from singer import Transformer
+
+from tap_google_ads.report_output import ParquetOutput
+
+import baselines
+import synthetic
+
+BENCHMARK = "parquet_output"
+CUSTOMER_ID = "1234567890"
+DAY = "2022-01-01"
+
+
+def build_records(stream, catalog_entry, rows):
+    with Transformer() as transformer:
+        return [stream.build_record(row, transformer, catalog_entry) for row in rows]
+
+
+def pages(records, page_size):
+    for start in range(0, len(records), page_size):
+        yield str(start) if start else "", records[start:start + page_size]
+
+
+def write_singer(catalog_entry, records, page_size):
+    """Return the seconds taken and the bytes written"""
+    output = io.StringIO()
+    original_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        started = time.perf_counter()
+        for _, page in pages(records, page_size):
+            for record in page:
+                singer.write_record(catalog_entry["stream"], record)
+        seconds = time.perf_counter() - started
+    finally:
+        sys.stdout = original_stdout
+    return seconds, len(output.getvalue().encode("utf-8"))
+
+
+def write_parquet(catalog_entry, records, page_size):
+    """Return the seconds taken and the bytes written"""
+    with tempfile.TemporaryDirectory() as parquet_path:
+        output = ParquetOutput(parquet_path)
+        started = time.perf_counter()
+        with output.report_day(catalog_entry, CUSTOMER_ID, DAY) as report_day:
+            for page_token, page in pages(records, page_size):
+                for record in page:
+                    report_day.write(record)
+                report_day.commit(page_token)
+        seconds = time.perf_counter() - started
+
+        size = 0
+        for directory, _, file_names in os.walk(parquet_path):
+            size += sum(os.path.getsize(os.path.join(directory, name)) for name in file_names)
+    return seconds, size
+
+
+def best_of(function, repeat, *args):
+    results = [function(*args) for _ in range(repeat)]
+    return min(seconds for seconds, _ in results), results[0][1]
+
+
+def run(stream_names, row_count, page_size, repeat):
+    resource_schema = synthetic.build_resource_schema()
+    results = {}
+
+    for stream_name in stream_names:
+        _, fields = synthetic.REPORT_STREAMS[stream_name]
+        stream, catalog_entry = synthetic.build_catalog_entry(stream_name, resource_schema)
+        records = build_records(stream, catalog_entry, synthetic.make_rows(fields, row_count))
+
+        singer_seconds, singer_bytes = best_of(write_singer, repeat, catalog_entry, records, page_size)
+        parquet_seconds, parquet_bytes = best_of(write_parquet, repeat, catalog_entry, records, page_size)
+        results[f"{stream_name}/singer"] = {
+            "records_per_second": round(row_count / singer_seconds),
+            "bytes": singer_bytes,
+        }
+        results[f"{stream_name}/parquet"] = {
+            "records_per_second": round(row_count / parquet_seconds),
+            "bytes": parquet_bytes,
+            "compression_ratio": round(singer_bytes / parquet_bytes, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per stream, baselines are stored for the default (default 5000)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Records per page and part file (default 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs (default 3)")
+    parser.add_argument("--streams", nargs="+", default=sorted(synthetic.REPORT_STREAMS),
+                        choices=sorted(synthetic.REPORT_STREAMS))
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.streams, args.rows, args.page_size, args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark the `_sdc_record_hash` versions.
+
+Each report stream's synthetic rows are turned into records once, then hashed:
+
+- `generate_hash`: the module function, which reads the stream's metadata on every call
+- `version=1`, `version=2`: a `RecordHasher` built once for the stream, as syncs do
+
+Each case reports records per second; `speedup` is against `version=1`.
+
+Usage:
+
+    python tests/benchmarks/bench_record_hash.py [--rows 2000] [--update-baselines]
+
+The exit code is non-zero when a result regressed against `baselines.json`.
+"""
+import argparse
+import copy
+import sys
+import time
+
+from singer import Transformer
+
+from tap_google_ads.record_hash import HASH_VERSION_KEY
+from tap_google_ads.record_hash import RecordHasher
+from tap_google_ads.streams import generate_hash
+
+import baselines
+import synthetic
+
+BENCHMARK = "record_hash"
+
+
+def with_hash_version(stream_mdata, hash_version):
+    stream_mdata = copy.deepcopy(stream_mdata)
+    for entry in stream_mdata:
+        if entry["breadcrumb"] == []:
+            entry["metadata"][HASH_VERSION_KEY] = hash_version
+    return stream_mdata
+
+
+def time_hashes(hash_record, records, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            hash_record(record)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run(stream_names, row_count, repeat):
+    resource_schema = synthetic.build_resource_schema()
+    results = {}
+
+    for stream_name in stream_names:
+        _, fields = synthetic.REPORT_STREAMS[stream_name]
+        stream, catalog_entry = synthetic.build_catalog_entry(stream_name, resource_schema)
+        with Transformer() as transformer:
+            records = [stream.build_record(row, transformer, catalog_entry)
+                       for row in synthetic.make_rows(fields, row_count)]
+        for record in records:
+            del record["_sdc_record_hash"]
+
+        stream_mdata = catalog_entry["metadata"]
+        cases = {
+            "generate_hash": lambda record: generate_hash(record, stream_mdata),  # pylint: disable=cell-var-from-loop
+            "version=1": RecordHasher(with_hash_version(stream_mdata, 1)).hash,
+            "version=2": RecordHasher(with_hash_version(stream_mdata, 2)).hash,
+        }
+        seconds = {case: time_hashes(hash_record, records, repeat) for case, hash_record in cases.items()}
+        for case, case_seconds in seconds.items():
+            results[f"{stream_name}/{case}"] = {"records_per_second": round(row_count / case_seconds)}
+        results[f"{stream_name}/version=2"]["speedup"] = round(seconds["version=1"] / seconds["version=2"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Rows per stream, baselines are stored for the default (default 2000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Report the best of this many runs (default 5)")
+    parser.add_argument("--streams", nargs="+", default=sorted(synthetic.REPORT_STREAMS),
+                        choices=sorted(synthetic.REPORT_STREAMS))
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.streams, args.rows, args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
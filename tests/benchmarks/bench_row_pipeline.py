@@ -0,0 +1,154 @@
+"""
+Benchmark the per-row sync pipeline without network access.
+
+Each report stream's rows go through the same steps as `ReportStream.sync`:
+
+    google_message_to_json -> transform_keys -> Transformer.transform
+        -> generate_hash -> singer.write_record
+
+Every step is timed on its own, then the whole pipeline end to end, and the
+peak memory of each is measured in a separate `tracemalloc` pass.
+
+Usage:
+
+    python tests/benchmarks/bench_row_pipeline.py [--rows 1000] [--update-baselines]
+
+The exit code is non-zero when a result regressed against `baselines.json`.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import singer
+from singer import Transformer
+
+from tap_google_ads.streams import generate_hash
+from tap_google_ads.streams import google_message_to_json
+
+import baselines
+import synthetic
+
+BENCHMARK = "row_pipeline"
+
+
+@contextmanager
+def stdout_to_devnull():
+    original_stdout = sys.stdout
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = original_stdout
+
+
+def build_stages(stream, catalog_entry):
+    schema = catalog_entry["schema"]
+    stream_mdata = catalog_entry["metadata"]
+    stream_name = catalog_entry["stream"]
+
+    def to_json(rows):
+        return [google_message_to_json(row) for row in rows]
+
+    def transform_keys(json_messages):
+        return [stream.transform_keys(message) for message in json_messages]
+
+    def transform(messages):
+        with Transformer() as transformer:
+            return [transformer.transform(message, schema) for message in messages]
+
+    def hash_records(records):
+        for record in records:
+            record["_sdc_record_hash"] = generate_hash(record, stream_mdata)
+        return records
+
+    def write_records(records):
+        for record in records:
+            singer.write_record(stream_name, record)
+        return records
+
+    def end_to_end(rows):
+        with Transformer() as transformer:
+            for row in rows:
+                record = transformer.transform(stream.transform_keys(google_message_to_json(row)), schema)
+                record["_sdc_record_hash"] = generate_hash(record, stream_mdata)
+                singer.write_record(stream_name, record)
+
+    return [
+        ("google_message_to_json", to_json),
+        ("transform_keys", transform_keys),
+        ("Transformer.transform", transform),
+        ("generate_hash", hash_records),
+        ("write_record", write_records),
+    ], end_to_end
+
+
+def time_stage(function, data, repeat):
+    """Best of `repeat` runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        copy = [dict(item) for item in data] if data and isinstance(data[0], dict) else data
+        started = time.perf_counter()
+        function(copy)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory_kib(function, data):
+    copy = [dict(item) for item in data] if data and isinstance(data[0], dict) else data
+    tracemalloc.start()
+    try:
+        function(copy)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run(stream_names, row_count, repeat):
+    resource_schema = synthetic.build_resource_schema()
+    results = {}
+
+    for stream_name in stream_names:
+        _, fields = synthetic.REPORT_STREAMS[stream_name]
+        stream, catalog_entry = synthetic.build_catalog_entry(stream_name, resource_schema)
+        rows = synthetic.make_rows(fields, row_count)
+        stages, end_to_end = build_stages(stream, catalog_entry)
+
+        with stdout_to_devnull():
+            data = rows
+            for stage_name, function in stages:
+                seconds = time_stage(function, data, repeat)
+                results[f"{stream_name}/{stage_name}"] = {
+                    "records_per_second": round(row_count / seconds),
+                    "peak_kib": peak_memory_kib(function, data),
+                }
+                data = function([dict(item) for item in data] if isinstance(data[0], dict) else data)
+
+            seconds = time_stage(end_to_end, rows, repeat)
+            results[f"{stream_name}/end_to_end"] = {
+                "records_per_second": round(row_count / seconds),
+                "peak_kib": peak_memory_kib(end_to_end, rows),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per stream, baselines are stored for the default (default 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs (default 3)")
+    parser.add_argument("--streams", nargs="+", default=sorted(synthetic.REPORT_STREAMS),
+                        choices=sorted(synthetic.REPORT_STREAMS))
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.streams, args.rows, args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Benchmark `stdout_compression`: throughput against compression ratio.
+
+The synthetic rows of every report stream are turned into records once, then
+written as Singer RECORD messages, a STATE message every `--page-size`
+records, through the same sink `stdout_compression` installs:
+
+- `none`: the JSON lines the tap writes today
+- `gzip/level=<n>/workers=<n>`: gzip members of `BLOCK_SIZE` bytes each
+- `zstd/level=<n>/workers=<n>`: one zstd frame, when zstandard is installed
+
+Each case reports `megabytes_per_second` of uncompressed JSON, JSON
+serialization included, the bytes written and `compression_ratio`, the JSON
+bytes over the compressed bytes.
+
+Usage:
+
+    python tests/benchmarks/bench_stdout_compression.py [--rows 1000] [--update-baselines]
+
+The exit code is non-zero when a result regressed against `baselines.json`.
+"""
+import argparse
+import io
+import sys
+import time
+
+import singer
+from singer import Transformer
+
+from tap_google_ads.stdout_compression import CompressedSink
+from tap_google_ads.stdout_compression import create_writer
+
+import baselines
+import synthetic
+
+BENCHMARK = "stdout_compression"
+LEVELS = {"gzip": (1, 6, 9), "zstd": (1, 3, 9)}
+
+
+class PlainWriter:
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, data):
+        self.output.write(data)
+
+    def close(self):
+        self.output.flush()
+
+
+def build_messages(row_count, page_size):
+    resource_schema = synthetic.build_resource_schema()
+    messages = []
+    for stream_name in sorted(synthetic.REPORT_STREAMS):
+        _, fields = synthetic.REPORT_STREAMS[stream_name]
+        stream, catalog_entry = synthetic.build_catalog_entry(stream_name, resource_schema)
+        with Transformer() as transformer:
+            for index, row in enumerate(synthetic.make_rows(fields, row_count)):
+                record = stream.build_record(row, transformer, catalog_entry)
+                messages.append(singer.RecordMessage(stream=stream_name, record=record))
+                if index % page_size == page_size - 1:
+                    messages.append(singer.StateMessage(value={"bookmarks": {stream_name: {"page": index}}}))
+    return messages
+
+
+def write_messages(messages, make_writer):
+    """Return the seconds taken and the bytes written"""
+    output = io.BytesIO()
+    writer = make_writer(output)
+    sink = CompressedSink(writer)
+    started = time.perf_counter()
+    for message in messages:
+        sink.write_message(message)
+    writer.close()
+    return time.perf_counter() - started, len(output.getvalue())
+
+
+def get_codecs():
+    codecs = ["gzip"]
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel,unused-import
+        codecs.append("zstd")
+    except ImportError:
+        print("zstandard is not installed, skipping zstd")
+    return codecs
+
+
+def run(row_count, page_size, workers_list, repeat):
+    messages = build_messages(row_count, page_size)
+
+    def best_of(make_writer):
+        results = [write_messages(messages, make_writer) for _ in range(repeat)]
+        return min(seconds for seconds, _ in results), results[0][1]
+
+    json_seconds, json_bytes = best_of(PlainWriter)
+    results = {"none": {
+        "megabytes_per_second": round(json_bytes / json_seconds / 1e6, 1),
+        "bytes": json_bytes,
+    }}
+    for codec in get_codecs():
+        for level in LEVELS[codec]:
+            for workers in workers_list:
+                seconds, size = best_of(lambda output: create_writer(output, codec, level, workers))  # pylint: disable=cell-var-from-loop
+                results[f"{codec}/level={level}/workers={workers}"] = {
+                    "megabytes_per_second": round(json_bytes / seconds / 1e6, 1),
+                    "bytes": size,
+                    "compression_ratio": round(json_bytes / size, 2),
+                }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per stream, baselines are stored for the default (default 1000)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Records between STATE messages (default 1000)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Worker counts to compare (default 1 4)")
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs (default 3)")
+    baselines.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.page_size, args.workers, args.repeat)
+    return baselines.report(BENCHMARK, results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+A local stand-in for the Google Ads gRPC API, for offline load testing.
+
+Implements `GoogleAdsService.Search`, `GoogleAdsService.SearchStream` and
+`GoogleAdsFieldService.SearchGoogleAdsFields` over an insecure local port:
+
+- The field service describes every resource, attribute, metric and segment
+  in the `GoogleAdsRow` descriptor, so discovery works unchanged
+- Search parses the GAQL the tap sends (SELECT, FROM, `segments.date`, the
+  core stream `WHERE <id> > N ORDER BY`, LIMIT) and returns synthetic rows for
+  exactly the selected fields, paged with `next_page_token`
+- Row counts, page size, per-page latency and the rate of injected quota
+  (RESOURCE_EXHAUSTED) and server (INTERNAL) errors are configurable. Whether
+  a request fails follows from the seed, the request and how often it was
+  made before, so a run injects the same errors however its requests
+  interleave. Only first pages fail unless `--fail-next-pages` is given: the
+  blocking engine's pager does not retry a next page, the async engine
+  searches for it again
+
+Run it on its own with:
+
+    python tests/benchmarks/fake_google_ads.py --port 50051 --rows 5000
+
+or use `fake_google_ads_server` / `fake_sdk_client` from `bench_fake_sync.py`.
+"""
+import argparse
+import hashlib
+import re
+import threading
+import time
+import zlib
+from concurrent import futures
+from importlib import import_module
+
+import grpc
+from google.protobuf.descriptor import FieldDescriptor
+
+from tap_google_ads import report_definitions
+from tap_google_ads.streams import API_VERSION
+
+import synthetic
+
+SERVICES = f"google.ads.googleads.{API_VERSION}.services"
+
+# GoogleAdsFieldCategoryEnum and GoogleAdsFieldDataTypeEnum values
+RESOURCE, ATTRIBUTE, SEGMENT, METRIC = 2, 3, 5, 6
+DATA_TYPES = {
+    FieldDescriptor.TYPE_BOOL: 2,
+    FieldDescriptor.TYPE_DOUBLE: 4,
+    FieldDescriptor.TYPE_ENUM: 5,
+    FieldDescriptor.TYPE_FLOAT: 6,
+    FieldDescriptor.TYPE_INT32: 7,
+    FieldDescriptor.TYPE_INT64: 8,
+    FieldDescriptor.TYPE_MESSAGE: 9,
+    FieldDescriptor.TYPE_STRING: 11,
+    FieldDescriptor.TYPE_UINT64: 12,
+}
+DATE_DATA_TYPE = 3
+RESOURCE_NAME_DATA_TYPE = 10
+MAX_ATTRIBUTE_DEPTH = 3
+TEMPLATE_ROWS = 50
+
+QUERY_PATTERN = re.compile(r"SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<resource>\w+)(?P<rest>.*)", re.S | re.I)
+DATE_PATTERN = re.compile(r"segments\.date\s*=\s*'(?P<date>[\d-]+)'")
+FILTER_PATTERN = re.compile(r"WHERE\s+(?P<field>[\w.]+)\s*(?P<op>>=|>)\s*(?P<value>\d+)")
+ORDER_PATTERN = re.compile(r"ORDER BY\s+(?P<field>[\w.]+)")
+LIMIT_PATTERN = re.compile(r"LIMIT\s+(?P<limit>\d+)")
+
+
+def raw_type(module_name, type_name):
+    proto_plus_type = getattr(import_module(module_name), type_name)
+    return type(proto_plus_type.pb(proto_plus_type()))
+
+
+def api_name(field):
+    # Proto fields that shadow Python builtins get a trailing underscore, the API name does not
+    return field.name.rstrip("_")
+
+
+# The FROM resource of each report in `streams.initialize_reports`
+REPORT_RESOURCES = {
+    "ACCOUNT_PERFORMANCE_REPORT_FIELDS": "customer",
+    "AD_GROUP_AUDIENCE_PERFORMANCE_REPORT_FIELDS": "ad_group_audience_view",
+    "AD_GROUP_PERFORMANCE_REPORT_FIELDS": "ad_group",
+    "AD_PERFORMANCE_REPORT_FIELDS": "ad_group_ad",
+    "AGE_RANGE_PERFORMANCE_REPORT_FIELDS": "age_range_view",
+    "CAMPAIGN_PERFORMANCE_REPORT_FIELDS": "campaign",
+    "CAMPAIGN_AUDIENCE_PERFORMANCE_REPORT_FIELDS": "campaign_audience_view",
+    "CLICK_PERFORMANCE_REPORT_FIELDS": "click_view",
+    "DISPLAY_KEYWORD_PERFORMANCE_REPORT_FIELDS": "display_keyword_view",
+    "DISPLAY_TOPICS_PERFORMANCE_REPORT_FIELDS": "topic_view",
+    "EXPANDED_LANDING_PAGE_REPORT_FIELDS": "expanded_landing_page_view",
+    "GENDER_PERFORMANCE_REPORT_FIELDS": "gender_view",
+    "GEO_PERFORMANCE_REPORT_FIELDS": "geographic_view",
+    "KEYWORDLESS_QUERY_REPORT_FIELDS": "dynamic_search_ads_search_term_view",
+    "KEYWORDS_PERFORMANCE_REPORT_FIELDS": "keyword_view",
+    "LANDING_PAGE_REPORT_FIELDS": "landing_page_view",
+    "PLACEMENT_PERFORMANCE_REPORT_FIELDS": "managed_placement_view",
+    "SEARCH_QUERY_PERFORMANCE_REPORT_FIELDS": "search_term_view",
+    "SHOPPING_PERFORMANCE_REPORT_FIELDS": "shopping_performance_view",
+    "USER_LOCATION_PERFORMANCE_REPORT_FIELDS": "user_location_view",
+    "VIDEO_PERFORMANCE_REPORT_FIELDS": "video",
+}
+
+
+def get_attribute_resources():
+    """The resources each FROM resource can be joined with, taken from the report definitions"""
+    joins = {}
+    for name, resource in REPORT_RESOURCES.items():
+        fields = getattr(report_definitions, name)
+        roots = {field.split(".")[0] for field in fields} - {"metrics", "segments", resource}
+        joins.setdefault(resource, set()).update(roots)
+    return joins
+
+
+def build_fields():
+    """Describe the `GoogleAdsRow` descriptor the way `GoogleAdsFieldService` does"""
+    field_class = raw_type(f"google.ads.googleads.{API_VERSION}.resources.types.google_ads_field", "GoogleAdsField")
+    row_descriptor = synthetic.get_row_class().DESCRIPTOR
+    joins = get_attribute_resources()
+    fields = []
+
+    def leaf(name, field, category):
+        data_type = DATA_TYPES.get(field.type, 11)
+        if name == "segments.date":
+            data_type = DATE_DATA_TYPE
+        elif name.endswith(".resource_name"):
+            data_type = RESOURCE_NAME_DATA_TYPE
+        return field_class(
+            resource_name=f"googleAdsFields/{name}",
+            name=name,
+            category=category,
+            selectable=True,
+            filterable=True,
+            sortable=True,
+            data_type=data_type,
+            is_repeated=field.label == FieldDescriptor.LABEL_REPEATED,
+            enum_values=[value.name for value in field.enum_type.values] if field.enum_type else [],
+        )
+
+    def walk(descriptor, prefix, category, depth):
+        for field in descriptor.fields:
+            name = prefix + api_name(field)
+            nested = (field.type == FieldDescriptor.TYPE_MESSAGE
+                      and field.label != FieldDescriptor.LABEL_REPEATED
+                      and depth < MAX_ATTRIBUTE_DEPTH)
+            if nested:
+                walk(field.message_type, name + ".", category, depth + 1)
+            else:
+                fields.append(leaf(name, field, category))
+
+    resource_names = [api_name(field) for field in row_descriptor.fields
+                      if field.type == FieldDescriptor.TYPE_MESSAGE and field.name not in {"metrics", "segments"}]
+    walk(row_descriptor.fields_by_name["metrics"].message_type, "metrics.", METRIC, 1)
+    walk(row_descriptor.fields_by_name["segments"].message_type, "segments.", SEGMENT, 1)
+    metric_names = [field.name for field in fields if field.category == METRIC]
+    segment_names = [field.name for field in fields if field.category == SEGMENT]
+    everything = resource_names + metric_names + segment_names
+
+    for top_level in row_descriptor.fields:
+        name = api_name(top_level)
+        if name not in resource_names:
+            continue
+        fields.append(field_class(
+            resource_name=f"googleAdsFields/{name}",
+            name=name,
+            category=RESOURCE,
+            selectable=False,
+            data_type=9,
+            selectable_with=everything,
+            attribute_resources=sorted(joins.get(name, set())),
+            metrics=metric_names,
+            segments=segment_names,
+        ))
+        walk(top_level.message_type, name + ".", ATTRIBUTE, 1)
+
+    # Metrics and segments are compatible with everything in this fake
+    for field in fields:
+        if field.category in (METRIC, SEGMENT):
+            field.selectable_with.extend(resource_names)
+    return fields
+
+
+def parse_query(query):
+    match = QUERY_PATTERN.match(query.strip())
+    fields = [field.strip() for field in match.group("fields").split(",")]
+    rest = match.group("rest")
+    date_match = DATE_PATTERN.search(rest)
+    filter_match = FILTER_PATTERN.search(rest)
+    order_match = ORDER_PATTERN.search(rest)
+    limit_match = LIMIT_PATTERN.search(rest)
+    start = 0
+    if filter_match:
+        value = int(filter_match.group("value"))
+        start = value if filter_match.group("op") == ">" else value - 1
+    return {
+        "fields": fields,
+        "resource": match.group("resource"),
+        "date": date_match.group("date") if date_match else "2022-01-01",
+        "id_field": (filter_match or order_match).group("field") if (filter_match or order_match) else None,
+        "start": start,
+        "limit": int(limit_match.group("limit")) if limit_match else None,
+    }
+
+
+class FakeGoogleAdsServicer:  # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, rows=1000, page_size=10000, latency=0.0, quota_error_rate=0.0,
+                 server_error_rate=0.0, seed=0, fail_next_pages=False):
+        self.rows = rows
+        self.page_size = page_size
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.server_error_rate = server_error_rate
+        self.seed = seed
+        self.fail_next_pages = fail_next_pages
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.templates = {}
+        self.stats = {"search": 0, "search_stream": 0, "fields": 0, "rows": 0, "errors": 0}
+        self.row_class = synthetic.get_row_class()
+        self.search_response = raw_type(f"{SERVICES}.types.google_ads_service", "SearchGoogleAdsResponse")
+        self.stream_response = raw_type(f"{SERVICES}.types.google_ads_service", "SearchGoogleAdsStreamResponse")
+        self.fields_response = raw_type(f"{SERVICES}.types.google_ads_field_service", "SearchGoogleAdsFieldsResponse")
+        self._fields = None
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def roll(self, request, page_token):
+        """A number in [0, 1) for this attempt at `request`, the same in every run with the same seed"""
+        key = f"{self.seed}/{request.customer_id}/{request.query}/{page_token}"
+        with self.lock:
+            attempt = self.attempts[key] = self.attempts.get(key, 0) + 1
+        digest = hashlib.sha256(f"{key}/{attempt}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def maybe_fail(self, request, context, page_token=""):
+        if page_token and not self.fail_next_pages:
+            return
+        roll = self.roll(request, page_token)
+        if roll < self.quota_error_rate:
+            self.count("errors")
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Resource has been exhausted (fake)")
+        if roll < self.quota_error_rate + self.server_error_rate:
+            self.count("errors")
+            context.abort(grpc.StatusCode.INTERNAL, "Internal error encountered (fake)")
+
+    def get_templates(self, fields, query_date):
+        """A small pool of filled rows per field set; rows are copies of these"""
+        key = (tuple(fields), query_date)
+        with self.lock:
+            templates = self.templates.get(key)
+        if templates is None:
+            resolvable = []
+            for field in fields:
+                try:
+                    descriptor = synthetic.get_field_descriptor(self.row_class, field)
+                except KeyError:
+                    continue
+                # Discovery types repeated fields by their element type, which the
+                # Transformer only accepts for strings and messages, so leave the rest empty
+                if (descriptor.label == FieldDescriptor.LABEL_REPEATED
+                        and descriptor.type not in (FieldDescriptor.TYPE_STRING, FieldDescriptor.TYPE_MESSAGE)):
+                    continue
+                resolvable.append(field)
+            templates = synthetic.make_rows(resolvable, TEMPLATE_ROWS, seed=zlib.crc32(repr(key).encode()),
+                                            query_date=query_date)
+            with self.lock:
+                self.templates[key] = templates
+        return templates
+
+    def generate_rows(self, query, customer_id):
+        parsed = parse_query(query)
+        templates = self.get_templates(parsed["fields"], parsed["date"])
+        total = self.rows
+        if parsed["limit"] is not None:
+            total = min(total, parsed["start"] + parsed["limit"])
+        offset = zlib.crc32(f"{customer_id}/{parsed['resource']}/{parsed['date']}".encode())
+
+        for index in range(parsed["start"], total):
+            row = self.row_class()
+            row.CopyFrom(templates[(index + offset) % len(templates)])
+            if parsed["id_field"]:
+                set_integer(row, parsed["id_field"], index + 1)
+            yield row
+
+    def search(self, request, context):
+        self.count("search")
+        self.maybe_fail(request, context, request.page_token)
+        offset = int(request.page_token or 0)
+        rows = self.generate_rows(request.query, request.customer_id)
+        response = self.search_response()
+        for index, row in enumerate(rows):
+            if index < offset:
+                continue
+            if index >= offset + self.page_size:
+                response.next_page_token = str(offset + self.page_size)
+                break
+            response.results.append(row)
+        self.count("rows", len(response.results))
+        if self.latency:
+            time.sleep(self.latency)
+        return response
+
+    def search_stream(self, request, context):
+        self.count("search_stream")
+        self.maybe_fail(request, context)
+        response = self.stream_response()
+        for row in self.generate_rows(request.query, request.customer_id):
+            response.results.append(row)
+            if len(response.results) >= self.page_size:
+                self.count("rows", len(response.results))
+                if self.latency:
+                    time.sleep(self.latency)
+                yield response
+                response = self.stream_response()
+        if response.results:
+            self.count("rows", len(response.results))
+            yield response
+
+    def search_fields(self, request, context):  # pylint: disable=unused-argument
+        self.count("fields")
+        if self._fields is None:
+            self._fields = build_fields()
+        response = self.fields_response(results=self._fields, total_results_count=len(self._fields))
+        return response
+
+
+def set_integer(row, field_path, value):
+    parts = field_path.split(".")
+    target = row
+    for part in parts[:-1]:
+        target = getattr(target, part if part in target.DESCRIPTOR.fields_by_name else part + "_")
+    name = parts[-1] if parts[-1] in target.DESCRIPTOR.fields_by_name else parts[-1] + "_"
+    setattr(target, name, value)
+
+
+def create_server(servicer, port=0, max_workers=16):
+    """Start a gRPC server for `servicer` and return it with the port it is bound to"""
+    google_ads_types = f"{SERVICES}.types.google_ads_service"
+    field_types = f"{SERVICES}.types.google_ads_field_service"
+    search_request = raw_type(google_ads_types, "SearchGoogleAdsRequest")
+    stream_request = raw_type(google_ads_types, "SearchGoogleAdsStreamRequest")
+    fields_request = raw_type(field_types, "SearchGoogleAdsFieldsRequest")
+
+    google_ads_service = grpc.method_handlers_generic_handler(f"{SERVICES}.GoogleAdsService", {
+        "Search": grpc.unary_unary_rpc_method_handler(
+            servicer.search,
+            request_deserializer=search_request.FromString,
+            response_serializer=lambda message: message.SerializeToString()),
+        "SearchStream": grpc.unary_stream_rpc_method_handler(
+            servicer.search_stream,
+            request_deserializer=stream_request.FromString,
+            response_serializer=lambda message: message.SerializeToString()),
+    })
+    field_service = grpc.method_handlers_generic_handler(f"{SERVICES}.GoogleAdsFieldService", {
+        "SearchGoogleAdsFields": grpc.unary_unary_rpc_method_handler(
+            servicer.search_fields,
+            request_deserializer=fields_request.FromString,
+            response_serializer=lambda message: message.SerializeToString()),
+    })
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
+                         options=[("grpc.max_send_message_length", 256 * 1024 * 1024)])
+    server.add_generic_rpc_handlers((google_ads_service, field_service))
+    port = server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server, port
+
+
+def add_arguments(parser):
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per (customer, stream, day) query")
+    parser.add_argument("--page-size", type=int, default=10000, help="Rows per Search page")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before returning each page")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="Fraction of calls failing with RESOURCE_EXHAUSTED")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction of calls failing with INTERNAL")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of which calls fail")
+    parser.add_argument("--fail-next-pages", action="store_true",
+                        help="Inject errors on next-page requests too, not only on first pages. The blocking "
+                             "engine does not retry a next page, so its syncs fail")
+
+
+def servicer_from_args(args):
+    return FakeGoogleAdsServicer(rows=args.rows, page_size=args.page_size, latency=args.latency,
+                                 quota_error_rate=args.quota_error_rate,
+                                 server_error_rate=args.server_error_rate, seed=args.seed,
+                                 fail_next_pages=args.fail_next_pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=50051)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, port = create_server(servicer_from_args(args), args.port)
+    print(f"Fake Google Ads API listening on 127.0.0.1:{port}", flush=True)
+    server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    main()
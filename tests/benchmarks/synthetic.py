@@ -0,0 +1,180 @@
+"""
+Offline stand-ins for the data Google Ads returns.
+
+The benchmarks never talk to the API. Instead they derive everything from the
+`GoogleAdsRow` protobuf descriptor shipped with the google-ads package and the
+field lists in `report_definitions`:
+
+- `build_resource_schema` fakes what `create_resource_schema` builds from
+  `GoogleAdsFieldService`, with the same json schema per data type
+- `make_row` fills a raw `GoogleAdsRow` with realistic values for a list of fields
+"""
+import random
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from tap_google_ads import report_definitions
+from tap_google_ads.streams import API_VERSION
+from tap_google_ads.streams import ReportStream
+
+# Report streams whose rows we know how to build, with their FROM resource
+REPORT_STREAMS = {
+    "keywords_performance_report": ("keyword_view", report_definitions.KEYWORDS_PERFORMANCE_REPORT_FIELDS),
+    "ad_performance_report": ("ad_group_ad", report_definitions.AD_PERFORMANCE_REPORT_FIELDS),
+    "click_performance_report": ("click_view", report_definitions.CLICK_PERFORMANCE_REPORT_FIELDS),
+    "search_query_performance_report": ("search_term_view", report_definitions.SEARCH_QUERY_PERFORMANCE_REPORT_FIELDS),
+}
+
+# Mirrors `data_type_map` in `discover.build_resource_metadata`
+JSON_SCHEMA_BY_PROTO_TYPE = {
+    FieldDescriptor.TYPE_BOOL: {"type": ["null", "boolean"]},
+    FieldDescriptor.TYPE_DOUBLE: {"type": ["null", "string"], "format": "singer.decimal"},
+    FieldDescriptor.TYPE_FLOAT: {"type": ["null", "string"], "format": "singer.decimal"},
+    FieldDescriptor.TYPE_ENUM: {"type": ["null", "string"]},
+    FieldDescriptor.TYPE_INT32: {"type": ["null", "integer"]},
+    FieldDescriptor.TYPE_INT64: {"type": ["null", "integer"]},
+    FieldDescriptor.TYPE_UINT64: {"type": ["null", "integer"]},
+    FieldDescriptor.TYPE_STRING: {"type": ["null", "string"]},
+    FieldDescriptor.TYPE_MESSAGE: {"type": ["null", "object", "string"], "properties": {}},
+}
+DATE_SCHEMA = {"type": ["null", "string"], "format": "date-time"}
+
+
+def get_row_class():
+    """The raw protobuf `GoogleAdsRow`, which is what the tap sees with `use_proto_plus` off"""
+    module = __import__(f"google.ads.googleads.{API_VERSION}.services.types.google_ads_service",
+                        fromlist=["GoogleAdsRow"])
+    row_type = module.GoogleAdsRow
+    return type(row_type.pb(row_type()))
+
+
+def get_field_descriptor(row_class, field_path):
+    """Walk `field_path` ("ad_group_criterion.keyword.text") through the row descriptor"""
+    descriptor = row_class.DESCRIPTOR
+    field = None
+    for part in field_path.split("."):
+        field = descriptor.fields_by_name.get(part) or descriptor.fields_by_name[part + "_"]
+        descriptor = field.message_type
+    return field
+
+
+def get_category(field_path):
+    if field_path.startswith("metrics."):
+        return "METRIC"
+    if field_path.startswith("segments."):
+        return "SEGMENT"
+    return "ATTRIBUTE"
+
+
+def get_json_schema(field_path, field):
+    if field_path == "segments.date":
+        return dict(DATE_SCHEMA)
+    return dict(JSON_SCHEMA_BY_PROTO_TYPE[field.type])
+
+
+def build_resource_schema(streams=None):
+    """Build a resource schema shaped like `create_resource_schema`'s for `streams`"""
+    row_class = get_row_class()
+    streams = streams or REPORT_STREAMS
+    resource_schema = {}
+
+    for resource_name, fields in streams.values():
+        resource = resource_schema.setdefault(resource_name, {"name": resource_name, "fields": {}})
+        for field_path in fields:
+            field = get_field_descriptor(row_class, field_path)
+            json_schema = get_json_schema(field_path, field)
+            resource_schema[field_path] = {"name": field_path, "json_schema": json_schema}
+            resource["fields"][field_path] = {
+                "field_details": {
+                    "name": field_path,
+                    "category": get_category(field_path),
+                    "json_schema": json_schema,
+                    "selectable": True,
+                },
+                "incompatible_fields": [],
+            }
+    return resource_schema
+
+
+def build_catalog_entry(stream_name, resource_schema, streams=None):
+    """Return the stream object and a catalog entry with every field selected"""
+    resource_name, fields = (streams or REPORT_STREAMS)[stream_name]
+    stream = ReportStream(fields, [resource_name], resource_schema, ["_sdc_record_hash"])
+    mdata = stream.stream_metadata
+    for breadcrumb, field_mdata in mdata.items():
+        if breadcrumb:
+            field_mdata["selected"] = True
+    mdata[()]["selected"] = True
+    catalog_entry = {
+        "tap_stream_id": stream_name,
+        "stream": stream_name,
+        "schema": stream.stream_schema,
+        "metadata": [{"breadcrumb": list(breadcrumb), "metadata": value} for breadcrumb, value in mdata.items()],
+    }
+    return stream, catalog_entry
+
+
+def scalar_value(field, rng, index):
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return bool(index % 2)
+    if field.type in (FieldDescriptor.TYPE_DOUBLE, FieldDescriptor.TYPE_FLOAT):
+        return round(rng.random() * 1000, 4)
+    if field.type == FieldDescriptor.TYPE_ENUM:
+        values = [value.number for value in field.enum_type.values if value.number > 1]
+        return values[index % len(values)] if values else 0
+    if field.type in (FieldDescriptor.TYPE_INT32,):
+        return rng.randint(1, 10000)
+    if field.type in (FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT64):
+        return rng.randint(1, 10 ** 12)
+    if field.type == FieldDescriptor.TYPE_STRING:
+        return f"{field.name}-{index}-{rng.randint(0, 10 ** 6)}"
+    return None
+
+
+def fill_message(message, rng, index, depth=0):
+    """Fill the scalar fields of a nested message such as `AdTextAsset`"""
+    for field in message.DESCRIPTOR.fields:
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            if depth < 1 and field.label != FieldDescriptor.LABEL_REPEATED:
+                fill_message(getattr(message, field.name), rng, index, depth + 1)
+            continue
+        value = scalar_value(field, rng, index)
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            getattr(message, field.name).extend([value, value])
+        else:
+            setattr(message, field.name, value)
+
+
+def set_field(row, field_path, rng, index, query_date):
+    parts = field_path.split(".")
+    target = row
+    for part in parts[:-1]:
+        target = getattr(target, part if part in target.DESCRIPTOR.fields_by_name else part + "_")
+    name = parts[-1] if parts[-1] in target.DESCRIPTOR.fields_by_name else parts[-1] + "_"
+    field = target.DESCRIPTOR.fields_by_name[name]
+
+    if field_path == "segments.date":
+        target.date = query_date
+    elif field.type == FieldDescriptor.TYPE_MESSAGE:
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            for _ in range(2):
+                fill_message(getattr(target, name).add(), rng, index)
+        else:
+            fill_message(getattr(target, name), rng, index)
+    elif field.label == FieldDescriptor.LABEL_REPEATED:
+        getattr(target, name).extend([scalar_value(field, rng, index) for _ in range(2)])
+    else:
+        setattr(target, name, scalar_value(field, rng, index))
+
+
+def make_rows(fields, count, seed=0, query_date="2022-01-01"):
+    """Build `count` `GoogleAdsRow`s with every field in `fields` populated"""
+    row_class = get_row_class()
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        row = row_class()
+        for field_path in fields:
+            set_field(row, field_path, rng, index, query_date)
+        rows.append(row)
+    return rows
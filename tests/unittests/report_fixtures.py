@@ -0,0 +1,182 @@
+"""The resource schema, raw rows and fake report API the sync tests build their streams from"""
+import asyncio
+import json
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import Mock
+from unittest.mock import patch
+import pytz
+from google.ads.googleads.v20.errors.types.errors import ErrorCode
+from google.ads.googleads.v20.errors.types.errors import GoogleAdsError
+from google.ads.googleads.v20.errors.types.errors import GoogleAdsFailure
+from google.ads.googleads.v20.errors.types.request_error import RequestErrorEnum
+from google.ads.googleads.v20.services.types.google_ads_service import GoogleAdsRow
+from google.ads.googleads.v20.services.types.google_ads_service import SearchGoogleAdsResponse
+from google.api_core.exceptions import InvalidArgument
+
+
+def field(name, category, json_schema):
+    return {
+        "field_details": {"name": name, "category": category, "json_schema": json_schema, "selectable": True},
+        "incompatible_fields": [],
+    }
+
+
+def build_resource_schema(fields, resource_name="campaign"):
+    """A resource schema with `fields` on one resource, as discovery builds it"""
+    return {
+        resource_name: {"name": resource_name, "fields": fields},
+        **{name: {"name": name, "json_schema": value["field_details"]["json_schema"]}
+           for name, value in fields.items()},
+    }
+
+
+REPORT_FIELDS = {
+    "campaign.id": field("campaign.id", "ATTRIBUTE", {"type": ["null", "integer"]}),
+    "metrics.clicks": field("metrics.clicks", "METRIC", {"type": ["null", "integer"]}),
+    "segments.date": field("segments.date", "SEGMENT", {"type": ["null", "string"], "format": "date-time"}),
+}
+resource_schema = build_resource_schema(REPORT_FIELDS)
+
+RawRow = type(GoogleAdsRow.pb(GoogleAdsRow()))
+RawResponse = type(SearchGoogleAdsResponse.pb(SearchGoogleAdsResponse()))
+CUSTOMERS = [{"customerId": "1000000001", "loginCustomerId": "1"}, {"customerId": "1000000002", "loginCustomerId": "1"}]
+DAYS = ["2022-01-01", "2022-01-02", "2022-01-03"]
+ROWS_PER_DAY = 5
+PAGE_SIZE = 2
+CONFIG = {"start_date": "2022-01-01T00:00:00Z", "end_date": "2022-01-03T00:00:00Z", "conversion_window": 1,
+          "login_customer_ids": CUSTOMERS, "developer_token": "token"}
+FAILURE_KEY = "google.ads.googleads.v20.errors.googleadsfailure-bin"
+SYNC_NOW = datetime(2022, 1, 3, tzinfo=pytz.UTC)
+
+
+def json_copy(value):
+    return json.loads(json.dumps(value))
+
+
+def selected_catalog_entry(stream, name):
+    """The catalog entry of `stream` as `name`, with every property selected"""
+    return {
+        "tap_stream_id": name,
+        "stream": name,
+        "schema": stream.stream_schema,
+        "metadata": [{"breadcrumb": list(breadcrumb), "metadata": dict(mdata, selected=True)}
+                     for breadcrumb, mdata in stream.stream_metadata.items()],
+    }
+
+
+def make_pages(customer_id, day, offset=0):
+    """Raw response pages of `ROWS_PER_DAY` rows, from row `offset`"""
+    pages = []
+    while offset < ROWS_PER_DAY:
+        end = min(offset + PAGE_SIZE, ROWS_PER_DAY)
+        page = RawResponse(next_page_token=str(end) if end < ROWS_PER_DAY else "")
+        for index in range(offset, end):
+            row = RawRow()
+            row.campaign.id = int(customer_id) * 10 + index
+            row.metrics.clicks = index
+            row.segments.date = day
+            page.results.append(row)
+        pages.append(page)
+        offset = end
+    return pages
+
+
+def query_day(query):
+    return re.search(r"segments.date = '(\d{4}-\d\d-\d\d)'", query).group(1)
+
+
+class FakeCall:
+    def __init__(self, trailing_metadata):
+        self.metadata = trailing_metadata
+
+    def trailing_metadata(self):
+        return self.metadata
+
+
+def api_error(request_error):
+    failure = GoogleAdsFailure(errors=[GoogleAdsError(error_code=ErrorCode(request_error=request_error),
+                                                      message="The request was rejected")])
+    call = FakeCall([(FAILURE_KEY, GoogleAdsFailure.serialize(failure)), ("request-id", "abc")])
+    return InvalidArgument("The request was rejected", response=call)
+
+
+class FakePager:
+    def __init__(self, pages, delay, error=None, take_page_error=None):
+        self.raw_pages = pages
+        self.delay = delay
+        self.error = error
+        self.take_page_error = take_page_error
+
+    @property
+    async def pages(self):
+        if self.error:
+            # Fail once the other days are done
+            await asyncio.sleep(0.5)
+            raise self.error
+        for index, page in enumerate(self.raw_pages):
+            await asyncio.sleep(self.delay)
+            # Next pages are fetched as the pager is iterated, and can fail on their own
+            error = self.take_page_error(self.raw_pages[index - 1].next_page_token) if index else None
+            if error:
+                raise error
+            yield SearchGoogleAdsResponse.wrap(page)
+
+
+class FakeAsyncClient:
+    """Serves the days of `make_pages`, the first day slowest so later days finish first
+
+    `page_errors` maps a (customer id, day, page token) to the error fetching that next page fails
+    with, once."""
+
+    def __init__(self, fail_on_day=None, rejected_token=None, page_errors=None):
+        self.fail_on_day = fail_on_day
+        self.rejected_token = rejected_token
+        self.page_errors = dict(page_errors or {})
+        self.requests = []
+        self.transport = Mock(close=self.close)
+
+    async def close(self):
+        pass
+
+    async def search(self, request, metadata, timeout):
+        day = query_day(request["query"])
+        self.requests.append((request["customer_id"], day, request.get("page_token"), dict(metadata)))
+        if request.get("page_token") and request["page_token"] == self.rejected_token:
+            raise api_error(RequestErrorEnum.RequestError.EXPIRED_PAGE_TOKEN)
+        delay = 0.01 * (len(DAYS) - DAYS.index(day))
+        error = api_error(RequestErrorEnum.RequestError.INVALID_CUSTOMER_ID) if day == self.fail_on_day else None
+        return FakePager(make_pages(request["customer_id"], day, int(request.get("page_token") or 0)), delay, error,
+                         lambda page_token: self.page_errors.pop((request["customer_id"], day, page_token), None))
+
+
+class FakeBlockingApi:
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        return Mock(pages=iter(make_pages(customer_id, query_day(query), int(page_token or 0))))
+
+
+@contextmanager
+def patch_report_api(messages, make_request=None, now=SYNC_NOW):
+    """Serve blocking requests from `make_request`, `FakeBlockingApi` by default, and collect what
+    would reach stdout in `messages`, in order: ("schema", stream), ("record", record) and ("state", state)"""
+    with patch("tap_google_ads.streams.make_request", side_effect=make_request or FakeBlockingApi().make_request), \
+         patch("singer.messages.write_schema",
+               side_effect=lambda stream_name, *args: messages.append(("schema", stream_name))), \
+         patch("singer.write_record", side_effect=lambda stream_name, record: messages.append(("record", record))), \
+         patch("singer.write_state", side_effect=lambda value: messages.append(("state", json_copy(value)))), \
+         patch("singer.utils.now", return_value=now):
+        yield messages
+
+
+@contextmanager
+def patch_do_sync(report_streams, messages, make_request=None, client=None, now=SYNC_NOW, core_streams=None):
+    """`patch_report_api` for a `do_sync` of `report_streams` and `core_streams`, none by default
+
+    The async engine is served by `client`, a `FakeAsyncClient` by default."""
+    with patch("tap_google_ads.sync.create_sdk_client"), \
+         patch("tap_google_ads.sync.initialize_core_streams", return_value=core_streams or {}), \
+         patch("tap_google_ads.sync.initialize_reports", return_value=report_streams), \
+         patch("tap_google_ads.async_sync.create_async_client", return_value=(client or FakeAsyncClient(), "token")), \
+         patch_report_api(messages, make_request, now):
+        yield messages
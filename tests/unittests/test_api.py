@@ -0,0 +1,110 @@
+import threading
+import unittest
+from contextlib import ExitStack
+from unittest.mock import patch
+import singer
+from report_fixtures import CONFIG
+from report_fixtures import CUSTOMERS
+from report_fixtures import DAYS
+from report_fixtures import patch_do_sync
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+from report_fixtures import ROWS_PER_DAY
+from report_fixtures import selected_catalog_entry
+from tap_google_ads import RecordBatch
+from tap_google_ads import iter_records
+from tap_google_ads.streams import ReportStream
+
+STREAM = "campaign_performance_report"
+TOTAL_RECORDS = len(CUSTOMERS) * len(DAYS) * ROWS_PER_DAY
+
+
+class FailingApi:
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        raise ValueError("The API is down")
+
+
+class TestIterRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog = {"streams": [selected_catalog_entry(self.stream, STREAM)]}
+        # Nothing may reach stdout
+        self.stdout = []
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(patch_do_sync({STREAM: self.stream}, self.stdout))
+
+    def iter_records(self, config=CONFIG, state=None, **kwargs):
+        return iter_records(config, self.catalog, state, resource_schema=resource_schema, **kwargs)
+
+    def test_yields_the_messages_instead_of_writing_them(self):
+        for engine in ("blocking", "async"):
+            with self.subTest(engine=engine):
+                messages = list(self.iter_records(dict(CONFIG, sync_engine=engine)))
+
+                self.assertIsInstance(messages[0], singer.SchemaMessage)
+                records = [message.record for message in messages if isinstance(message, singer.RecordMessage)]
+                self.assertEqual(len(records), TOTAL_RECORDS)
+                self.assertIsInstance(records[0]["clicks"], int)
+                self.assertIsInstance(messages[-1], singer.StateMessage)
+                self.assertEqual(self.stdout, [])
+
+    def test_states_are_copies_and_the_input_state_is_untouched(self):
+        state = {"bookmarks": {}}
+
+        states = [message.value for message in self.iter_records(state=state)
+                  if isinstance(message, singer.StateMessage)]
+
+        self.assertEqual(state, {"bookmarks": {}})
+        bookmarks = [value["bookmarks"][STREAM][CUSTOMERS[0]["customerId"]].get("date")
+                     for value in states if CUSTOMERS[0]["customerId"] in value["bookmarks"].get(STREAM, {})]
+        self.assertEqual(len({bookmark for bookmark in bookmarks if bookmark}), len(DAYS))
+
+    def test_batches_come_before_the_state_that_covers_them(self):
+        for batch_format in ("dicts", "columns"):
+            with self.subTest(batch_format=batch_format):
+                records = 0
+                for message in self.iter_records(batch_size=3, batch_format=batch_format):
+                    if isinstance(message, RecordBatch):
+                        self.assertEqual(message.stream, STREAM)
+                        size = len(message.records) if batch_format == "dicts" else len(message.records["clicks"])
+                        self.assertLessEqual(size, 3)
+                        records += size
+                    elif isinstance(message, singer.StateMessage):
+                        # Every row of a bookmarked day was yielded already
+                        for bookmark in message.value.get("bookmarks", {}).get(STREAM, {}).values():
+                            if "date" in bookmark:
+                                day = DAYS.index(bookmark["date"][:10])
+                                self.assertGreaterEqual(records, (day + 1) * ROWS_PER_DAY)
+                self.assertEqual(records, TOTAL_RECORDS)
+
+    def test_columns(self):
+        # Page checkpoints end a batch, so the first one is the first page
+        batch = next(message for message in self.iter_records(batch_size=ROWS_PER_DAY, batch_format="columns")
+                     if isinstance(message, RecordBatch))
+
+        self.assertEqual(batch.records["clicks"], [0, 1])
+        self.assertEqual(set(batch.records), {"campaign_id", "clicks", "date", "_sdc_record_hash"})
+
+    def test_errors_are_raised_to_the_consumer(self):
+        with patch("tap_google_ads.streams.make_request", side_effect=FailingApi().make_request):
+            with self.assertRaises(ValueError):
+                list(self.iter_records())
+
+    def test_closing_early_stops_the_sync(self):
+        messages = self.iter_records()
+        next(message for message in messages if isinstance(message, singer.RecordMessage))
+        messages.close()
+
+        self.assertNotIn("tap-google-ads-sync", [thread.name for thread in threading.enumerate()])
+
+    def test_invalid_batch_arguments(self):
+        with self.assertRaises(ValueError):
+            next(self.iter_records(batch_size=0))
+        with self.assertRaises(ValueError):
+            next(self.iter_records(batch_size=10, batch_format="arrow"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import pytz
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v20.errors.types.request_error import RequestErrorEnum
+from google.api_core.exceptions import InvalidArgument
+from google.api_core.exceptions import ServiceUnavailable
+from tap_google_ads.async_sync import get_concurrency
+from tap_google_ads.async_sync import to_google_ads_exception
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import create_report_query
+from tap_google_ads.streams import get_selected_fields
+from tap_google_ads.streams import hash_query
+from tap_google_ads.sync import do_sync
+from tap_google_ads.sync import get_sync_engine
+from report_fixtures import api_error
+from report_fixtures import CONFIG
+from report_fixtures import CUSTOMERS
+from report_fixtures import DAYS
+from report_fixtures import FakeAsyncClient
+from report_fixtures import FakeCall
+from report_fixtures import json_copy
+from report_fixtures import patch_do_sync
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+from report_fixtures import ROWS_PER_DAY
+from report_fixtures import selected_catalog_entry
+
+
+class TestAsyncSync(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog = {"streams": [selected_catalog_entry(self.stream, "campaign_performance_report")]}
+
+    def run_sync(self, config, state, client=None):
+        """Return the records and states written, in order"""
+        messages = []
+        with patch_do_sync({"campaign_performance_report": self.stream}, messages, client=client):
+            try:
+                do_sync(config, self.catalog, resource_schema, state)
+            except RuntimeError:
+                pass
+        return [(kind, value) for kind, value in messages if kind != "schema"]
+
+    def test_same_records_and_state_as_the_blocking_engine(self):
+        blocking_state, async_state = {}, {}
+        blocking = self.run_sync(CONFIG, blocking_state)
+        async_messages = self.run_sync(dict(CONFIG, sync_engine="async"), async_state)
+
+        def records(messages):
+            return sorted((record["_sdc_record_hash"], record["clicks"])
+                          for kind, record in messages if kind == "record")
+
+        self.assertEqual(len(records(async_messages)), len(CUSTOMERS) * len(DAYS) * ROWS_PER_DAY)
+        self.assertEqual(records(async_messages), records(blocking))
+        self.assertEqual(async_state, blocking_state)
+
+    def test_bookmarks_follow_their_records(self):
+        messages = self.run_sync(dict(CONFIG, sync_engine="async"), {})
+
+        written = set()
+        for kind, value in messages:
+            if kind == "record":
+                written.add((value["campaign_id"] // 10, value["date"][:10]))
+                continue
+            for customer_id, bookmark in value.get("bookmarks", {}).get("campaign_performance_report", {}).items():
+                if "date" in bookmark:
+                    done = [day for day in DAYS if day <= bookmark["date"][:10]]
+                    self.assertTrue(all((int(customer_id), day) in written for day in done))
+
+    def test_requests_carry_the_developer_token_and_login_customer(self):
+        client = FakeAsyncClient()
+        self.run_sync(dict(CONFIG, sync_engine="async"), {}, client)
+
+        self.assertEqual(len(client.requests), len(CUSTOMERS) * len(DAYS))
+        for _, _, _, metadata in client.requests:
+            self.assertEqual(metadata, {"developer-token": "token", "login-customer-id": "1"})
+
+    def test_failed_day_keeps_the_earlier_bookmark(self):
+        state = {}
+        messages = self.run_sync(dict(CONFIG, sync_engine="async"), state, FakeAsyncClient(fail_on_day="2022-01-02"))
+
+        for customer in CUSTOMERS:
+            self.assertEqual(state["bookmarks"]["campaign_performance_report"][customer["customerId"]]["date"],
+                             "2022-01-01T00:00:00.000000Z")
+        days = {record["date"][:10] for kind, record in messages if kind == "record"}
+        self.assertEqual(days, {"2022-01-01", "2022-01-03"})
+
+    def test_a_day_that_fails_for_any_reason_is_aborted(self):
+        build_record = self.stream.build_record
+
+        def fail_on_the_second_day(message, *args):
+            if message.segments.date == "2022-01-02":
+                raise ValueError("The row could not be transformed")
+            return build_record(message, *args)
+
+        with patch.object(self.stream, "build_record", side_effect=fail_on_the_second_day), \
+             patch("tap_google_ads.report_output.SingerReportDay.abort") as abort:
+            with self.assertRaises(ValueError):
+                self.run_sync(dict(CONFIG, sync_engine="async"), {})
+
+        abort.assert_called()
+
+    def test_failed_next_page_is_searched_for_again(self):
+        customer_id = CUSTOMERS[0]["customerId"]
+        client = FakeAsyncClient(page_errors={(customer_id, "2022-01-02", "2"): ServiceUnavailable("Try again")})
+        state = {}
+        messages = self.run_sync(dict(CONFIG, sync_engine="async"), state, client)
+
+        tokens = [token for request_customer_id, day, token, _ in client.requests
+                  if request_customer_id == customer_id and day == "2022-01-02"]
+        self.assertEqual(tokens, [None, "2"])
+        records = sorted(record["clicks"] for kind, record in messages
+                         if kind == "record" and record["campaign_id"] // 10 == int(customer_id)
+                         and record["date"].startswith("2022-01-02"))
+        self.assertEqual(records, list(range(ROWS_PER_DAY)))
+        self.assertEqual(state["bookmarks"]["campaign_performance_report"][customer_id]["date"],
+                         "2022-01-03T00:00:00.000000Z")
+
+    def test_resumes_from_a_checkpoint(self):
+        # A checkpoint is for the day after the last complete one, which the conversion window queries again
+        query = create_report_query("campaign", get_selected_fields(self.catalog["streams"][0]["metadata"]),
+                                    datetime(2022, 1, 2, tzinfo=pytz.UTC))
+        bookmark = {"date": "2022-01-01T00:00:00.000000Z", "page_date": "2022-01-02T00:00:00.000000Z",
+                    "page_query": hash_query(query), "page_token": "2"}
+        state = {"bookmarks": {"campaign_performance_report": {CUSTOMERS[0]["customerId"]: bookmark}}}
+
+        for rejected_token, expected in ((None, ["2"]), ("2", ["2", None])):
+            with self.subTest(rejected_token=rejected_token):
+                client = FakeAsyncClient(rejected_token=rejected_token)
+                self.run_sync(dict(CONFIG, sync_engine="async"), json_copy(state), client)
+                tokens = {day: [token for customer_id, request_day, token, _ in client.requests
+                                if customer_id == CUSTOMERS[0]["customerId"] and request_day == day]
+                          for day in DAYS}
+                self.assertEqual(tokens, {"2022-01-01": [None], "2022-01-02": expected, "2022-01-03": [None]})
+
+
+class TestAsyncConfig(unittest.TestCase):
+
+    def test_sync_engine(self):
+        self.assertEqual(get_sync_engine({}), "blocking")
+        self.assertEqual(get_sync_engine({"sync_engine": "async"}), "async")
+        with self.assertRaises(RuntimeError):
+            get_sync_engine({"sync_engine": "threads"})
+
+    def test_concurrency_falls_back_to_the_default(self):
+        self.assertEqual(get_concurrency({}, "async_concurrency", 50), 50)
+        self.assertEqual(get_concurrency({"async_concurrency": "200"}, "async_concurrency", 50), 200)
+        for invalid in (0, -1, "many", None):
+            self.assertEqual(get_concurrency({"async_concurrency": invalid}, "async_concurrency", 50), 50)
+
+    def test_failures_become_google_ads_exceptions(self):
+        err = to_google_ads_exception(api_error(RequestErrorEnum.RequestError.EXPIRED_PAGE_TOKEN))
+        self.assertIsInstance(err, GoogleAdsException)
+        self.assertEqual(err.request_id, "abc")
+        self.assertEqual(err.failure.errors[0].message, "The request was rejected")
+
+        plain = InvalidArgument("No failure details", response=FakeCall([]))
+        self.assertIs(to_google_ads_exception(plain), plain)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import io
+import json
+import unittest
+from tap_google_ads.discover import get_compact_catalog
+from tap_google_ads.discover import write_catalog
+
+catalog_entries = [
+    {"tap_stream_id": "a", "stream": "a", "schema": {"type": ["null", "object"], "properties": {}}, "metadata": []},
+    {"tap_stream_id": "b", "stream": "b",
+     "schema": {"type": ["null", "object"], "properties": {"id": {"type": ["null", "integer"]}}},
+     "metadata": [{"breadcrumb": ["properties", "id"], "metadata": {"fieldExclusions": ["x", "y"]}}]},
+]
+
+
+def write(entries, compact=False):
+    out = io.StringIO()
+    # Pass a generator to make sure the writer never needs the whole list
+    write_catalog((entry for entry in entries), out, compact=compact)
+    return out.getvalue()
+
+
+class TestCatalogWriter(unittest.TestCase):
+
+    def test_default_output_matches_json_dump(self):
+        for entries in ([], catalog_entries[:1], catalog_entries):
+            with self.subTest(streams=len(entries)):
+                self.assertEqual(write(entries), json.dumps({"streams": entries}, indent=2))
+
+    def test_compact_output(self):
+        compact = write(catalog_entries, compact=True)
+
+        self.assertEqual(json.loads(compact), {"streams": catalog_entries})
+        self.assertNotIn("\n", compact)
+        self.assertNotIn(": ", compact)
+        self.assertEqual(write([], compact=True), '{"streams":[]}')
+
+    def test_get_compact_catalog(self):
+        self.assertFalse(get_compact_catalog({}))
+        self.assertTrue(get_compact_catalog({"compact_catalog": True}))
+        self.assertTrue(get_compact_catalog({"compact_catalog": "true"}))
+        self.assertFalse(get_compact_catalog({"compact_catalog": "false"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import math
+import os
+import tempfile
+import unittest
+import pyarrow.parquet
+from google.protobuf.descriptor import FieldDescriptor
+from singer import Transformer
+from tap_google_ads.columnar import ColumnarPageBuilder
+from tap_google_ads.record_hash import HASH_VERSION_KEY
+from tap_google_ads.report_output import ParquetOutput
+from tap_google_ads.streams import ReportStream
+from report_fixtures import field
+from report_fixtures import RawRow
+from report_fixtures import selected_catalog_entry
+
+# Mirrors `data_type_map` in `discover.build_resource_metadata`
+JSON_SCHEMA_BY_PROTO_TYPE = {
+    FieldDescriptor.TYPE_BOOL: {"type": ["null", "boolean"]},
+    FieldDescriptor.TYPE_DOUBLE: {"type": ["null", "string"], "format": "singer.decimal"},
+    FieldDescriptor.TYPE_ENUM: {"type": ["null", "string"]},
+    FieldDescriptor.TYPE_INT64: {"type": ["null", "integer"]},
+    FieldDescriptor.TYPE_STRING: {"type": ["null", "string"]},
+    FieldDescriptor.TYPE_MESSAGE: {"type": ["null", "object", "string"], "properties": {}},
+}
+
+FIELDS = [
+    "ad_group_ad.ad.id",
+    "ad_group_ad.ad.type",
+    "ad_group_ad.ad.final_urls",
+    "ad_group_ad.status",
+    "ad_group_criterion.keyword.text",
+    "ad_group_criterion.keyword.match_type",
+    "campaign.id",
+    "campaign.name",
+    "metrics.clicks",
+    "metrics.cost_micros",
+    "metrics.ctr",
+    "metrics.average_cpc",
+    "segments.date",
+    "segments.device",
+]
+
+
+def get_field(field_name):
+    descriptor, field = RawRow.DESCRIPTOR, None
+    for part in field_name.split("."):
+        field = descriptor.fields_by_name.get(part) or descriptor.fields_by_name[part + "_"]
+        descriptor = field.message_type
+    return field
+
+
+def build_resource_schema():
+    resource_schema = {"ad_group_ad": {"name": "ad_group_ad", "fields": {}}}
+    for field_name in FIELDS:
+        if field_name == "segments.date":
+            json_schema = {"type": ["null", "string"], "format": "date-time"}
+        else:
+            json_schema = dict(JSON_SCHEMA_BY_PROTO_TYPE[get_field(field_name).type])
+        category = {"metrics": "METRIC", "segments": "SEGMENT"}.get(field_name.split(".")[0], "ATTRIBUTE")
+        resource_schema[field_name] = {"name": field_name, "json_schema": json_schema}
+        resource_schema["ad_group_ad"]["fields"][field_name] = field(field_name, category, json_schema)
+    return resource_schema
+
+
+def make_rows():
+    full = RawRow()
+    full.ad_group_ad.ad.id = 123456789012
+    full.ad_group_ad.ad.type_ = 2
+    full.ad_group_ad.ad.final_urls.extend(["https://example.com/a", "https://example.com/b"])
+    full.ad_group_ad.status = 2
+    full.ad_group_criterion.keyword.text = "running shoes"
+    full.ad_group_criterion.keyword.match_type = 2
+    full.campaign.id = 42
+    full.campaign.name = "Spring – sale"
+    full.metrics.clicks = 7
+    full.metrics.cost_micros = 1230000
+    full.metrics.ctr = 0.1
+    full.metrics.average_cpc = 1e-07
+    full.segments.date = "2022-01-01"
+    full.segments.device = 2
+
+    # Set to their defaults: optional fields are still printed, the others are not
+    defaults = RawRow()
+    defaults.campaign.name = ""
+    defaults.metrics.clicks = 0
+    defaults.ad_group_ad.status = 0
+    defaults.segments.date = "2022-01-01"
+
+    # Values MessageToJson spells out
+    special = RawRow()
+    special.campaign.id = 43
+    special.metrics.ctr = float("nan")
+    special.metrics.average_cpc = float("inf")
+    special.ad_group_ad.status = 99
+    special.segments.date = "2022-01-02"
+
+    rows = [full, defaults, special, RawRow()]
+    return rows + [RawRow.FromString(row.SerializeToString()) for row in rows]
+
+
+def same(left, right):
+    if isinstance(left, float) and isinstance(right, float) and math.isnan(left):
+        return math.isnan(right)
+    return left == right
+
+
+class TestColumnarPages(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(FIELDS, ["ad_group_ad"], build_resource_schema(), ["_sdc_record_hash"])
+        self.catalog_entry = selected_catalog_entry(self.stream, "ad_performance_report")
+
+    def build_records(self, rows):
+        with Transformer() as transformer:
+            return [self.stream.build_record(row, transformer, self.catalog_entry) for row in rows]
+
+    def test_columns_match_the_records(self):
+        for hash_version in (1, 2):
+            for entry in self.catalog_entry["metadata"]:
+                if entry["breadcrumb"] == []:
+                    entry["metadata"][HASH_VERSION_KEY] = hash_version
+            rows = make_rows()
+            records = self.build_records(rows)
+
+            columns = ColumnarPageBuilder(self.catalog_entry).build(rows)
+
+            self.assertIn("ad_group_criterion_keyword", columns)
+            self.assertIn("type", columns)
+            for index, record in enumerate(records):
+                for name in set(record) | set(columns):
+                    with self.subTest(hash_version=hash_version, row=index, column=name):
+                        self.assertTrue(same(columns[name][index], record.get(name)),
+                                        f"{columns[name][index]!r} != {record.get(name)!r}")
+
+    def test_property_from_two_messages_stays_on_the_row_path(self):
+        for entry in self.catalog_entry["metadata"]:
+            if entry["breadcrumb"] == ["properties", "clicks"]:
+                entry["metadata"]["tap-google-ads.api-field-names"] = ["metrics.clicks", "segments.clicks"]
+
+        builder = ColumnarPageBuilder(self.catalog_entry)
+
+        self.assertIsNone(builder.build(make_rows()))
+        self.assertEqual(builder.build([]), None)
+
+    def test_parquet_from_columns_matches_parquet_from_records(self):
+        rows = make_rows()
+        records = self.build_records(rows)
+        columns = ColumnarPageBuilder(self.catalog_entry).build(rows)
+
+        tables = []
+        for write_columns in (False, True):
+            with tempfile.TemporaryDirectory() as parquet_path:
+                output = ParquetOutput(parquet_path)
+                with output.report_day(self.catalog_entry, "1", "2022-01-01") as report_day:
+                    if write_columns:
+                        report_day.write_columns(columns)
+                    else:
+                        for record in records:
+                            report_day.write(record)
+                    report_day.commit("")
+                directory = os.path.join(parquet_path, "ad_performance_report", "customer_id=1", "date=2022-01-01")
+                tables.append(pyarrow.parquet.read_table(directory).to_pylist())
+
+        self.assertEqual(len(tables[0]), len(rows))
+        self.assertEqual(str(tables[0]), str(tables[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
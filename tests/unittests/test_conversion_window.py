@@ -6,8 +6,10 @@ from unittest.mock import MagicMock
 from unittest.mock import Mock
 from unittest.mock import patch
 from tap_google_ads.streams import get_conversion_window
+from tap_google_ads.streams import get_stream_conversion_window
 from tap_google_ads.streams import ReportStream
 from tap_google_ads.streams import make_request
+from tap_google_ads.sync import check_conversion_window_overrides
 
 
 resource_schema = {
@@ -276,5 +278,82 @@ class TestGetConversionWindow(unittest.TestCase):
         self.assertEqual(expected, actual)
 
 
+class TestStreamConversionWindow(unittest.TestCase):
+
+    CONVERSION_FIELDS = {"campaign.id", "metrics.clicks", "metrics.all_conversions", "segments.date"}
+    CLICK_FIELDS = {"campaign.id", "metrics.clicks", "metrics.impressions", "segments.date"}
+
+    def test_global_window_by_default(self):
+        config = {"conversion_window": "60"}
+        self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", self.CLICK_FIELDS), 60)
+
+    def test_override_wins(self):
+        config = {"conversion_window": 60,
+                  "conversion_window_overrides": '{"campaign_performance_report": 7, "age_range_performance_report": 0}'}
+
+        self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", self.CONVERSION_FIELDS), 7)
+        self.assertEqual(get_stream_conversion_window(config, "age_range_performance_report", self.CLICK_FIELDS), 0)
+        self.assertEqual(get_stream_conversion_window(config, "ad_group_performance_report", self.CLICK_FIELDS), 60)
+
+    def test_auto_mode_drops_the_lookback_without_conversion_metrics(self):
+        config = {"auto_conversion_window": "true"}
+
+        self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", self.CLICK_FIELDS), 0)
+        self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", self.CONVERSION_FIELDS), 30)
+        for metric in ("metrics.conversions", "metrics.view_through_conversions", "metrics.cost_per_conversion"):
+            with self.subTest(metric=metric):
+                fields = self.CLICK_FIELDS | {metric}
+                self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", fields), 30)
+
+    def test_auto_mode_respects_overrides(self):
+        config = {"auto_conversion_window": True, "conversion_window_overrides": {"campaign_performance_report": 3}}
+        self.assertEqual(get_stream_conversion_window(config, "campaign_performance_report", self.CLICK_FIELDS), 3)
+
+    def test_invalid_overrides_raise(self):
+        for overrides in ('{"campaign_performance_report": 45}', '{"campaign_performance_report": "a"}',
+                          "not json", "[7]"):
+            with self.subTest(overrides=overrides):
+                with self.assertRaises(RuntimeError):
+                    get_stream_conversion_window({"conversion_window_overrides": overrides},
+                                                 "campaign_performance_report", self.CLICK_FIELDS)
+
+    def test_unknown_override_streams_warn(self):
+        config = {"conversion_window_overrides": {"campaign_performance_report": 7, "campain_performance_report": 3}}
+        catalog = {"streams": [{"stream": "campaign_performance_report"}, {"stream": "ad_group_performance_report"}]}
+
+        with self.assertLogs(level="WARNING") as logs:
+            check_conversion_window_overrides(config, catalog)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("campain_performance_report", logs.output[0])
+
+    def test_known_override_streams_do_not_warn(self):
+        config = {"conversion_window_overrides": '{"campaign_performance_report": 7}'}
+        catalog = {"streams": [{"stream": "campaign_performance_report"}]}
+
+        with self.assertNoLogs(level="WARNING"):
+            check_conversion_window_overrides(config, catalog)
+
+    @patch('tap_google_ads.streams.make_request')
+    def test_auto_mode_resumes_from_the_bookmark(self, fake_make_request):
+        end_date = datetime.now()
+        bookmark_value = str(end_date - timedelta(days=2))
+        config = {"start_date": str(datetime(2021, 12, 1)), "auto_conversion_window": True}
+        state = {"bookmarks": {"hi": {"123": {'date': bookmark_value}}}}
+
+        my_report_stream = ReportStream(
+            fields=[],
+            google_ads_resource_names=['accessible_bidding_strategy'],
+            resource_schema=resource_schema,
+            primary_keys=['foo']
+        )
+        my_report_stream.sync(Mock(), {"customerId": "123", "loginCustomerId": "456"},
+                              {"tap_stream_id": "hi", "stream": "hi", "metadata": []},
+                              config, state, None)
+
+        # The bookmarked day, the day after and today
+        self.assertEqual(fake_make_request.call_count, 3)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,232 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import Mock
+from unittest.mock import patch
+from tap_google_ads.digest_store import create_digest_store
+from tap_google_ads.digest_store import DigestStore
+from tap_google_ads.digest_store import NullDigestStore
+from tap_google_ads.streams import BaseStream
+from tap_google_ads.streams import ReportStream
+from report_fixtures import RawRow
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import build_resource_schema
+from report_fixtures import field
+from report_fixtures import patch_report_api
+from report_fixtures import resource_schema
+from report_fixtures import selected_catalog_entry
+
+CUSTOMER = {"customerId": "123", "loginCustomerId": "123"}
+CAMPAIGNS = 5
+
+
+class FakeReportApi:
+    """Serves CAMPAIGNS rows a day, with `clicks[(day, campaign_id)]` overriding the default of 1 click"""
+
+    def __init__(self, clicks=None, fail_on_day=None):
+        self.clicks = clicks or {}
+        self.fail_on_day = fail_on_day
+
+    def rows(self, day):
+        for campaign_id in range(1, CAMPAIGNS + 1):
+            if day == self.fail_on_day and campaign_id == CAMPAIGNS:
+                raise RuntimeError("The connection dropped")
+            row = RawRow()
+            row.campaign.id = campaign_id
+            row.metrics.clicks = self.clicks.get((day, campaign_id), 1)
+            row.segments.date = day
+            yield row
+
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        day = re.search(r"segments.date = '(\d{4}-\d\d-\d\d)'", query).group(1)
+        return Mock(pages=iter([Mock(results=self.rows(day), next_page_token="")]))
+
+
+class TestReportDigests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "digests.db")
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog_entry = selected_catalog_entry(self.stream, "campaign_report")
+
+    def run_sync(self, api, start_date="2022-01-01", end_date="2022-01-03"):
+        config = {"start_date": f"{start_date}T00:00:00Z", "end_date": f"{end_date}T00:00:00Z",
+                  "report_digest_path": self.path}
+        # Resume from the start date every time, as if the whole range was in the conversion window
+        state = {}
+        messages = []
+        digest_store = create_digest_store(config, "report_digest_path")
+        with patch_report_api(messages, api.make_request):
+            try:
+                self.stream.sync(Mock(), CUSTOMER, self.catalog_entry, config, state, query_limit=None,
+                                 digest_store=digest_store)
+            except RuntimeError:
+                pass
+            finally:
+                digest_store.close()
+        return [(record["date"][:10], record["campaign_id"], record["clicks"])
+                for kind, record in messages if kind == "record"]
+
+    def stored_days(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return sorted(day for (day,) in connection.execute("SELECT DISTINCT day FROM report_digests"))
+        finally:
+            connection.close()
+
+    def test_store_is_off_by_default(self):
+        self.assertIsInstance(create_digest_store({}, "report_digest_path"), NullDigestStore)
+        store = create_digest_store({"report_digest_path": self.path}, "report_digest_path")
+        self.addCleanup(store.close)
+        self.assertIsInstance(store, DigestStore)
+
+    def test_unchanged_rows_are_not_emitted_again(self):
+        self.assertEqual(len(self.run_sync(FakeReportApi())), 3 * CAMPAIGNS)
+        self.assertEqual(self.run_sync(FakeReportApi()), [])
+
+    def test_only_changed_rows_are_emitted(self):
+        self.run_sync(FakeReportApi())
+        api = FakeReportApi(clicks={("2022-01-02", 3): 7, ("2022-01-03", 1): 2})
+
+        self.assertEqual(self.run_sync(api), [("2022-01-02", 3, 7), ("2022-01-03", 1, 2)])
+        self.assertEqual(self.run_sync(api), [])
+
+    def test_interrupted_day_is_emitted_again(self):
+        emitted = self.run_sync(FakeReportApi(fail_on_day="2022-01-02"))
+        self.assertEqual(len(emitted), CAMPAIGNS + CAMPAIGNS - 1)
+
+        emitted = self.run_sync(FakeReportApi())
+        self.assertEqual(sorted({day for day, _, _ in emitted}), ["2022-01-02", "2022-01-03"])
+        self.assertEqual(len(emitted), 2 * CAMPAIGNS)
+
+    def test_days_before_the_window_are_compacted(self):
+        self.run_sync(FakeReportApi())
+        self.assertEqual(self.stored_days(), ["2022-01-01", "2022-01-02", "2022-01-03"])
+
+        self.run_sync(FakeReportApi(), start_date="2022-01-02")
+        self.assertEqual(self.stored_days(), ["2022-01-02", "2022-01-03"])
+
+
+CORE_FIELDS = {
+    "campaign.id": field("campaign.id", "ATTRIBUTE", {"type": ["null", "integer"]}),
+    "campaign.name": field("campaign.name", "ATTRIBUTE", {"type": ["null", "string"]}),
+}
+core_resource_schema = build_resource_schema(CORE_FIELDS)
+
+
+def make_campaigns(names):
+    for campaign_id, name in sorted(names.items()):
+        row = RawRow()
+        row.campaign.id = campaign_id
+        row.campaign.name = name
+        yield row
+
+
+class TestEntityDigests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.config = {"start_date": "2022-01-01T00:00:00Z", "core_digest_path": os.path.join(self.directory, "core.db")}
+        self.stream = BaseStream([], ["campaign"], core_resource_schema, ["id"], filter_param="campaign.id")
+        self.catalog_entry = selected_catalog_entry(self.stream, "campaigns")
+
+    def run_sync(self, names, state=None, **config):
+        messages = []
+        config = dict(self.config, **config)
+        digest_store = create_digest_store(config, "core_digest_path")
+        with patch_report_api(messages, lambda *args, **kwargs: make_campaigns(names)):
+            try:
+                self.stream.sync(Mock(), CUSTOMER, self.catalog_entry, config, state or {},
+                                 query_limit=1000, digest_store=digest_store)
+            finally:
+                digest_store.close()
+        return [record for kind, record in messages if kind == "record"]
+
+    def test_only_new_and_changed_entities_are_emitted(self):
+        self.assertEqual(len(self.run_sync({1: "a", 2: "b", 3: "c"})), 3)
+        self.assertEqual(self.run_sync({1: "a", 2: "b", 3: "c"}), [])
+        self.assertEqual(self.run_sync({1: "a", 2: "renamed", 3: "c", 4: "d"}),
+                         [{"id": 2, "name": "renamed"}, {"id": 4, "name": "d"}])
+
+    def test_deletion_markers(self):
+        self.run_sync({1: "a", 2: "b", 3: "c"})
+
+        records = self.run_sync({1: "a", 3: "c"}, core_deletion_markers=True)
+
+        # Deleted as of `SYNC_NOW`
+        self.assertEqual(records, [{"id": 2, "_sdc_deleted_at": "2022-01-03T00:00:00.000000Z"}])
+        self.assertEqual(self.run_sync({1: "a", 3: "c"}, core_deletion_markers=True), [])
+
+    def test_deleted_entities_are_dropped_without_markers(self):
+        self.run_sync({1: "a", 2: "b"})
+        self.assertEqual(self.run_sync({1: "a"}), [])
+        self.assertEqual(self.run_sync({1: "a", 2: "b"}), [{"id": 2, "name": "b"}])
+
+    def test_resumed_sync_does_not_delete(self):
+        self.run_sync({1: "a", 2: "b", 3: "c"})
+        state = {"bookmarks": {"campaigns": {"123": {"last_pk_fetched": 2}}}}
+
+        self.assertEqual(self.run_sync({2: "b", 3: "c"}, state, core_deletion_markers=True), [])
+        self.assertEqual(self.run_sync({1: "a", 2: "b", 3: "c"}), [])
+
+    def test_failed_scan_saves_nothing(self):
+        def failing_campaigns():
+            yield from make_campaigns({1: "a"})
+            raise RuntimeError("The connection dropped")
+
+        digest_store = create_digest_store(self.config, "core_digest_path")
+        with patch_report_api([], lambda *args, **kwargs: failing_campaigns()):
+            with self.assertRaises(RuntimeError):
+                self.stream.sync(Mock(), CUSTOMER, self.catalog_entry, self.config, {},
+                                 query_limit=1000, digest_store=digest_store)
+        digest_store.close()
+
+        self.assertEqual(len(self.run_sync({1: "a"})), 1)
+
+    def test_only_a_finished_scan_drops_the_entities_it_did_not_see(self):
+        store = DigestStore(self.config["core_digest_path"])
+        self.addCleanup(store.close)
+        with store.entity_scan("campaigns", "123", ["id"]) as scan:
+            scan.changed({"id": 1, "name": "a"})
+            scan.changed({"id": 2, "name": "b"})
+
+        for finish, dropped in ((False, False), (True, True)):
+            with self.subTest(finish=finish):
+                with store.entity_scan("campaigns", "123", ["id"]) as scan:
+                    scan.changed({"id": 1, "name": "a"})
+                    if finish:
+                        scan.finish()
+                    else:
+                        with self.assertRaises(RuntimeError):
+                            list(scan.deleted_records())
+
+                with store.entity_scan("campaigns", "123", ["id"]) as scan:
+                    self.assertEqual(scan.changed({"id": 2, "name": "b"}), dropped)
+
+    def test_a_scan_does_not_lock_other_stores(self):
+        path = self.config["core_digest_path"]
+        scanning = DigestStore(path)
+        with patch("tap_google_ads.digest_store.LOCK_TIMEOUT", 0.1):
+            other = DigestStore(path)
+        self.addCleanup(other.close)
+        self.addCleanup(scanning.close)
+
+        with scanning.entity_scan("campaigns", "123", ["id"]) as scan:
+            for campaign_id in range(2500):
+                scan.changed({"id": campaign_id, "name": "a"})
+            # Another shard writes while the scan is still going
+            with other.entity_scan("campaigns", "456", ["id"]) as other_scan:
+                other_scan.changed({"id": 1, "name": "a"})
+
+        with scanning.entity_scan("campaigns", "123", ["id"]) as scan:
+            self.assertFalse(scan.changed({"id": 2499, "name": "a"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
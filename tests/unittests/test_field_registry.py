@@ -0,0 +1,48 @@
+import unittest
+from tap_google_ads import report_definitions
+from tap_google_ads.field_registry import compile_fields
+from tap_google_ads.field_registry import transform_exclusion_name
+from tap_google_ads.field_registry import transform_field_name
+
+
+class TestFieldRegistry(unittest.TestCase):
+
+    def test_duplicates_are_dropped_and_order_is_kept(self):
+        compiled = compile_fields(["campaign.id", "metrics.clicks", "campaign.id", "segments.date"])
+
+        self.assertEqual(compiled.names, ("campaign.id", "metrics.clicks", "segments.date"))
+
+    def test_same_list_is_compiled_once(self):
+        fields = ["campaign.id", "metrics.clicks"]
+        self.assertIs(compile_fields(fields), compile_fields(list(fields)))
+
+    def test_report_definitions_are_deduplicated(self):
+        raw = report_definitions.ACCOUNT_PERFORMANCE_REPORT_FIELDS
+        compiled = compile_fields(raw)
+
+        self.assertEqual(raw.count("customer.descriptive_name"), 2)
+        self.assertEqual(compiled.names.count("customer.descriptive_name"), 1)
+        self.assertEqual(len(compiled.names), len(set(raw)))
+
+    def test_column_names(self):
+        cases = {
+            "ad_group_ad.ad.id": "id",
+            "ad_group_ad.policy_summary.approval_status": "ad_group_ad_policy_summary",
+            "ad_group_criterion.keyword.text": "ad_group_criterion_keyword",
+            "campaign.id": "campaign_id",
+            "metrics.clicks": "clicks",
+            "segments.date": "date",
+        }
+        for field_name, column in cases.items():
+            with self.subTest(field_name=field_name):
+                self.assertEqual(transform_field_name(field_name), column)
+                self.assertEqual(compile_fields([field_name]).columns[field_name], column)
+
+    def test_exclusion_names(self):
+        self.assertEqual(transform_exclusion_name("ad_group_ad.ad.id"), "ad_group_ad_ad_id")
+        self.assertEqual(transform_exclusion_name("metrics.clicks"), "clicks")
+        self.assertEqual(transform_exclusion_name("segments.date"), "date")
+
+
+if __name__ == '__main__':
+    unittest.main()
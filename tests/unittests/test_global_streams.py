@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import Mock
+from unittest.mock import patch
+from tap_google_ads.streams import CORE_STREAM_SPECS
+from tap_google_ads.streams import GLOBAL_CONSTANT_STREAMS
+from tap_google_ads.sync import do_sync
+
+
+def make_customers(count):
+    return [{"customerId": str(1000000000 + index), "loginCustomerId": "1"} for index in range(count)]
+
+
+def catalog_entry(stream_name):
+    return {
+        "tap_stream_id": stream_name,
+        "stream": stream_name,
+        "schema": {},
+        "metadata": [{"breadcrumb": [], "metadata": {"selected": True}}],
+    }
+
+
+CATALOG = {"streams": [catalog_entry("campaigns"), catalog_entry("language_constant")]}
+
+
+class TestGlobalConstantStreams(unittest.TestCase):
+
+    def run_sync(self, customers, state):
+        streams = {"campaigns": Mock(), "language_constant": Mock()}
+        with patch("tap_google_ads.sync.create_sdk_client"), \
+             patch("tap_google_ads.sync.initialize_core_streams", return_value=streams), \
+             patch("tap_google_ads.sync.initialize_reports", return_value={}), \
+             patch("singer.write_state"):
+            do_sync({"login_customer_ids": customers}, CATALOG, {}, state)
+        return {stream_name: [call.args[1]["customerId"] for call in stream.sync.call_args_list]
+                for stream_name, stream in streams.items()}
+
+    def test_global_streams_have_no_customer_id(self):
+        for stream_name in GLOBAL_CONSTANT_STREAMS:
+            self.assertNotIn("customer_id", CORE_STREAM_SPECS[stream_name].automatic_keys or set())
+
+    def test_global_stream_is_synced_once(self):
+        customers = make_customers(5)
+
+        synced = self.run_sync(customers, {})
+
+        self.assertEqual(synced["campaigns"], [customer["customerId"] for customer in customers])
+        self.assertEqual(synced["language_constant"], [customers[0]["customerId"]])
+
+    def test_interrupted_global_stream_resumes_with_its_customer(self):
+        customers = make_customers(5)
+        state = {
+            "currently_syncing": ["language_constant", customers[3]["customerId"]],
+            "bookmarks": {"language_constant": {customers[3]["customerId"]: {"last_pk_fetched": 1000}}},
+        }
+
+        synced = self.run_sync(customers, state)
+
+        self.assertEqual(synced["language_constant"], [customers[3]["customerId"]])
+        self.assertEqual(len(synced["campaigns"]), len(customers))
+
+    def test_global_stream_keeps_its_customer_when_another_stream_resumes(self):
+        customers = make_customers(5)
+        state = {
+            "currently_syncing": ["campaigns", customers[3]["customerId"]],
+            "bookmarks": {"campaigns": {customers[3]["customerId"]: {"last_pk_fetched": 1000}}},
+        }
+
+        synced = self.run_sync(customers, state)
+
+        self.assertEqual(synced["campaigns"][0], customers[3]["customerId"])
+        self.assertEqual(synced["language_constant"], [customers[0]["customerId"]])
+
+    def test_no_customers(self):
+        self.assertEqual(self.run_sync([], {}), {"campaigns": [], "language_constant": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
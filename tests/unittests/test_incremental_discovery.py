@@ -0,0 +1,149 @@
+import copy
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from tap_google_ads import discover
+from tap_google_ads import discovery_cache
+from tap_google_ads.streams import BaseStream
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import StreamSpec
+
+
+def api_field(name, category, json_schema, selectable_with=(), metrics=(), segments=(), attributes=()):
+    return {
+        "name": name,
+        "category": category,
+        "json_schema": json_schema,
+        "selectable": True,
+        "filterable": True,
+        "sortable": True,
+        "selectable_with": set(selectable_with),
+        "metrics": list(metrics),
+        "segments": list(segments),
+        "attributes": list(attributes),
+    }
+
+
+INTEGER = {"type": ["null", "integer"]}
+STRING = {"type": ["null", "string"]}
+
+BASE_RESOURCE_SCHEMA = {
+    "campaign": api_field("campaign", "RESOURCE", STRING, ["segments.date"],
+                          metrics=["metrics.clicks"], segments=["segments.date"],
+                          attributes=["campaign.id", "campaign.name"]),
+    "ad_group": api_field("ad_group", "RESOURCE", STRING, attributes=["ad_group.id", "ad_group.name"]),
+    "campaign.id": api_field("campaign.id", "ATTRIBUTE", INTEGER),
+    "campaign.name": api_field("campaign.name", "ATTRIBUTE", STRING),
+    "ad_group.id": api_field("ad_group.id", "ATTRIBUTE", INTEGER),
+    "ad_group.name": api_field("ad_group.name", "ATTRIBUTE", STRING),
+    "metrics.clicks": api_field("metrics.clicks", "METRIC", INTEGER),
+    "segments.date": api_field("segments.date", "SEGMENT", {"type": ["null", "string"], "format": "date-time"},
+                               ["campaign"]),
+}
+
+STREAM_SPECS = {
+    "campaigns": StreamSpec(BaseStream, [], ["campaign"], ["id"], filter_param="campaign.id"),
+    "ad_groups": StreamSpec(BaseStream, [], ["ad_group"], ["id"], filter_param="ad_group.id"),
+    "campaign_report": StreamSpec(ReportStream, ["campaign.id", "campaign.name", "metrics.clicks", "segments.date"],
+                                  ["campaign"], ["_sdc_record_hash"]),
+}
+
+
+class TestIncrementalDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def discover(self, base_resource_schema=BASE_RESOURCE_SCHEMA, stream_specs=STREAM_SPECS):
+        out = io.StringIO()
+        with patch.object(discovery_cache, "get_stream_specs", return_value=stream_specs), \
+             patch.object(discovery_cache, "add_resource_fields", wraps=discover.add_resource_fields) as add_fields, \
+             redirect_stdout(out):
+            diff = discovery_cache.discover_incrementally(copy.deepcopy(base_resource_schema), self.cache_dir)
+        self.resources_rebuilt = [call.args[1] for call in add_fields.call_args_list]
+        return out.getvalue(), diff
+
+    def full_catalog(self, base_resource_schema=BASE_RESOURCE_SCHEMA):
+        resource_schema = copy.deepcopy(base_resource_schema)
+        for resource_name in ("campaign", "ad_group"):
+            discover.add_resource_fields(resource_schema, resource_name)
+
+        out = io.StringIO()
+        with patch.object(discover, "get_stream_specs", return_value=STREAM_SPECS), redirect_stdout(out):
+            discover.do_discover(resource_schema)
+        return out.getvalue()
+
+    def read_cache_file(self, file_name):
+        with open(os.path.join(self.cache_dir, file_name), encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+
+    def test_first_run_builds_every_stream(self):
+        catalog, diff = self.discover()
+
+        self.assertEqual(catalog, self.full_catalog())
+        self.assertEqual(diff["added"], ["campaigns", "ad_groups", "campaign_report"])
+        self.assertEqual(self.resources_rebuilt, ["campaign", "ad_group"])
+        self.assertEqual(self.read_cache_file(discovery_cache.DIFF_FILE_NAME), diff)
+        self.assertEqual(list(self.read_cache_file(discovery_cache.CACHE_FILE_NAME)["streams"]), list(STREAM_SPECS))
+
+    def test_unchanged_fields_reuse_the_cached_catalog(self):
+        first_catalog, _ = self.discover()
+        catalog, diff = self.discover()
+
+        self.assertEqual(catalog, first_catalog)
+        self.assertEqual(diff, {"added": [], "removed": [], "changed": {},
+                                "unchanged": ["campaigns", "ad_groups", "campaign_report"]})
+        self.assertEqual(self.resources_rebuilt, [])
+
+    def test_changed_field_only_rebuilds_the_streams_using_it(self):
+        self.discover()
+        changed_schema = copy.deepcopy(BASE_RESOURCE_SCHEMA)
+        changed_schema["campaign.name"]["json_schema"] = INTEGER
+
+        catalog, diff = self.discover(changed_schema)
+
+        self.assertEqual(catalog, self.full_catalog(changed_schema))
+        self.assertEqual(self.resources_rebuilt, ["campaign"])
+        self.assertEqual(diff["unchanged"], ["ad_groups"])
+        self.assertEqual(diff["changed"]["campaign_report"], {
+            "properties_added": [], "properties_removed": [], "properties_changed": ["campaign_name"],
+        })
+        self.assertEqual(diff["changed"]["campaigns"]["properties_changed"], ["name"])
+
+    def test_new_field_and_removed_stream_are_reported(self):
+        self.discover()
+        changed_schema = copy.deepcopy(BASE_RESOURCE_SCHEMA)
+        changed_schema["ad_group.status"] = api_field("ad_group.status", "ATTRIBUTE", STRING)
+        changed_schema["ad_group"]["attributes"].append("ad_group.status")
+        stream_specs = {name: spec for name, spec in STREAM_SPECS.items() if name != "campaign_report"}
+
+        _, diff = self.discover(changed_schema, stream_specs)
+
+        self.assertEqual(diff["removed"], ["campaign_report"])
+        self.assertEqual(diff["unchanged"], ["campaigns"])
+        self.assertEqual(diff["changed"]["ad_groups"]["properties_added"], ["status"])
+
+    def test_unreadable_cache_rebuilds_every_stream(self):
+        with open(os.path.join(self.cache_dir, discovery_cache.CACHE_FILE_NAME), "w", encoding="utf-8") as cache_file:
+            cache_file.write("{not json")
+
+        catalog, diff = self.discover()
+
+        self.assertEqual(catalog, self.full_catalog())
+        self.assertEqual(len(diff["added"]), 3)
+
+    def test_cache_from_another_version_is_ignored(self):
+        self.discover()
+        with patch.object(discovery_cache, "CACHE_VERSION", discovery_cache.CACHE_VERSION + 1):
+            _, diff = self.discover()
+        self.assertEqual(len(diff["added"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from google.api_core.exceptions import InternalServerError
+from tap_google_ads.instrumentation import INSTRUMENTATION
+from tap_google_ads.streams import make_request
+
+
+def fake_message(size):
+    message = Mock()
+    message.ByteSize.return_value = size
+    return message
+
+
+class TestRequestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        INSTRUMENTATION.reset()
+
+    def tearDown(self):
+        INSTRUMENTATION.reset()
+
+    def test_rows_bytes_and_requests_are_counted_per_unit(self):
+        """Verify rows and bytes are attributed to the unit that made the request"""
+        gas = Mock()
+        gas.search.return_value = [fake_message(10), fake_message(20), fake_message(30)]
+
+        with INSTRUMENTATION.unit("stream_a", "123", "2022-01-01") as unit:
+            response = make_request(gas, "", "123")
+            rows = list(unit.iter_rows(response))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(unit.requests, 1)
+        self.assertEqual(unit.rows, 3)
+        self.assertEqual(unit.bytes, 60)
+        self.assertIsNotNone(unit.time_to_first_row)
+        self.assertEqual(unit.retries, 0)
+
+    def test_next_page_fetches_are_counted_as_requests(self):
+        """Verify every page after the first one the search returned is timed as a request"""
+        gas = Mock()
+        gas.search.return_value = Mock(pages=iter([Mock(results=[fake_message(10)]),
+                                                   Mock(results=[fake_message(20)]),
+                                                   Mock(results=[fake_message(30)])]))
+
+        with INSTRUMENTATION.unit("stream_a", "123", "2022-01-01") as unit:
+            response = make_request(gas, "", "123")
+            rows = list(unit.iter_response_rows(response))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(unit.requests, 3)
+        self.assertEqual(unit.bytes, 60)
+        self.assertGreaterEqual(unit.request_seconds, unit.max_request_seconds)
+
+    @patch('time.sleep')
+    def test_retries_and_backoff_time_are_counted(self, mock_sleep):
+        """Verify every backoff retry is recorded against the active unit"""
+        gas = Mock()
+        gas.search.side_effect = [InternalServerError("Internal error encountered"), []]
+
+        with INSTRUMENTATION.unit("stream_a", "123", "2022-01-01") as unit:
+            make_request(gas, "", "123")
+
+        self.assertEqual(unit.retries, 1)
+        self.assertEqual(unit.requests, 1)
+        self.assertEqual(unit.backoff_seconds, mock_sleep.call_args.args[0])
+
+    def test_concurrent_syncs_keep_their_own_unit(self):
+        """Verify a unit active on one thread does not take the requests of another"""
+        both_active, both_done = threading.Barrier(2), threading.Barrier(2)
+        units = {}
+
+        def sync(stream):
+            gas = Mock()
+            gas.search.return_value = []
+            with INSTRUMENTATION.unit(stream, "123", "2022-01-01") as unit:
+                both_active.wait()
+                make_request(gas, "", "123")
+                make_request(gas, "", "123")
+                both_done.wait()
+            units[stream] = unit
+
+        threads = [threading.Thread(target=sync, args=(stream,)) for stream in ("stream_a", "stream_b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(units["stream_a"].requests, 2)
+        self.assertEqual(units["stream_b"].requests, 2)
+        self.assertIsNone(INSTRUMENTATION.current)
+
+    def test_requests_outside_of_a_unit_are_ignored(self):
+        gas = Mock()
+        gas.search.return_value = []
+        make_request(gas, "", "123")
+        self.assertEqual(INSTRUMENTATION.units, {})
+
+    def test_summary_file(self):
+        """Verify the summary aggregates units by stream and customer"""
+        gas = Mock()
+        gas.search.return_value = [fake_message(5)]
+        for stream, customer_id, day in [("stream_a", "1", "2022-01-01"),
+                                         ("stream_a", "2", "2022-01-01"),
+                                         ("stream_b", "1", "2022-01-01")]:
+            with INSTRUMENTATION.unit(stream, customer_id, day) as unit:
+                list(unit.iter_rows(make_request(gas, "", customer_id)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "summary.json")
+            INSTRUMENTATION.write_summary(path)
+            with open(path, encoding="utf-8") as summary_file:
+                summary = json.load(summary_file)
+
+        self.assertEqual(len(summary["units"]), 3)
+        streams = {total["stream"]: total for total in summary["streams"]}
+        customers = {total["customer_id"]: total for total in summary["customers"]}
+        self.assertEqual(streams["stream_a"]["rows"], 2)
+        self.assertEqual(streams["stream_b"]["bytes"], 5)
+        self.assertEqual(customers["1"]["units"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
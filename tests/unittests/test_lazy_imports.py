@@ -0,0 +1,26 @@
+import json
+import subprocess
+import sys
+import unittest
+
+LOADED_MODULES = ("import sys, json\n"
+                  "import tap_google_ads\n"
+                  "print(json.dumps(sorted(sys.modules)))\n")
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_importing_the_tap_does_not_load_google_ads(self):
+        """google-ads and api-core are slow to import, they should only load once we talk to the API"""
+        output = subprocess.run([sys.executable, "-c", LOADED_MODULES], check=True,
+                                stdout=subprocess.PIPE, text=True).stdout
+        modules = json.loads(output)
+
+        self.assertIn("tap_google_ads.streams", modules)
+        self.assertEqual([name for name in modules if name.startswith("google.ads")], [])
+        self.assertEqual([name for name in modules if name.startswith("google.api_core")], [])
+        self.assertEqual([name for name in modules if name.startswith("google.protobuf")], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import Mock
+from unittest.mock import patch
+from tap_google_ads.memory import create_memory_tracker
+from tap_google_ads.memory import MemoryTracker
+from tap_google_ads.memory import NullMemoryTracker
+from tap_google_ads.streams import BaseStream
+from tap_google_ads.streams import ReportStream
+from report_fixtures import RawRow
+from report_fixtures import build_resource_schema
+from report_fixtures import field
+from report_fixtures import selected_catalog_entry
+
+REPORT_FIELDS = {
+    "campaign.id": field("campaign.id", "ATTRIBUTE", {"type": ["null", "integer"]}),
+    "campaign.name": field("campaign.name", "ATTRIBUTE", {"type": ["null", "string"]}),
+    "metrics.clicks": field("metrics.clicks", "METRIC", {"type": ["null", "integer"]}),
+    "metrics.cost_micros": field("metrics.cost_micros", "METRIC", {"type": ["null", "integer"]}),
+    "segments.date": field("segments.date", "SEGMENT", {"type": ["null", "string"], "format": "date-time"}),
+}
+resource_schema = build_resource_schema(REPORT_FIELDS)
+
+
+def make_row(index, report=True):
+    row = RawRow()
+    row.campaign.id = index + 1
+    row.campaign.name = f"Campaign number {index}"
+    if not report:
+        return row
+    row.metrics.clicks = index % 97
+    row.metrics.cost_micros = index * 1000
+    row.segments.date = "2022-01-01"
+    return row
+
+
+class FakePager:
+    """A single page of `rows`, shaped like the pages of the `SearchPager` report streams read"""
+
+    def __init__(self, rows):
+        self.pages = iter([Mock(results=rows, next_page_token="")])
+
+
+class TestBoundedMemory(unittest.TestCase):
+    """The per-row pipeline must not hold on to rows, pages or Transformer state"""
+
+    def run_sync(self, stream, row_count):
+        report = isinstance(stream, ReportStream)
+
+        # Rows are generated lazily, like pages coming off the wire
+        def fake_make_request(*args, **kwargs):
+            rows = (make_row(index, report) for index in range(row_count))
+            if report:
+                return FakePager(rows)
+            return rows
+
+        config = {"start_date": "2022-01-01T00:00:00Z", "end_date": "2022-01-01T00:00:00Z"}
+        customer = {"customerId": "123", "loginCustomerId": "123"}
+        with patch("tap_google_ads.streams.make_request", side_effect=fake_make_request), \
+             open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            stream.sync(Mock(), customer, selected_catalog_entry(stream, "memory_test"), config, {}, query_limit=10 ** 9)
+
+    def peak_memory_for_sync(self, stream, row_count):
+        # Warm up first: the interpreter keeps up to a few thousand freed tuples and
+        # dicts around for reuse, and tracemalloc would count filling those as growth
+        gc.collect()
+        self.run_sync(stream, 3000)
+
+        tracemalloc.start()
+        try:
+            self.run_sync(stream, row_count)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def assert_flat(self, stream):
+        small = self.peak_memory_for_sync(stream, 300)
+        large = self.peak_memory_for_sync(stream, 3000)
+        # Ten times the rows may not cost more than a little noise on top of the small run
+        self.assertLess(large, small * 1.25, f"peak grew from {small} to {large} bytes")
+
+    def test_report_stream_memory_is_flat(self):
+        stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.assert_flat(stream)
+
+    def test_core_stream_memory_is_flat(self):
+        stream = BaseStream(["campaign.id", "campaign.name"], ["campaign"], resource_schema, ["id"])
+        self.assert_flat(stream)
+
+
+class TestMemoryTracker(unittest.TestCase):
+
+    def test_memory_tracking_is_off_by_default(self):
+        self.assertIsInstance(create_memory_tracker({}), NullMemoryTracker)
+
+    def test_units_are_reported(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "memory.json")
+            tracker = create_memory_tracker({"memory_report_path": path})
+            self.assertIsInstance(tracker, MemoryTracker)
+
+            with tracker.unit("stream_a", "123"):
+                kept = [bytes(1024) for _ in range(100)]
+                transient = [bytes(1024) for _ in range(400)]
+                del transient
+            tracker.write_report()
+
+            with open(path, encoding="utf-8") as report_file:
+                units = json.load(report_file)["units"]
+
+        self.assertEqual(len(kept), 100)
+        self.assertEqual(len(units), 1)
+        self.assertEqual(units[0]["stream"], "stream_a")
+        self.assertEqual(units[0]["customer_id"], "123")
+        self.assertGreaterEqual(units[0]["peak_kib"], 500)
+        self.assertGreaterEqual(units[0]["retained_kib"], 100)
+        self.assertLess(units[0]["retained_kib"], units[0]["peak_kib"])
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+from unittest.mock import patch
+import pytz
+from tap_google_ads.operation_budget import OperationBudget
+from tap_google_ads.operation_budget import get_daily_operation_limit
+from tap_google_ads.operation_budget import get_quota_day
+from tap_google_ads.operation_budget import plan_report_days
+from tap_google_ads.operation_budget import record_operation
+from tap_google_ads.operation_budget import spending
+from tap_google_ads.streams import BaseStream
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import search
+from tap_google_ads.sync import do_sync
+from report_fixtures import build_resource_schema
+from report_fixtures import CONFIG
+from report_fixtures import CUSTOMERS
+from report_fixtures import FakeAsyncClient
+from report_fixtures import FakeBlockingApi
+from report_fixtures import field
+from report_fixtures import patch_do_sync
+from report_fixtures import RawRow
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+from report_fixtures import selected_catalog_entry
+from report_fixtures import SYNC_NOW
+
+
+def day(number):
+    return datetime(2022, 1, number, tzinfo=pytz.UTC)
+
+
+class TestOperationBudgetConfig(unittest.TestCase):
+
+    def test_invalid_limits_fall_back_to_the_default(self):
+        self.assertEqual(get_daily_operation_limit({}), 15000)
+        self.assertEqual(get_daily_operation_limit({"daily_operation_limit": "1000"}), 1000)
+        self.assertEqual(get_daily_operation_limit({"daily_operation_limit": -5}), 15000)
+        self.assertEqual(get_daily_operation_limit({"daily_operation_limit": "lots"}), 15000)
+
+    def test_quota_days_start_at_midnight_pacific_time(self):
+        self.assertEqual(get_quota_day(datetime(2022, 1, 2, 7, 59, tzinfo=pytz.UTC)), "2022-01-01")
+        self.assertEqual(get_quota_day(datetime(2022, 1, 2, 8, 0, tzinfo=pytz.UTC)), "2022-01-02")
+
+
+class TestOperationAccounting(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "operations.db")
+
+    def test_operations_are_shared_by_every_run_of_a_token(self):
+        first, second = OperationBudget(self.path, "token", 100), OperationBudget(self.path, "token", 100)
+        first.add(30)
+        second.add(5)
+        self.assertEqual(first.used(), 30)
+        self.assertEqual(first.remaining(), 70)
+        first.close()
+        second.close()
+
+        third = OperationBudget(self.path, "token", 100)
+        other_token = OperationBudget(self.path, "other token", 100)
+        self.assertEqual(third.used(), 35)
+        self.assertEqual(other_token.used(), 0)
+        third.close()
+        other_token.close()
+
+        with sqlite3.connect(self.path) as connection:
+            self.assertNotIn("token", [token_id for token_id, in connection.execute("SELECT token_id FROM operations")])
+
+    def test_only_opening_reads_the_database(self):
+        budget = OperationBudget(self.path, "token", 3)
+        with patch.object(budget, "connection") as connection:
+            for _ in range(3):
+                self.assertFalse(budget.exhausted())
+                budget.add(1)
+            self.assertTrue(budget.exhausted())
+
+        connection.execute.assert_not_called()
+        budget.close()
+
+    def test_only_first_pages_are_operations(self):
+        gas = Mock()
+        budget = OperationBudget(self.path, "token", 100)
+        with spending(budget):
+            search(gas, "SELECT campaign.id FROM campaign", "123", {})
+            search(gas, "SELECT campaign.id FROM campaign", "123", {}, page_token="next")
+        search(gas, "SELECT campaign.id FROM campaign", "123", {})
+
+        self.assertEqual(gas.search.call_count, 3)
+        self.assertEqual(budget.used(), 1)
+        budget.close()
+
+
+class TestPlanReportDays(unittest.TestCase):
+
+    def test_everything_fits(self):
+        date_ranges = {"caught up": (day(8), day(10), day(9)), "backfill": (day(1), day(10), None)}
+
+        plan = plan_report_days(date_ranges, 13)
+
+        self.assertEqual(plan, {"caught up": (day(8), day(10)), "backfill": (day(1), day(10))})
+
+    def test_refresh_days_are_dropped_oldest_first(self):
+        # Days up to the bookmark are re-queried for late metrics, the ones after it are new
+        plan = plan_report_days({"stream": (day(20), day(24), day(23))}, 3)
+
+        self.assertEqual(plan["stream"], (day(22), day(24)))
+
+    def test_backfills_get_what_is_left_of_the_recent_days(self):
+        date_ranges = {"caught up": (day(20), day(24), day(20)), "backfill": (day(1), day(24), None)}
+
+        plan = plan_report_days(date_ranges, 8)
+
+        self.assertEqual(plan["caught up"], (day(20), day(24)))
+        # A backfill's new days can only be synced from its bookmark on
+        self.assertEqual(plan["backfill"], (day(1), day(3)))
+
+    def test_nothing_fits(self):
+        plan = plan_report_days({"stream": (day(1), day(3), None)}, -2)
+
+        first_day, last_day = plan["stream"]
+        self.assertEqual(first_day, day(1))
+        self.assertLess(last_day, first_day)
+
+
+class SpendingBlockingApi(FakeBlockingApi):
+    """Counts an operation for every request that is not for a next page, like `search`"""
+
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        if not page_token:
+            record_operation()
+        return super().make_request(gas, query, customer_id, config, page_token)
+
+
+AD_GROUPS = 5
+AD_GROUP_FIELDS = {"ad_group.id": field("ad_group.id", "ATTRIBUTE", {"type": ["null", "integer"]})}
+ad_group_schema = build_resource_schema(AD_GROUP_FIELDS, "ad_group")
+
+
+class PagedCoreApi(SpendingBlockingApi):
+    """Also serves `AD_GROUPS` ad groups, a core stream queried `query_limit` at a time"""
+
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        if "FROM ad_group " not in query:
+            return super().make_request(gas, query, customer_id, config, page_token)
+        record_operation()
+        after = re.search(r"ad_group.id > (\d+)", query)
+        first_id = int(after.group(1)) + 1 if after else 1
+        last_id = min(first_id + int(re.search(r"LIMIT (\d+)", query).group(1)) - 1, AD_GROUPS)
+        rows = []
+        for ad_group_id in range(first_id, last_id + 1):
+            row = RawRow()
+            row.ad_group.id = ad_group_id
+            rows.append(row)
+        return rows
+
+
+class TestPlannedSync(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog = {"streams": [selected_catalog_entry(self.stream, "campaign_performance_report")]}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_sync(self, config, state, client, make_request=None):
+        with patch_do_sync({"campaign_performance_report": self.stream}, [],
+                           make_request or SpendingBlockingApi().make_request, client):
+            do_sync(config, self.catalog, resource_schema, state)
+
+    def test_a_sync_stays_within_the_limit(self):
+        for sync_engine in ("blocking", "async"):
+            with self.subTest(sync_engine=sync_engine):
+                path = os.path.join(self.directory, f"{sync_engine}.db")
+                config = dict(CONFIG, sync_engine=sync_engine, operation_budget_path=path, daily_operation_limit=4)
+                state = {}
+                self.run_sync(config, state, FakeAsyncClient())
+
+                # Two customers with three new days each, and four operations to spend
+                bookmarks = state["bookmarks"]["campaign_performance_report"]
+                self.assertEqual(bookmarks["1000000001"]["date"], "2022-01-03T00:00:00.000000Z")
+                self.assertEqual(bookmarks["1000000002"]["date"], "2022-01-01T00:00:00.000000Z")
+                with patch("singer.utils.now", return_value=SYNC_NOW):
+                    budget = OperationBudget(path, "token", 4)
+                self.assertEqual(budget.used(), 4)
+                budget.close()
+
+                # The next run on the same day has nothing left to spend
+                client = FakeAsyncClient()
+                self.run_sync(config, state, client)
+                self.assertEqual(bookmarks["1000000002"]["date"], "2022-01-01T00:00:00.000000Z")
+                self.assertEqual(client.requests, [])
+
+    def test_paged_core_streams_can_spend_more_than_planned(self):
+        path = os.path.join(self.directory, "operations.db")
+        config = dict(CONFIG, login_customer_ids=CUSTOMERS[:1], query_limit=2, operation_budget_path=path,
+                      daily_operation_limit=5)
+        core_stream = BaseStream([], ["ad_group"], ad_group_schema, ["id"], filter_param="ad_group.id")
+        catalog = {"streams": [selected_catalog_entry(core_stream, "ad_groups")] + self.catalog["streams"]}
+        state = {}
+
+        with patch_do_sync({"campaign_performance_report": self.stream}, [], PagedCoreApi().make_request,
+                           core_streams={"ad_groups": core_stream}):
+            do_sync(config, catalog, resource_schema, state)
+
+        # One operation and three report days were planned, the ad groups took three queries
+        bookmark = state["bookmarks"]["campaign_performance_report"][CUSTOMERS[0]["customerId"]]
+        self.assertEqual(bookmark["date"], "2022-01-02T00:00:00.000000Z")
+        with patch("singer.utils.now", return_value=SYNC_NOW):
+            budget = OperationBudget(path, "token", 5)
+        self.assertEqual(budget.used(), 5)
+        budget.close()
+
+    def test_a_failed_sync_records_its_operations(self):
+        path = os.path.join(self.directory, "operations.db")
+        config = dict(CONFIG, operation_budget_path=path)
+        api = SpendingBlockingApi()
+
+        def fail_on_the_second_day(gas, query, customer_id, config, page_token=None):
+            response = api.make_request(gas, query, customer_id, config, page_token)
+            if "2022-01-02" in query:
+                raise RuntimeError("RESOURCE_EXHAUSTED")
+            return response
+
+        with self.assertRaises(RuntimeError):
+            self.run_sync(config, {}, FakeAsyncClient(), make_request=fail_on_the_second_day)
+
+        with patch("singer.utils.now", return_value=SYNC_NOW):
+            budget = OperationBudget(path, "token", 4)
+        self.assertEqual(budget.used(), 2)
+        budget.close()
+
+    def test_deferred_days_keep_their_digests(self):
+        for sync_engine in ("blocking", "async"):
+            with self.subTest(sync_engine=sync_engine):
+                digest_path = os.path.join(self.directory, f"{sync_engine}-digests.db")
+                config = dict(CONFIG, sync_engine=sync_engine, conversion_window=2, report_digest_path=digest_path)
+                state = {}
+                self.run_sync(config, state, FakeAsyncClient())
+
+                # Both customers' new day and latest refresh day fit, the oldest refresh days are left for later
+                config = dict(config, operation_budget_path=os.path.join(self.directory, f"{sync_engine}.db"),
+                              daily_operation_limit=4)
+                self.run_sync(config, state, FakeAsyncClient())
+
+                with sqlite3.connect(digest_path) as connection:
+                    days = [day for day, in connection.execute(
+                        "SELECT DISTINCT day FROM report_digests ORDER BY day")]
+                self.assertEqual(days, ["2022-01-01", "2022-01-02", "2022-01-03"])
+
+
+if __name__ == '__main__':
+    unittest.main()
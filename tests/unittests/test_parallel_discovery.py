@@ -0,0 +1,72 @@
+import io
+import multiprocessing
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from tap_google_ads import discover
+from tap_google_ads.streams import BaseStream
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import StreamSpec
+
+
+def field(name, category, json_schema, incompatible_fields=()):
+    return {
+        "field_details": {"name": name, "category": category, "json_schema": json_schema, "selectable": True},
+        "incompatible_fields": list(incompatible_fields),
+    }
+
+
+FIELDS = {
+    "campaign.id": field("campaign.id", "ATTRIBUTE", {"type": ["null", "integer"]}),
+    "campaign.name": field("campaign.name", "ATTRIBUTE", {"type": ["null", "string"]}),
+    "metrics.clicks": field("metrics.clicks", "METRIC", {"type": ["null", "integer"]},
+                            ["segments.z", "segments.a", "segments.m"]),
+    "segments.date": field("segments.date", "SEGMENT", {"type": ["null", "string"], "format": "date-time"}),
+}
+resource_schema = {
+    "campaign": {"name": "campaign", "fields": FIELDS},
+    **{name: {"name": name, "json_schema": value["field_details"]["json_schema"]} for name, value in FIELDS.items()},
+}
+stream_specs = {
+    "campaigns": StreamSpec(BaseStream, [], ["campaign"], ["id"], filter_param="campaign.id"),
+    "campaign_report": StreamSpec(ReportStream, list(FIELDS), ["campaign"], ["_sdc_record_hash"], {"campaign_id"}),
+    "campaign_clicks": StreamSpec(ReportStream, ["campaign.id", "metrics.clicks", "segments.date"], ["campaign"],
+                                  ["_sdc_record_hash"]),
+}
+
+
+def discover_catalog(**kwargs):
+    out = io.StringIO()
+    with patch.object(discover, "get_stream_specs", return_value=stream_specs), redirect_stdout(out):
+        discover.do_discover(resource_schema, **kwargs)
+    return out.getvalue()
+
+
+class TestParallelDiscovery(unittest.TestCase):
+
+    def test_parallel_catalog_is_byte_identical(self):
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                serial = discover_catalog(compact=compact)
+                self.assertEqual(discover_catalog(compact=compact, processes=2), serial)
+                self.assertEqual(discover_catalog(compact=compact, processes=3), serial)
+
+    def test_workers_are_sent_their_stream_specs(self):
+        # Spawned workers import the module afresh, so they only see specs they are sent
+        with patch.object(discover, "get_discovery_mp_context", return_value=multiprocessing.get_context("spawn")):
+            self.assertEqual(discover_catalog(processes=2), discover_catalog())
+
+    def test_field_exclusions_keep_their_order(self):
+        stream = stream_specs["campaign_report"].build(resource_schema)
+        exclusions = stream.stream_metadata[("properties", "clicks")]["fieldExclusions"]
+        self.assertEqual(exclusions, ["z", "a", "m"])
+
+    def test_get_discovery_processes(self):
+        self.assertEqual(discover.get_discovery_processes({}), 1)
+        self.assertEqual(discover.get_discovery_processes({"discovery_processes": "4"}), 4)
+        self.assertEqual(discover.get_discovery_processes({"discovery_processes": "many"}), 1)
+        self.assertEqual(discover.get_discovery_processes({"discovery_processes": -2}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import glob
+import os
+import tempfile
+import unittest
+from contextlib import nullcontext
+from datetime import datetime
+from unittest.mock import patch
+import pyarrow
+import pyarrow.parquet
+import pytz
+from report_fixtures import CONFIG
+from report_fixtures import CUSTOMERS
+from report_fixtures import DAYS
+from report_fixtures import FakeAsyncClient
+from report_fixtures import json_copy
+from report_fixtures import patch_do_sync
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+from report_fixtures import ROWS_PER_DAY
+from report_fixtures import selected_catalog_entry
+from tap_google_ads.report_output import SingerOutput
+from tap_google_ads.report_output import create_report_output
+from tap_google_ads.report_output import get_arrow_type
+from tap_google_ads.report_output import get_output_format
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import create_report_query
+from tap_google_ads.streams import get_selected_fields
+from tap_google_ads.streams import hash_query
+from tap_google_ads.sync import do_sync
+
+STREAM = "campaign_performance_report"
+ENGINES = ("blocking", "async")
+
+
+def read_partition(directory):
+    """The rows of every part file of a partition"""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.parquet"))):
+        rows.extend(pyarrow.parquet.read_table(path).to_pylist())
+    return rows
+
+
+class TestParquetOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog = {"streams": [selected_catalog_entry(self.stream, STREAM)]}
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.parquet_path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def partition(self, customer_id, day):
+        return os.path.join(self.parquet_path, STREAM, f"customer_id={customer_id}", f"date={day}")
+
+    def run_sync(self, engine, state, client=None, on_state=None):
+        """Return the messages written to stdout"""
+        messages = []
+        config = dict(CONFIG, sync_engine=engine, output_format="parquet", parquet_path=self.parquet_path)
+        with patch_do_sync({STREAM: self.stream}, messages, client=client), \
+             patch("singer.write_state", side_effect=on_state) if on_state else nullcontext():
+            do_sync(config, self.catalog, resource_schema, state)
+        return messages
+
+    def test_partitions_and_types(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                messages = self.run_sync(engine, {})
+
+                self.assertEqual([kind for kind, _ in messages if kind != "state"], [])
+                for customer in CUSTOMERS:
+                    for day in DAYS:
+                        rows = read_partition(self.partition(customer["customerId"], day))
+                        self.assertEqual(sorted(row["clicks"] for row in rows), list(range(ROWS_PER_DAY)))
+                        self.assertEqual({row["date"] for row in rows},
+                                         {datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=pytz.UTC)})
+
+                path = glob.glob(os.path.join(self.partition(CUSTOMERS[0]["customerId"], DAYS[0]), "*.parquet"))[0]
+                schema = pyarrow.parquet.read_schema(path)
+                self.assertEqual(schema.field("campaign_id").type, pyarrow.int64())
+                self.assertEqual(schema.field("clicks").type, pyarrow.int64())
+                self.assertEqual(schema.field("date").type, pyarrow.timestamp("us", tz="UTC"))
+                self.assertEqual(schema.field("_sdc_record_hash").type, pyarrow.string())
+
+    def test_decimals_keep_every_digit(self):
+        arrow_type, to_array = get_arrow_type({"type": ["null", "string"], "format": "singer.decimal"})
+
+        self.assertEqual(arrow_type, pyarrow.string())
+        self.assertEqual(to_array(["18446744073709551615", "0.123456789012345678", None]).to_pylist(),
+                         ["18446744073709551615", "0.123456789012345678", None])
+
+    def test_state_is_written_after_the_files(self):
+        def check_files(state):
+            for customer_id, bookmark in state.get("bookmarks", {}).get(STREAM, {}).items():
+                for day in DAYS:
+                    rows = len(read_partition(self.partition(customer_id, day)))
+                    if "date" in bookmark and day <= bookmark["date"][:10]:
+                        self.assertEqual(rows, ROWS_PER_DAY)
+                    if "page_token" in bookmark and day == bookmark["page_date"][:10]:
+                        self.assertGreaterEqual(rows, int(bookmark["page_token"]))
+
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.run_sync(engine, {}, on_state=check_files)
+
+    def test_resumed_day_does_not_duplicate_the_page_in_flight(self):
+        query = create_report_query("campaign", get_selected_fields(self.catalog["streams"][0]["metadata"]),
+                                    datetime(2022, 1, 1, tzinfo=pytz.UTC))
+        bookmark = {"date": "2022-01-01T00:00:00.000000Z", "page_date": "2022-01-01T00:00:00.000000Z",
+                    "page_query": hash_query(query), "page_token": "2"}
+        state = {"bookmarks": {STREAM: {CUSTOMERS[0]["customerId"]: bookmark}}}
+        partition = self.partition(CUSTOMERS[0]["customerId"], DAYS[0])
+
+        for engine in ENGINES:
+            for rejected_token in (None, "2"):
+                with self.subTest(engine=engine, rejected_token=rejected_token):
+                    # A full sync, then one resumed from the checkpoint of the second page
+                    self.run_sync(engine, {})
+                    self.run_sync(engine, json_copy(state), client=FakeAsyncClient(rejected_token=rejected_token))
+
+                    rows = read_partition(partition)
+                    self.assertEqual(sorted(row["clicks"] for row in rows), list(range(ROWS_PER_DAY)))
+
+    def test_day_synced_again_replaces_its_partition(self):
+        partition = self.partition(CUSTOMERS[0]["customerId"], DAYS[1])
+        os.makedirs(partition)
+        stale_path = os.path.join(partition, "part-stale.parquet")
+        pyarrow.parquet.write_table(pyarrow.table({"clicks": [100]}), stale_path)
+
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.run_sync(engine, {})
+
+                self.assertFalse(os.path.exists(stale_path))
+                self.assertEqual(len(read_partition(partition)), ROWS_PER_DAY)
+
+
+class TestOutputConfig(unittest.TestCase):
+
+    def test_output_format(self):
+        self.assertEqual(get_output_format({}), "singer")
+        self.assertEqual(get_output_format({"output_format": "parquet", "parquet_path": "out"}), "parquet")
+        self.assertIsInstance(create_report_output({}), SingerOutput)
+
+    def test_invalid_output_format(self):
+        for config in ({"output_format": "csv"},
+                       {"output_format": "parquet"},
+                       {"output_format": "parquet", "parquet_path": "out", "report_digest_path": "digests.db"}):
+            with self.subTest(config=config), self.assertRaises(RuntimeError):
+                get_output_format(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
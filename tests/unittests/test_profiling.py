@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from tap_google_ads.messages import message_sink
+from tap_google_ads.messages import write_record
+from tap_google_ads.profiling import create_profiler
+from tap_google_ads.profiling import NullProfiler
+from tap_google_ads.profiling import SyncProfiler
+from tap_google_ads.streams import generate_hash
+from singer import metadata
+
+
+test_metadata = metadata.to_list({
+    ('properties', 'id'): {'behavior': 'ATTRIBUTE'},
+    ('properties', 'clicks'): {'behavior': 'METRIC'},
+})
+
+
+def leaf(n):
+    return sum(range(n))
+
+
+def middle():
+    return leaf(20000) + leaf(10000)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_profiling_is_off_by_default(self):
+        self.assertIsInstance(create_profiler({}), NullProfiler)
+
+    def test_profiles_are_written_per_unit_and_merged(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            profiler = create_profiler({"profile_dir": profile_dir})
+            self.assertIsInstance(profiler, SyncProfiler)
+
+            with profiler.unit("stream_a__123"):
+                for _ in range(50):
+                    middle()
+            with profiler.unit("stream_b__123"):
+                for i in range(200):
+                    generate_hash({"id": i, "clicks": 1}, test_metadata)
+            profiler.write_reports()
+
+            files = set(os.listdir(profile_dir))
+            self.assertTrue({"stream_a__123.prof", "stream_b__123.prof", "merged.prof",
+                             "merged.folded", "hot_functions.json"}.issubset(files))
+
+            with open(os.path.join(profile_dir, "merged.folded"), encoding="utf-8") as folded_file:
+                folded = folded_file.read().splitlines()
+            with open(os.path.join(profile_dir, "hot_functions.json"), encoding="utf-8") as hot_file:
+                hot_functions = json.load(hot_file)
+
+        # Every folded line is "frame;frame;frame <integer microseconds>"
+        for line in folded:
+            stack, weight = line.rsplit(" ", 1)
+            self.assertTrue(stack)
+            self.assertGreater(int(weight), 0)
+        self.assertTrue(any("(middle);" in line and "(leaf)" in line for line in folded))
+
+        self.assertEqual(hot_functions["generate_hash"]["calls"], 200)
+        self.assertGreater(hot_functions["generate_hash"]["seconds"], 0)
+        self.assertEqual(hot_functions["write_record"]["calls"], 0)
+
+    def test_records_written_to_a_sink_are_timed(self):
+        sink = Mock()
+        with tempfile.TemporaryDirectory() as profile_dir:
+            profiler = create_profiler({"profile_dir": profile_dir})
+            with profiler.unit("stream_a__123"), message_sink(sink):
+                for i in range(10):
+                    write_record("stream_a", {"id": i})
+            profiler.write_reports()
+
+            with open(os.path.join(profile_dir, "hot_functions.json"), encoding="utf-8") as hot_file:
+                hot_functions = json.load(hot_file)
+
+        self.assertEqual(sink.write_message.call_count, 10)
+        self.assertEqual(hot_functions["write_record"]["calls"], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
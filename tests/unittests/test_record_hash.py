@@ -0,0 +1,92 @@
+import hashlib
+import json
+import unittest
+from singer import metadata
+from tap_google_ads.record_hash import HASH_VERSION_KEY
+from tap_google_ads.record_hash import RecordHasher
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import generate_hash
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+
+RECORD = {
+    'id': 1234567890,
+    'currency_code': 'USD',
+    'time_zone': 'Europe/Zürich',
+    'auto_tagging_enabled': False,
+    'manager': None,
+    'status': {'reason': 'ok', 'code': 3},
+    'date': '2022-01-19T00:00:00.000000Z',
+    'impressions': 10,
+    'ctr': '0.1',
+}
+
+
+def build_metadata(hash_version=None):
+    mdata = {
+        ('properties', 'id'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'currency_code'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'time_zone'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'auto_tagging_enabled'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'manager'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'status'): {'behavior': 'ATTRIBUTE'},
+        ('properties', 'date'): {'behavior': 'SEGMENT'},
+        ('properties', 'impressions'): {'behavior': 'METRIC'},
+        ('properties', 'ctr'): {'behavior': 'METRIC'},
+        ('properties', '_sdc_record_hash'): {'behavior': 'PRIMARY KEY'},
+    }
+    if hash_version is not None:
+        mdata[()] = {HASH_VERSION_KEY: hash_version}
+    return metadata.to_list(mdata)
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TestRecordHash(unittest.TestCase):
+
+    def test_version_1_is_the_default_and_unchanged(self):
+        expected = sha256(json.dumps(sorted(
+            (key, value) for key, value in RECORD.items() if key not in {'impressions', 'ctr'})))
+
+        self.assertEqual(RecordHasher(build_metadata()).version, 1)
+        self.assertEqual(generate_hash(RECORD, build_metadata()), expected)
+        self.assertEqual(generate_hash(RECORD, build_metadata(1)), expected)
+
+    def test_version_2_hashes_compact_sorted_json_of_the_values(self):
+        expected = sha256(json.dumps(
+            {key: value for key, value in RECORD.items() if key not in {'impressions', 'ctr'} and value is not None},
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False))
+
+        self.assertEqual(generate_hash(RECORD, build_metadata(2)), expected)
+        self.assertEqual(expected, sha256('{"auto_tagging_enabled":false,"currency_code":"USD",'
+                                          '"date":"2022-01-19T00:00:00.000000Z","id":1234567890,'
+                                          '"status":{"code":3,"reason":"ok"},"time_zone":"Europe/Zürich"}'))
+
+    def test_version_2_ignores_metrics_nulls_and_order(self):
+        hasher = RecordHasher(build_metadata(2))
+        record_hash = hasher.hash(RECORD)
+
+        without_nulls = {key: value for key, value in RECORD.items() if value is not None}
+        reordered = dict(reversed(list(RECORD.items())), impressions=0)
+        self.assertEqual(hasher.hash(without_nulls), record_hash)
+        self.assertEqual(hasher.hash(reordered), record_hash)
+        self.assertNotEqual(hasher.hash(dict(RECORD, id=1)), record_hash)
+        self.assertNotEqual(hasher.hash(dict(RECORD, id="1234567890")), record_hash)
+        self.assertNotEqual(generate_hash(RECORD, build_metadata(1)), record_hash)
+
+    def test_invalid_hash_version(self):
+        with self.assertRaises(RuntimeError):
+            RecordHasher(build_metadata(3))
+        with self.assertRaises(RuntimeError):
+            RecordHasher(build_metadata("2"))
+
+    def test_discovery_records_the_default_version(self):
+        stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+
+        self.assertEqual(stream.stream_metadata[()][HASH_VERSION_KEY], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+import pytz
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v20.errors.types.errors import ErrorCode
+from google.ads.googleads.v20.errors.types.errors import GoogleAdsError
+from google.ads.googleads.v20.errors.types.errors import GoogleAdsFailure
+from google.ads.googleads.v20.errors.types.request_error import RequestErrorEnum
+from tap_google_ads.state_merge import merge_bookmarks
+from tap_google_ads.streams import ReportStream
+from tap_google_ads.streams import create_report_query
+from report_fixtures import patch_report_api
+from report_fixtures import RawRow
+from report_fixtures import REPORT_FIELDS
+from report_fixtures import resource_schema
+from report_fixtures import selected_catalog_entry
+
+PAGE_SIZE = 3
+ROWS_PER_DAY = 10
+CONFIG = {"start_date": "2022-01-01T00:00:00Z", "end_date": "2022-01-02T00:00:00Z", "conversion_window": 1}
+CUSTOMER = {"customerId": "123", "loginCustomerId": "123"}
+
+
+def make_row(index):
+    row = RawRow()
+    row.campaign.id = index + 1
+    row.metrics.clicks = index
+    row.segments.date = "2022-01-01"
+    return row
+
+
+class Page:
+    def __init__(self, results, next_page_token):
+        self.results = results
+        self.next_page_token = next_page_token
+
+
+class Crash(Exception):
+    pass
+
+
+def page_token_error(request_error):
+    failure = GoogleAdsFailure(errors=[GoogleAdsError(error_code=ErrorCode(request_error=request_error))])
+    return GoogleAdsException(None, None, failure, "request-id")
+
+
+class FakeReportApi:
+    """Serves ROWS_PER_DAY rows a day in pages of PAGE_SIZE, optionally failing part way"""
+
+    def __init__(self, crash_at_offset=None, rejected_token=None):
+        self.crash_at_offset = crash_at_offset
+        self.rejected_token = rejected_token
+        self.page_tokens = []
+
+    def pages(self, offset):
+        while True:
+            if offset == self.crash_at_offset:
+                raise Crash()
+            end = min(offset + PAGE_SIZE, ROWS_PER_DAY)
+            yield Page([make_row(index) for index in range(offset, end)], str(end) if end < ROWS_PER_DAY else "")
+            if end == ROWS_PER_DAY:
+                return
+            offset = end
+
+    def make_request(self, gas, query, customer_id, config, page_token=None):
+        self.page_tokens.append(page_token)
+        if page_token and page_token == self.rejected_token:
+            raise page_token_error(RequestErrorEnum.RequestError.EXPIRED_PAGE_TOKEN)
+        return Mock(pages=self.pages(int(page_token or 0)))
+
+
+class TestReportCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = ReportStream(list(REPORT_FIELDS), ["campaign"], resource_schema, ["_sdc_record_hash"])
+        self.catalog_entry = selected_catalog_entry(self.stream, "campaign_report")
+
+    def run_sync(self, api, state):
+        messages = []
+        with patch_report_api(messages, api.make_request, now=datetime(2022, 1, 2, tzinfo=pytz.UTC)):
+            try:
+                self.stream.sync(Mock(), CUSTOMER, self.catalog_entry, CONFIG, state, query_limit=None)
+            except Crash:
+                pass
+        return [record for kind, record in messages if kind == "record"]
+
+    def bookmark(self, state):
+        return state["bookmarks"]["campaign_report"]["123"]
+
+    def test_checkpoint_is_written_after_each_page(self):
+        state = {}
+        self.run_sync(FakeReportApi(crash_at_offset=6), state)
+
+        bookmark = self.bookmark(state)
+        self.assertEqual(bookmark["page_date"], "2022-01-01T00:00:00.000000Z")
+        self.assertEqual(bookmark["page_token"], "6")
+        self.assertNotIn("date", bookmark)
+
+    def test_interrupted_day_resumes_with_the_same_output(self):
+        uninterrupted = self.run_sync(FakeReportApi(), {})
+
+        state = {}
+        interrupted = self.run_sync(FakeReportApi(crash_at_offset=6), state)
+        api = FakeReportApi()
+        resumed = self.run_sync(api, state)
+
+        self.assertEqual(api.page_tokens, ["6", None])
+        self.assertEqual(interrupted + resumed, uninterrupted)
+        self.assertEqual(self.bookmark(state), {"date": "2022-01-02T00:00:00.000000Z"})
+
+    def test_completed_day_drops_the_checkpoint(self):
+        state = {}
+        self.run_sync(FakeReportApi(), state)
+        self.assertEqual(self.bookmark(state), {"date": "2022-01-02T00:00:00.000000Z"})
+
+    def test_rejected_page_token_requests_the_whole_day(self):
+        state = {}
+        self.run_sync(FakeReportApi(crash_at_offset=6), state)
+        api = FakeReportApi(rejected_token="6")
+        resumed = self.run_sync(api, state)
+
+        self.assertEqual(api.page_tokens, ["6", None, None])
+        self.assertEqual(len(resumed), 2 * ROWS_PER_DAY)
+
+    def test_checkpoint_of_another_query_is_ignored(self):
+        state = {}
+        self.run_sync(FakeReportApi(crash_at_offset=6), state)
+        self.bookmark(state)["page_query"] = "a different query"
+        api = FakeReportApi()
+        self.run_sync(api, state)
+
+        self.assertEqual(api.page_tokens, [None, None])
+
+    def test_report_query_does_not_depend_on_set_order(self):
+        fields = ["metrics.clicks", "campaign.id", "segments.date"]
+        query_date = datetime(2022, 1, 1, tzinfo=pytz.UTC)
+        self.assertIn("SELECT campaign.id,metrics.clicks,segments.date FROM campaign",
+                      create_report_query("campaign", set(fields), query_date))
+
+    def test_merge_prefers_the_most_progress(self):
+        complete = {"date": "2022-01-01T00:00:00.000000Z"}
+        checkpoint = {"date": "2022-01-01T00:00:00.000000Z", "page_date": "2022-01-02T00:00:00.000000Z",
+                      "page_query": "q", "page_token": "6"}
+        next_day_complete = {"date": "2022-01-02T00:00:00.000000Z"}
+
+        self.assertEqual(merge_bookmarks(complete, checkpoint), checkpoint)
+        self.assertEqual(merge_bookmarks(checkpoint, complete), checkpoint)
+        self.assertEqual(merge_bookmarks(checkpoint, next_day_complete), next_day_complete)
+        self.assertEqual(merge_bookmarks({"page_date": "2022-01-01T00:00:00.000000Z", "page_token": "3"}, complete),
+                         complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import Mock
+from unittest.mock import patch
+from tap_google_ads.sync import do_sync
+from tap_google_ads.sync import get_shard
+from tap_google_ads.sync import shard_customers
+from tap_google_ads.sync import sort_customers
+
+
+def make_customers(count):
+    return [{"customerId": str(1000000000 + index), "loginCustomerId": "1"} for index in range(count)]
+
+
+CATALOG = {
+    "streams": [
+        {
+            "tap_stream_id": "campaigns",
+            "stream": "campaigns",
+            "schema": {},
+            "metadata": [{"breadcrumb": [], "metadata": {"selected": True}}],
+        }
+    ]
+}
+
+
+class TestGetShard(unittest.TestCase):
+
+    def test_defaults_to_a_single_shard(self):
+        self.assertEqual(get_shard({}), (0, 1))
+
+    def test_strings_are_accepted(self):
+        self.assertEqual(get_shard({"shard_index": "2", "shard_count": "4"}), (2, 4))
+
+    def test_invalid_values_raise(self):
+        for config in ({"shard_index": 4, "shard_count": 4},
+                       {"shard_index": -1, "shard_count": 4},
+                       {"shard_index": 0, "shard_count": -2},
+                       {"shard_index": "one", "shard_count": 4}):
+            with self.subTest(config=config):
+                with self.assertRaises(RuntimeError):
+                    get_shard(config)
+
+
+class TestShardCustomers(unittest.TestCase):
+
+    def test_shards_split_the_customers(self):
+        customers = sort_customers(make_customers(50))
+        shards = [shard_customers(customers, index, 4) for index in range(4)]
+
+        self.assertEqual(sorted(customer["customerId"] for shard in shards for customer in shard),
+                         [customer["customerId"] for customer in customers])
+        for shard in shards:
+            self.assertEqual(shard, sort_customers(shard))
+            self.assertGreater(len(shard), 0)
+
+    def test_customers_keep_their_shard_when_the_list_changes(self):
+        customers = make_customers(50)
+        before = shard_customers(customers, 1, 3)
+        after = shard_customers(customers[10:] + make_customers(80)[50:], 1, 3)
+
+        self.assertEqual([customer for customer in after if customer in customers[10:]],
+                         [customer for customer in before if customer in customers[10:]])
+
+
+class TestShardedSync(unittest.TestCase):
+
+    def run_sync(self, config, state):
+        stream = Mock()
+        with patch("tap_google_ads.sync.create_sdk_client"), \
+             patch("tap_google_ads.sync.initialize_core_streams", return_value={"campaigns": stream}), \
+             patch("tap_google_ads.sync.initialize_reports", return_value={}), \
+             patch("singer.write_state"):
+            do_sync(config, CATALOG, {}, state)
+        return [call.args[1]["customerId"] for call in stream.sync.call_args_list]
+
+    def test_only_the_shard_customers_are_synced(self):
+        customers = make_customers(20)
+        config = {"login_customer_ids": customers, "shard_index": 1, "shard_count": 3}
+
+        synced = self.run_sync(config, {})
+
+        self.assertEqual(synced, [customer["customerId"] for customer in shard_customers(customers, 1, 3)])
+
+    def test_shard_resumes_from_currently_syncing(self):
+        customers = make_customers(20)
+        config = {"login_customer_ids": customers, "shard_index": 0, "shard_count": 2}
+        shard = [customer["customerId"] for customer in shard_customers(customers, 0, 2)]
+
+        synced = self.run_sync(config, {"currently_syncing": ["campaigns", shard[3]]})
+
+        self.assertEqual(synced, shard[3:] + shard[:3])
+
+    def test_currently_syncing_from_another_shard_keeps_the_order(self):
+        customers = make_customers(20)
+        config = {"login_customer_ids": customers, "shard_index": 0, "shard_count": 2}
+        shard = [customer["customerId"] for customer in shard_customers(customers, 0, 2)]
+        other_shard = [customer["customerId"] for customer in shard_customers(customers, 1, 2)]
+
+        synced = self.run_sync(config, {"currently_syncing": ["campaigns", other_shard[0]]})
+
+        self.assertEqual(sorted(synced), shard)
+        self.assertNotIn(other_shard[0], synced)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+import tap_google_ads
+from tap_google_ads.state_merge import merge_states
+
+
+SHARD_0 = {
+    "currently_syncing": ["campaign_performance_report", "2000000001"],
+    "bookmarks": {
+        "campaign_performance_report": {
+            "1000000001": {"date": "2022-03-05T00:00:00.000000Z"},
+            "2000000001": {"date": "2022-03-02T00:00:00.000000Z"},
+        },
+        "ad_group_criterion": {"2000000001": {"last_pk_fetched": 900}},
+    },
+}
+SHARD_1 = {
+    "currently_syncing": ["ad_group_performance_report", "1000000002"],
+    "bookmarks": {
+        "campaign_performance_report": {
+            "1000000002": {"date": "2022-03-04T00:00:00.000000Z"},
+            "2000000001": {"date": "2022-03-03T00:00:00.000000Z"},
+        },
+        "ad_group_criterion": {"2000000001": {"last_pk_fetched": 120}},
+        "ad_group_performance_report": {"1000000002": {"date": "2022-03-01T00:00:00.000000Z"}},
+    },
+}
+
+
+class TestMergeStates(unittest.TestCase):
+
+    def test_disjoint_customers_are_combined(self):
+        merged = merge_states([SHARD_0, SHARD_1])
+
+        self.assertEqual(merged["bookmarks"]["campaign_performance_report"]["1000000001"],
+                         {"date": "2022-03-05T00:00:00.000000Z"})
+        self.assertEqual(merged["bookmarks"]["campaign_performance_report"]["1000000002"],
+                         {"date": "2022-03-04T00:00:00.000000Z"})
+        self.assertEqual(merged["bookmarks"]["ad_group_performance_report"],
+                         SHARD_1["bookmarks"]["ad_group_performance_report"])
+
+    def test_most_advanced_date_wins(self):
+        for states in ([SHARD_0, SHARD_1], [SHARD_1, SHARD_0]):
+            merged = merge_states(states)
+            self.assertEqual(merged["bookmarks"]["campaign_performance_report"]["2000000001"],
+                             {"date": "2022-03-03T00:00:00.000000Z"})
+
+    def test_lowest_last_pk_fetched_wins(self):
+        for states in ([SHARD_0, SHARD_1], [SHARD_1, SHARD_0]):
+            merged = merge_states(states)
+            self.assertEqual(merged["bookmarks"]["ad_group_criterion"]["2000000001"], {"last_pk_fetched": 120})
+
+    def test_earliest_currently_syncing_wins(self):
+        self.assertEqual(merge_states([SHARD_0, SHARD_1])["currently_syncing"],
+                         ["ad_group_performance_report", "1000000002"])
+        self.assertEqual(merge_states([SHARD_0, {"bookmarks": {}}])["currently_syncing"], SHARD_0["currently_syncing"])
+        self.assertNotIn("currently_syncing", merge_states([{"currently_syncing": None}, {}]))
+
+    def test_inputs_are_not_modified(self):
+        before = json.dumps([SHARD_0, SHARD_1], sort_keys=True)
+        merge_states([SHARD_0, SHARD_1])
+        self.assertEqual(json.dumps([SHARD_0, SHARD_1], sort_keys=True), before)
+
+
+class TestMergeStateCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.paths = []
+        for index, state in enumerate((SHARD_0, SHARD_1)):
+            path = os.path.join(self.directory, f"state-{index}.json")
+            with open(path, "w", encoding="utf-8") as state_file:
+                json.dump(state, state_file)
+            self.paths.append(path)
+
+    def test_merged_state_goes_to_stdout(self):
+        out = io.StringIO()
+        with patch("sys.argv", ["tap-google-ads", "merge-state", *self.paths]), redirect_stdout(out):
+            tap_google_ads.main()
+
+        self.assertEqual(json.loads(out.getvalue()), merge_states([SHARD_0, SHARD_1]))
+
+    def test_merged_state_goes_to_output_file(self):
+        output = os.path.join(self.directory, "merged.json")
+        with patch("sys.argv", ["tap-google-ads", "merge-state", *self.paths, "--output", output]):
+            tap_google_ads.main()
+
+        with open(output, encoding="utf-8") as merged_file:
+            self.assertEqual(json.load(merged_file), merge_states([SHARD_0, SHARD_1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import gzip
+import io
+import json
+import unittest
+from unittest.mock import patch
+from tap_google_ads import messages
+from tap_google_ads.stdout_compression import GzipBlockWriter
+from tap_google_ads.stdout_compression import compressed_stdout
+from tap_google_ads.stdout_compression import get_compression_level
+from tap_google_ads.stdout_compression import get_compression_workers
+from tap_google_ads.stdout_compression import get_stdout_compression
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class BytesStdout(io.TextIOWrapper):
+    """A text stdout whose bytes are kept after it is closed"""
+
+    def __init__(self):
+        self.raw_bytes = io.BytesIO()
+        super().__init__(self.raw_bytes, encoding="utf-8")
+
+
+def write_messages(count):
+    messages.write_schema("stream", {"type": "object", "properties": {"id": {"type": "integer"}}}, ["id"])
+    for index in range(count):
+        messages.write_record("stream", {"id": index, "name": f"record {index}"})
+        if index % 100 == 99:
+            messages.write_state({"bookmarks": {"stream": {"id": index}}})
+
+
+class TestStdoutCompressionConfig(unittest.TestCase):
+
+    def test_stdout_compression(self):
+        self.assertEqual(get_stdout_compression({}), "none")
+        self.assertEqual(get_stdout_compression({"stdout_compression": "zstd"}), "zstd")
+        with self.assertRaises(RuntimeError):
+            get_stdout_compression({"stdout_compression": "brotli"})
+
+    def test_invalid_levels_and_workers_fall_back_to_the_defaults(self):
+        self.assertEqual(get_compression_level({}, "gzip"), 6)
+        self.assertEqual(get_compression_level({"stdout_compression_level": "19"}, "zstd"), 19)
+        self.assertEqual(get_compression_level({"stdout_compression_level": 19}, "gzip"), 6)
+        self.assertEqual(get_compression_workers({"stdout_compression_workers": "4"}), 4)
+        self.assertEqual(get_compression_workers({"stdout_compression_workers": -1}), 1)
+        self.assertEqual(get_compression_workers({"stdout_compression_workers": "many"}), 1)
+
+
+class TestCompressedStdout(unittest.TestCase):
+
+    def sync_to_stdout(self, config, count=1000):
+        stdout = BytesStdout()
+        with patch("sys.stdout", stdout):
+            with compressed_stdout(config):
+                write_messages(count)
+        return stdout.raw_bytes.getvalue()
+
+    def assert_messages(self, data, count=1000):
+        lines = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+        self.assertEqual(lines[0]["type"], "SCHEMA")
+        records = [line["record"] for line in lines if line["type"] == "RECORD"]
+        self.assertEqual([record["id"] for record in records], list(range(count)))
+        states = [line for line in lines if line["type"] == "STATE"]
+        self.assertEqual(states[-1]["value"], {"bookmarks": {"stream": {"id": count - 1}}})
+
+    def test_no_compression_writes_json_lines(self):
+        self.assert_messages(self.sync_to_stdout({}))
+
+    def test_gzip(self):
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                data = self.sync_to_stdout({"stdout_compression": "gzip", "stdout_compression_workers": workers})
+                self.assertEqual(data[:2], b"\x1f\x8b")
+                self.assert_messages(gzip.decompress(data))
+
+    def test_gzip_blocks_are_written_in_order(self):
+        output = io.BytesIO()
+        writer = GzipBlockWriter(output, 6, workers=4, block_size=1000)
+        lines = [f"line {index}\n".encode("utf-8") for index in range(5000)]
+        for line in lines:
+            writer.write(line)
+        writer.close()
+
+        data = output.getvalue()
+        self.assertGreater(data.count(b"\x1f\x8b\x08"), 30)
+        self.assertEqual(gzip.decompress(data), b"".join(lines))
+
+    def test_the_stream_is_finished_when_the_sync_fails(self):
+        stdout = BytesStdout()
+        with patch("sys.stdout", stdout):
+            with self.assertRaises(ValueError):
+                with compressed_stdout({"stdout_compression": "gzip"}):
+                    write_messages(200)
+                    raise ValueError("The API is down")
+
+        self.assert_messages(gzip.decompress(stdout.raw_bytes.getvalue()), count=200)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                data = self.sync_to_stdout({"stdout_compression": "zstd", "stdout_compression_workers": workers})
+                reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+                self.assert_messages(reader.read())
+
+
+if __name__ == '__main__':
+    unittest.main()